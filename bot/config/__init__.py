@@ -3,12 +3,16 @@
 from .settings import *
 from .shop_items import *
 from .ton_config import TON_CONFIG
+from .game_tables import GameTables, game_tables
 
 __all__ = [
     'TOKEN',
     'GAME_INFO',
     'SHOP_ITEMS',
     'PREMIUM_SHOP_ITEMS',
-    'ShopManager'
-    'TON_CONFIG'
+    'SHOP_ITEMS_BY_NAME',
+    'ShopManager',
+    'TON_CONFIG',
+    'GameTables',
+    'game_tables'
 ]
\ No newline at end of file
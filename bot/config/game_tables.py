@@ -0,0 +1,155 @@
+# config/game_tables.py
+
+from bisect import bisect_right
+from typing import Dict, Optional, Tuple
+
+from bot.config.settings import (
+    MAX_COMBAT_LEVEL,
+    PET_MAX_LEVEL,
+    MINIBOSS_REWARDS,
+    DAILY_REWARDS,
+    exp_needed_for_level,
+    calculate_gold_production,
+    calculate_miniboss_probabilities,
+    calculate_miniboss_rewards,
+    calculate_daily_rewards
+)
+
+# Prestige levels with precomputed rewards; higher ones use the formulas
+MAX_PRESTIGE_TABLE = 10
+
+
+class GameTables:
+    """
+    Lookup tables for the game formulas in settings.py.
+
+    Everything is computed once from the formulas themselves, so lookups
+    return exactly what the formulas would. Arguments outside the tables
+    fall back to the formulas. EXP values are Python ints (1.5 ** 100
+    overflows int64), the rest are tuples indexed by level.
+    """
+
+    def __init__(
+        self,
+        max_combat_level: int = MAX_COMBAT_LEVEL,
+        pet_max_level: int = PET_MAX_LEVEL,
+        max_prestige: int = MAX_PRESTIGE_TABLE
+    ):
+        self.max_level = max(max_combat_level, pet_max_level)
+        self.max_prestige = max_prestige
+        levels = range(self.max_level + 1)
+
+        # EXP to go from `level` to `level + 1`, and total EXP to reach `level` from 0
+        self.exp_table = tuple(exp_needed_for_level(level) for level in levels)
+        cumulative = [0]
+        for needed in self.exp_table:
+            cumulative.append(cumulative[-1] + needed)
+        self.cumulative_exp = tuple(cumulative)
+
+        # Combat levels above 100 use the level 100 odds
+        self.miniboss_probabilities = tuple(
+            calculate_miniboss_probabilities(level) for level in range(max_combat_level + 1)
+        )
+
+        prestiges = range(max_prestige + 1)
+        self.gold_production = {
+            (prestige, premium): tuple(
+                calculate_gold_production(level, prestige, premium) for level in range(pet_max_level + 1)
+            )
+            for prestige in prestiges
+            for premium in (False, True)
+        }
+        self.miniboss_rewards = {
+            (enemy, prestige): tuple(
+                calculate_miniboss_rewards(enemy, level, prestige) for level in levels
+            )
+            for enemy in MINIBOSS_REWARDS
+            for prestige in prestiges
+        }
+        self.daily_rewards = {
+            (reward_type, prestige): tuple(
+                calculate_daily_rewards(reward_type, level, prestige) for level in levels
+            )
+            for reward_type in ("basic", "premium")
+            if "fragmento_del_destino" in DAILY_REWARDS[reward_type]
+            for prestige in prestiges
+        }
+
+        # Streak multiplier per streak length up to the longest bonus
+        self.streak_days = {}
+        self.streak_multipliers = {}
+        for premium, key in ((False, "streak_bonuses"), (True, "premium_streak_bonuses")):
+            bonuses = DAILY_REWARDS[key]
+            days = tuple(sorted(bonuses))
+            self.streak_days[premium] = days
+            self.streak_multipliers[premium] = tuple(
+                self._streak_multiplier(bonuses, streak) for streak in range(days[-1] + 1)
+            )
+
+    @staticmethod
+    def _streak_multiplier(bonuses: Dict[int, float], streak: int) -> float:
+        for days, bonus in sorted(bonuses.items(), reverse=True):
+            if streak >= days:
+                return bonus
+        return 1.0
+
+    # EXP and levels
+    def exp_needed(self, level: int) -> int:
+        """EXP needed to go from `level` to the next one."""
+        if 0 <= level <= self.max_level:
+            return self.exp_table[level]
+        return exp_needed_for_level(level)
+
+    def level_up(self, level: int, exp: int) -> Tuple[int, int]:
+        """
+        Apply every level-up `exp` pays for, starting at `level`.
+
+        Same result as subtracting exp_needed() while possible, found with
+        one bisect over the cumulative EXP table.
+        """
+        if 0 <= level <= self.max_level:
+            total = self.cumulative_exp[level] + exp
+            level = bisect_right(self.cumulative_exp, total) - 1
+            exp = total - self.cumulative_exp[level]
+        # Past the table (practically unreachable): one level at a time
+        while exp >= self.exp_needed(level):
+            exp -= self.exp_needed(level)
+            level += 1
+        return level, exp
+
+    # MiniBoss
+    def miniboss_odds(self, combat_level: int) -> Dict[int, float]:
+        """Victory chance per enemy; the returned dict is shared, do not modify it."""
+        return self.miniboss_probabilities[max(0, min(combat_level, len(self.miniboss_probabilities) - 1))]
+
+    def miniboss_reward(self, enemy_level: int, player_level: int, prestige_level: int) -> dict:
+        table = self.miniboss_rewards.get((enemy_level, prestige_level))
+        if table is not None and 0 <= player_level <= self.max_level:
+            return table[player_level]
+        return calculate_miniboss_rewards(enemy_level, player_level, prestige_level)
+
+    # Production and daily rewards
+    def gold_per_minute(self, level: int, prestige_level: int, is_premium: bool = False) -> int:
+        table = self.gold_production.get((prestige_level, bool(is_premium)))
+        if table is not None and 0 <= level < len(table):
+            return table[level]
+        return calculate_gold_production(level, prestige_level, is_premium)
+
+    def daily_reward(self, reward_type: str, player_level: int, prestige_level: int) -> dict:
+        table = self.daily_rewards.get((reward_type, prestige_level))
+        if table is not None and 0 <= player_level <= self.max_level:
+            return table[player_level]
+        return calculate_daily_rewards(reward_type, player_level, prestige_level)
+
+    def streak_multiplier(self, streak: int, premium: bool) -> float:
+        table = self.streak_multipliers[premium]
+        return table[max(0, min(streak, len(table) - 1))]
+
+    def next_streak_bonus(self, streak: int, premium: bool) -> Optional[int]:
+        """Streak length of the next bonus, or None once every bonus is reached."""
+        days = self.streak_days[premium]
+        i = bisect_right(days, streak)
+        return days[i] if i < len(days) else None
+
+
+game_tables = GameTables()
@@ -0,0 +1,146 @@
+# config/portal_config.py
+
+PORTAL_REWARDS = {
+    "legendary": {  # 1% probabilidad
+        "rewards": [
+            {
+                "type": "premium_status",
+                "value": 7,  # días
+                "name": "🌟 Bendición de las Mareas (Premium 7 días)",
+                "weight": 1
+            },
+            {
+                "type": "coral",
+                "value": 1000,
+                "name": "🌺 Tesoro de Coral Ancestral (1000 coral)",
+                "weight": 1
+            },
+            {
+                "type": "watershard",
+                "value": 10,
+                "name": "💎 WaterShard (10 WTR)",
+                "description": "Fragmentos cristalizados de agua ancestral",
+                "weight": 1
+            }
+        ]
+    },
+    "epic": {  # 5% probabilidad
+        "rewards": [
+            {
+                "type": "gold_boost",
+                "value": 0.05,  # 5%
+                "name": "💫 Encantamiento de Oro (+5% producción permanente)",
+                "weight": 2
+            },
+            {
+                "type": "coral",
+                "value": 500,
+                "name": "🌺 Cofre de Coral (500 coral)",
+                "weight": 3
+            },
+            {
+                "type": "watershard",
+                "value": 5,
+                "name": "💎 WaterShard (5 WTR)",
+                "weight": 2
+            }
+        ]
+    },
+    "rare": {  # 14% probabilidad
+        "rewards": [
+            {
+                "type": "gold",
+                "value": 10000,
+                "name": "💰 Tesoro Marino (10,000 oro)",
+                "weight": 5
+            },
+            {
+                "type": "energy",
+                "value": 100,
+                "name": "⚡ Esencia de las Mareas (Energía completa)",
+                "weight": 4
+            },
+            {
+                "type": "combat_boost",
+                "value": 5,
+                "name": "⚔️ Bendición del Guerrero (+5 combates)",
+                "weight": 5
+            },
+            {
+                "type": "watershard",
+                "value": 2,
+                "name": "💎 WaterShard (2 WTR)",
+                "weight": 3
+            }
+        ]
+    },
+    "common": {  # 80% probabilidad
+        "rewards": [
+            {
+                "type": "gold",
+                "value": 1000,
+                "name": "💰 Monedas Marinas (1,000 oro)",
+                "weight": 20
+            },
+            {
+                "type": "coral",
+                "value": 50,
+                "name": "🌺 Fragmentos de Coral (50 coral)",
+                "weight": 20
+            },
+            {
+                "type": "energy",
+                "value": 25,
+                "name": "⚡ Gota de Marea (+25 energía)",
+                "weight": 20
+            },
+            {
+                "type": "food",
+                "value": 20,
+                "name": "🍖 Festín Marino (20 comida)",
+                "weight": 20
+            },
+            {
+                "type": "watershard",
+                "value": 1,
+                "name": "💎 WaterShard (1 WTR)",
+                "weight": 5
+            }
+        ]
+    }
+}
+
+PORTAL_MESSAGES = {
+    "opening": "🌊 El Portal de las Mareas se está abriendo...",
+    "spinning": [
+        "✨ Las energías marinas fluyen...",
+        "💫 Los destinos se entrelazan...",
+        "🌊 Las mareas predicen tu fortuna..."
+    ],
+    "legendary": "🌟 ¡Las mareas legendarias te bendicen!",
+    "epic": "💫 ¡El océano te otorga un poder épico!",
+    "rare": "✨ ¡Las corrientes te traen un regalo especial!",
+    "common": "🌊 Las mareas te traen un obsequio...",
+    "no_tickets": "❌ No tienes suficientes Fragmentos de Destino",
+    "guaranteed": "✨ ¡Giro garantizado de rareza superior activado!"
+}
+
+# Rarities from best to worst; pity resets cascade down this order
+RARITY_ORDER = ("legendary", "epic", "rare", "common")
+
+RARITY_CHANCES = {
+    "legendary": 0.01,  # 1%
+    "epic": 0.05,      # 5%
+    "rare": 0.14,      # 14%
+    "common": 0.80     # 80%
+}
+
+PITY_SYSTEM = {
+    "legendary_pity": 100,  # Garantizado legendario cada 100 giros
+    "epic_pity": 20,       # Garantizado épico cada 20 giros sin épico o mejor
+    "rare_pity": 10        # Garantizado raro cada 10 giros sin raro o mejor
+}
+
+# Spin animation: frames shown before the results, whatever the number of spins
+PORTAL_ANIMATION_MAX_EDITS = 3
+PORTAL_ANIMATION_DELAY = 0.5  # seconds between frames
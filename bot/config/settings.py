@@ -12,7 +12,21 @@ TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 SAVE_FILE = 'game_data.json'
 BACKUP_DIR = 'backups'
 MAX_BACKUPS = 5
+BACKUP_PAGE_SIZE = 1000  # Rows fetched per page while streaming a backup
+BACKUP_FULL_EVERY = 12  # Delta backups between full snapshots
+BACKUP_INTERVAL = 3600  # 1 hour in seconds
+RESTORE_CHUNK_SIZE = 1000  # Players written per restore transaction
 
+# Player Store Settings
+PLAYER_STORE_MAX_SIZE = 10000  # Hot players kept in memory
+PLAYER_STORE_FLUSH_BATCH = 500  # Players written per save batch
+INCREMENTAL_SAVE = True  # Only write players modified since the last checkpoint
+SAVE_CHUNK_SIZE = 500  # Rows per multi-row UPSERT statement
+
+
+# Update Processing
+UPDATE_CONCURRENCY = 64  # Updates processed at once (same-user updates still run in order)
+CAS_MAX_RETRIES = 3  # Re-runs of a game step whose player write lost a version race
 
 # Time Constants
 HORA_EN_SEGUNDOS = 8 * 60 * 60
@@ -25,6 +39,8 @@ IMAGE_PATHS = {
     'recolectar': IMAGES_DIR / "2.webp",
     'alimentar': IMAGES_DIR / "3.webp"
 }
+DATA_DIR = 'data'  # Runtime state written by the bot (not versioned)
+MEDIA_CACHE_FILE = os.path.join(DATA_DIR, 'media_cache.json')  # Telegram file_ids of uploaded images, per bot token
 
 # Game Constants
 MAX_BATTLES_PER_DAY = 20
@@ -44,6 +60,8 @@ ENERGY_GAIN_RATE = 2  # Energy points gained per minute
 MAX_ENERGY = 100
 MAX_HUNGER = 100
 PET_MAX_LEVEL = 100
+PREMIUM_GOLD_MULTIPLIER = 1.5  # Gold production bonus while premium is active
+AUTO_COLLECTOR_INTERVAL = 3600  # Seconds between auto-collector ticks (1 food, 1 energy)
 
 # Prestige System
 PRESTIGE_SETTINGS = {
@@ -110,6 +128,12 @@ def calculate_miniboss_probabilities(combat_level):
 
     return current_probabilities
 
+# MiniBoss runs in progress
+MINIBOSS_RUN_TTL = 30 * 60  # Seconds an idle run is kept
+MINIBOSS_MAX_RUNS = 10000  # Runs kept in memory at most
+MINIBOSS_WHEEL_SLOT = 60  # Expiry granularity in seconds
+MINIBOSS_PERSIST_RUNS = True  # Keep a copy in miniboss_stats so runs survive restarts
+
 # MiniBoss Rewards
 MINIBOSS_REWARDS = {
     1: {  # First enemy
@@ -201,6 +225,9 @@ DAILY_REWARDS = {
     "weekly_reset": 7 * 24 * 60 * 60
 }
 
+# Streaks are derived when claiming; enable to also store resets for analytics
+STREAK_RESET_JOB = False
+
 def calculate_daily_rewards(reward_type: str, player_level: int, prestige_level: int) -> dict:
     """Calculate daily rewards with exponential scaling."""
     base_rewards = DAILY_REWARDS[reward_type]
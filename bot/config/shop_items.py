@@ -3,6 +3,8 @@
 from typing import Dict, List, Optional, Union
 import logging
 
+from bot.config.settings import MAX_ITEM_LEVEL
+
 logger = logging.getLogger(__name__)
 
 EXPONENTIAL_GROWTH = 2  # Each level increases cost and benefits by 100%
@@ -61,6 +63,30 @@ SHOP_ITEMS = [
     }
 ]
 
+# Items indexed by name
+SHOP_ITEMS_BY_NAME = {item["nombre"]: item for item in SHOP_ITEMS}
+
+
+def _level_stats(item: dict, level: int) -> dict:
+    costo = int(item["costo_base"] * (EXPONENTIAL_GROWTH ** (level - 1)))
+    oro_hora = int(item["oro_hora_base"] * (EXPONENTIAL_GROWTH ** (level - 1)))
+    return {
+        "nombre": item["nombre"],
+        "nivel": level,
+        "costo": costo,
+        "oro_hora": oro_hora,
+        "descripcion": item["descripcion"],
+        "emoji": item["emoji"]
+    }
+
+
+# Cost and production of every item at levels 1..MAX_ITEM_LEVEL + 1 (the
+# extra level is the "next level" preview); index 0 is unused
+SHOP_LEVEL_TABLES = {
+    item["nombre"]: [None] + [_level_stats(item, level) for level in range(1, MAX_ITEM_LEVEL + 2)]
+    for item in SHOP_ITEMS
+}
+
 # Premium shop items
 PREMIUM_SHOP_ITEMS = {
     "premium_status": {
@@ -104,23 +130,16 @@ PREMIUM_SHOP_ITEMS = {
 class ShopManager:
     @staticmethod
     def calculate_item_stats(item: dict, current_level: int) -> dict:
-        """Calculate item's current cost and production based on level."""
-        costo = int(item["costo_base"] * (EXPONENTIAL_GROWTH ** (current_level - 1)))
-        oro_hora = int(item["oro_hora_base"] * (EXPONENTIAL_GROWTH ** (current_level - 1)))
-        
-        return {
-            "nombre": item["nombre"],
-            "nivel": current_level,
-            "costo": costo,
-            "oro_hora": oro_hora,
-            "descripcion": item["descripcion"],
-            "emoji": item["emoji"]
-        }
+        """Item's cost and production at `current_level` (shared, do not modify)."""
+        table = SHOP_LEVEL_TABLES.get(item["nombre"])
+        if table is not None and 1 <= current_level < len(table):
+            return table[current_level]
+        return _level_stats(item, current_level)
 
     @staticmethod
     def get_item_by_name(name: str, current_level: int = 1) -> Optional[dict]:
         """Get a shop item by its name with calculated stats for current level."""
-        base_item = next((item for item in SHOP_ITEMS if item["nombre"] == name), None)
+        base_item = SHOP_ITEMS_BY_NAME.get(name)
         if base_item:
             return ShopManager.calculate_item_stats(base_item, current_level)
         return None
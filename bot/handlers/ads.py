@@ -1,4 +1,4 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes
 from datetime import datetime
 import logging
@@ -9,7 +9,8 @@ from telegram.ext import CallbackQueryHandler
 from bot.config.ads_config import AD_CONFIG  # Importar la configuración de anuncios
 from telegram.ext import ConversationHandler
 from typing import Dict, Any
-from database.db.game_db import get_player, Session
+from bot.utils.update_scope import load_player
+from bot.utils.keyboard import cached_keyboard
 
 # Your URL of the landing page
 FRONTEND_URL = "https://artvsmagnvs.github.io/WaterQuest.game/"
@@ -55,57 +56,48 @@ async def verify_ad_view(ad_id: str) -> bool:
         return True
 
 
-from database.db.game_db import get_player, Session
-
 async def ads_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Muestra el menú de anuncios con el progreso actual."""
     user_id = update.callback_query.from_user.id
     
-    session = Session()
-    try:
-        player = get_player(session, user_id)
-        
-        if not player:
-            await update.callback_query.message.reply_text("❌ Error: Jugador no encontrado.")
-            return
-        
-        # Obtener el conteo de anuncios diarios y asegurarse de que exista
-        daily_ads = player.daily_ads if player.daily_ads is not None else 0
-        
-        keyboard = [
-            [InlineKeyboardButton("📺 Ver Anuncio", callback_data="watch_ad")],
-            [InlineKeyboardButton("🏠 Volver", callback_data="start")]
-        ]
-        
-        message = (
-            "📺 *Recompensas por Anuncios Diarios*\n\n"
-            f"Anuncios vistos hoy: {daily_ads}/10\n\n"
-            "Recompensas actuales:\n"
-            "• Ver Anuncio: +25 Energía, +1 Combate Rápido\n"
-            f"• 3 Anuncios Diarios: +1 MiniBoss {'✅' if daily_ads >= 3 else '❌'}\n"
-            f"• 5 Anuncios Diarios: +2 MiniBoss, +1% Generación de Oro {('✅' if daily_ads >= 5 else '❌')}\n"
-            f"• 10 Anuncios Diarios: +3 MiniBoss, +1 Fragmento de Destino {('✅' if daily_ads >= 10 else '❌')}\n\n"
-            "Características Especiales:\n"
-            "• Reintentar combate MiniBoss (1 Anuncio)\n"
-            "• Reintentar combate Aventura (1 Anuncio)"
-        )
-        
-        await update.callback_query.message.edit_text(
-            message,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
-    finally:
-        session.close()
-
-from database.db.game_db import get_player, update_player, Session
+    player = await load_player(user_id)
+    
+    if not player:
+        await update.callback_query.message.reply_text("❌ Error: Jugador no encontrado.")
+        return
+    
+    # Obtener el conteo de anuncios diarios y asegurarse de que exista
+    daily_ads = player.daily_ads if player.daily_ads is not None else 0
+    
+    keyboard = [
+        [("📺 Ver Anuncio", "watch_ad")],
+        [("🏠 Volver", "start")]
+    ]
+    
+    message = (
+        "📺 *Recompensas por Anuncios Diarios*\n\n"
+        f"Anuncios vistos hoy: {daily_ads}/10\n\n"
+        "Recompensas actuales:\n"
+        "• Ver Anuncio: +25 Energía, +1 Combate Rápido\n"
+        f"• 3 Anuncios Diarios: +1 MiniBoss {'✅' if daily_ads >= 3 else '❌'}\n"
+        f"• 5 Anuncios Diarios: +2 MiniBoss, +1% Generación de Oro {('✅' if daily_ads >= 5 else '❌')}\n"
+        f"• 10 Anuncios Diarios: +3 MiniBoss, +1 Fragmento de Destino {('✅' if daily_ads >= 10 else '❌')}\n\n"
+        "Características Especiales:\n"
+        "• Reintentar combate MiniBoss (1 Anuncio)\n"
+        "• Reintentar combate Aventura (1 Anuncio)"
+    )
+    
+    await update.callback_query.message.edit_text(
+        message,
+        reply_markup=cached_keyboard(*keyboard),
+        parse_mode='Markdown'
+    )
 
 async def process_ad_watch(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.callback_query.from_user.id
     
-    session = Session()
     try:
-        player = get_player(session, user_id)
+        player = await load_player(user_id)
         
         if not player:
             await update.callback_query.message.reply_text("❌ Error: Player not found.")
@@ -136,9 +128,7 @@ async def process_ad_watch(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Direct link to the ad and processing reward
             await loading_message.edit_text(
                 f"📺 Please click the link below to view the ad:\n\n{ad_url}",
-                reply_markup=InlineKeyboardMarkup([  # Optional back button
-                    [InlineKeyboardButton("Back", callback_data="start")]
-                ])
+                reply_markup=cached_keyboard([("Back", "start")])  # Optional back button
             )
 
             # Directly verify after ad viewing without confirmation step
@@ -146,7 +136,6 @@ async def process_ad_watch(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 # Rewards processing
                 player.daily_ads += 1
                 await grant_ad_rewards(player)
-                update_player(session, player)
                 await loading_message.edit_text("✅ Ad view confirmed. Processing rewards...")
 
             else:
@@ -172,16 +161,12 @@ async def process_ad_watch(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             # Verificar hitos
             await check_ad_milestones(update, context, player)
-            
-            update_player(session, player)
         else:
             await loading_message.edit_text("❌ Ad view could not be verified. Please try again.")
 
     except Exception as e:
         logger.error(f"Error in process_ad_watch: {str(e)}")
         await loading_message.edit_text("❌ An unexpected error occurred. Please try again later.")
-    finally:
-        session.close()
 
 async def initiate_monetag_ad():
     async with aiohttp.ClientSession() as session:
@@ -249,47 +234,40 @@ async def retry_combat_ad(update: Update, context: ContextTypes.DEFAULT_TYPE, co
     """Maneja el reintento de combate a través de la visualización de anuncios."""
     user_id = update.callback_query.from_user.id
     
-    session = Session()
+    player = await load_player(user_id)
+    if not player:
+        await update.callback_query.message.reply_text("❌ Error: Jugador no encontrado.")
+        return False
+
+    loading_message = await update.callback_query.message.reply_text(
+        "📺 Cargando anuncio para reintentar combate..."
+    )
+    
     try:
-        player = get_player(session, user_id)
-        if not player:
-            await update.callback_query.message.reply_text("❌ Error: Jugador no encontrado.")
+        # Mostrar anuncio de Monetag a través de la solicitud al frontend
+        ad_result = await MonetagAd.show_ad()
+        
+        if not ad_result:
+            await loading_message.edit_text("❌ Error al cargar el anuncio. Por favor, intenta nuevamente.")
             return False
 
-        loading_message = await update.callback_query.message.reply_text(
-            "📺 Cargando anuncio para reintentar combate..."
+        await loading_message.delete()
+        
+        # Actualizar el conteo de anuncios diarios
+        player.daily_ads = player.daily_ads + 1 if player.daily_ads else 1
+        
+        await update.callback_query.message.reply_text(
+            f"✅ ¡Ahora puedes reintentar el combate de {combat_type}!"
         )
         
-        try:
-            # Mostrar anuncio de Monetag a través de la solicitud al frontend
-            ad_result = await MonetagAd.show_ad()
-            
-            if not ad_result:
-                await loading_message.edit_text("❌ Error al cargar el anuncio. Por favor, intenta nuevamente.")
-                return False
-
-            await loading_message.delete()
-            
-            # Actualizar el conteo de anuncios diarios
-            player.daily_ads = player.daily_ads + 1 if player.daily_ads else 1
-            
-            # Guardar los datos del jugador
-            save_player(session, player)
-            
-            await update.callback_query.message.reply_text(
-                f"✅ ¡Ahora puedes reintentar el combate de {combat_type}!"
-            )
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error procesando el reintento del anuncio: {str(e)}")
-            await loading_message.edit_text(
-                "❌ Error procesando el anuncio. Por favor, intenta nuevamente."
-            )
-            return False
-    finally:
-        session.close()
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error procesando el reintento del anuncio: {str(e)}")
+        await loading_message.edit_text(
+            "❌ Error procesando el anuncio. Por favor, intenta nuevamente."
+        )
+        return False
 
 def register_handlers(application):
     """Registrar todos los controladores relacionados con los anuncios."""
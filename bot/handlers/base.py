@@ -1,21 +1,28 @@
 # handlers/base.py
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes, CallbackContext
-import logging
 from datetime import datetime
 
 # Import configurations and utilities
 from bot.config.settings import SUCCESS_MESSAGES, ERROR_MESSAGES, logger
 from bot.utils.keyboard import generar_botones
-from bot.utils.save_system import save_game_data
+from bot.utils.economy import economy
+from bot.utils.router import CallbackRouter
 
 # Import other handlers
-from bot.handlers.combat import quick_combat
-from bot.handlers.miniboss import miniboss_handler
+from bot.handlers.combat import quick_combat, auto_combat
+from bot.handlers.miniboss import (
+    miniboss_handler,
+    siguiente_miniboss,
+    retirarse_miniboss,
+    retry_miniboss_battle
+)
 from bot.handlers.daily import claim_daily_reward
-from bot.handlers.shop import tienda, comprar
+from bot.handlers.shop import tienda, comprar, comprar_fragmentos, premium_shop, get_premium_item
 from bot.handlers.pet import recolectar, alimentar, estado
+from bot.handlers.portal import portal_menu, spin_portal, toggle_portal_instant
+from bot.handlers.ads import ads_menu, process_ad_watch
 
 def initialize_combat_stats(level):
     """Initialize combat stats for a new player."""
@@ -35,8 +42,12 @@ def initialize_combat_stats(level):
     }
 
 def initialize_new_player():
-    """Initialize data for a new player."""
+    """Initialize data for a new player (a players row, by column name, without id and nombre)."""
+    now = datetime.now().timestamp()
     return {
+        "nivel": 1,
+        "nivel_combate": 0,
+        "oro_por_minuto": 1,
         "mascota": {
             "hambre": 100,
             "energia": 100,
@@ -45,13 +56,14 @@ def initialize_new_player():
             "oro_hora": 1,
         },
         "comida": 0,
-        "última_alimentación": datetime.now().timestamp(),
-        "última_actualización": datetime.now().timestamp(),
+        "ultima_alimentacion": now,
+        "ultima_actualizacion": now,
         "inventario": {},
         "combat_stats": initialize_combat_stats(0),
         "daily_reward": {
             "last_claim": 0,
-            "streak": 0
+            "streak": 0,
+            "last_weekly_tickets": 0
         },
         "premium_features": {
             "premium_status": False,
@@ -59,47 +71,55 @@ def initialize_new_player():
             "auto_collector": False,
             "auto_collector_expires": 0,
             "daily_bonus": False,
-            "lucky_tickets": 0
-        }
+            "lucky_tickets": 0,
+            "tickets": 0
+        },
+        "watershard": 0,
+        "miniboss_stats": {
+            "attempts_today": 0,
+            "last_attempt_date": None
+        },
+        "extra_data": {},
+        "premium_expires_at": None,
+        "auto_collector_expires_at": None
     }
 
-from database.db.game_db import get_player, create_player, Session
-
-from database.db.game_db import get_player, create_player, Session
+from database.models.player_model import Player
+from bot.utils.update_scope import update_scope, load_player, add_player
 
 async def start(update: Update, context: CallbackContext):
     """Initialize user data and start the game."""
     try:
         user_id = update.effective_user.id
         
-        session = Session()
-        try:
-            player = get_player(session, user_id)
-            
-            if not player:
-                # Initialize new player
-                new_player_data = initialize_new_player()
-                player = create_player(session, user_id, new_player_data)
-                session.commit()
-                message = SUCCESS_MESSAGES["welcome"]
-            else:
-                message = "¡Ya tienes una mascota! Usa los botones para jugar."
+        player = await load_player(user_id)
+        
+        if not player:
+            # Initialize new player (Telegram usernames are unique; the id stands in without one)
+            user = update.effective_user
+            player = Player.from_dict(dict(
+                initialize_new_player(),
+                id=user_id,
+                nombre=user.username or str(user_id)
+            ))
+            add_player(player)
+            message = SUCCESS_MESSAGES["welcome"]
+        else:
+            message = "¡Ya tienes una mascota! Usa los botones para jugar."
 
-            # Generate buttons based on player data
-            reply_markup = generar_botones(player.__dict__)
+        # Generate buttons based on player data
+        reply_markup = generar_botones(player)
 
-            if update.callback_query:
-                await update.callback_query.message.reply_text(
-                    message,
-                    reply_markup=reply_markup
-                )
-            else:
-                await update.message.reply_text(
-                    message,
-                    reply_markup=reply_markup
-                )
-        finally:
-            session.close()
+        if update.callback_query:
+            await update.callback_query.message.reply_text(
+                message,
+                reply_markup=reply_markup
+            )
+        else:
+            await update.message.reply_text(
+                message,
+                reply_markup=reply_markup
+            )
     except Exception as e:
         logger.error(f"Error in start command: {e}")
         if update.callback_query:
@@ -108,38 +128,33 @@ async def start(update: Update, context: CallbackContext):
             await update.message.reply_text(ERROR_MESSAGES["generic_error"])
 
 async def button(update: Update, context: CallbackContext):
-    """Handle button presses."""
+    """Handle button presses through the callback router."""
+    query = update.callback_query
     try:
-        query = update.callback_query
-        await query.answer()
-
-        # Route to appropriate handler based on callback_data
-        handlers = {
-            "start": start,
-            "recolectar": recolectar,
-            "alimentar": alimentar,
-            "estado": estado,
-            "tienda": tienda,
-            "combate": quick_combat,
-            "miniboss": miniboss_handler,
-            "daily_reward": claim_daily_reward
-        }
-
-        if query.data in handlers:
-            await handlers[query.data](update, context)
-        elif query.data.startswith("comprar_"):
-            item_name = query.data.split("_")[1]
-            await comprar(update, context, item_name)
-        else:
+        try:
+            await query.answer()
+        except Exception:
+            # If the callback_query expired, we continue without error
+            pass
+
+        # One Player per user and update, shared by nested handlers
+        async with update_scope():
+            handled = await callback_router.dispatch(update, context)
+
+        if not handled:
             logger.warning(f"Unhandled callback_data: {query.data}")
-            await query.message.reply_text(ERROR_MESSAGES["generic_error"])
+            await query.message.reply_text(
+                ERROR_MESSAGES["generic_error"],
+                reply_markup=generar_botones()
+            )
 
     except Exception as e:
         logger.error(f"Error in button handler: {e}")
-        if update.callback_query:
-            await update.callback_query.message.reply_text(ERROR_MESSAGES["generic_error"])
-        else:
-            await update.message.reply_text(ERROR_MESSAGES["generic_error"])
+        if query and query.message:
+            await query.message.reply_text(
+                ERROR_MESSAGES["generic_error"],
+                reply_markup=generar_botones()
+            )
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle errors."""
@@ -187,69 +202,92 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=generar_botones()
         )
 
-from database.db.game_db import get_player, Session
 
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show detailed player statistics."""
     try:
         user_id = update.effective_user.id
         
-        session = Session()
-        try:
-            player = get_player(session, user_id)
-            
-            if not player:
-                message = ERROR_MESSAGES["no_game"]
-                if update.callback_query:
-                    await update.callback_query.message.reply_text(message)
-                else:
-                    await update.message.reply_text(message)
-                return
-
-            stats_text = (
-                "📊 *Estadísticas Detalladas:*\n\n"
-                f"🐾 *Nivel de Mascota:* {player.mascota['nivel']}\n"
-                f"💰 *Oro Total:* {player.mascota['oro']}\n"
-                f"⚡ *Producción/min:* {player.mascota['oro_hora']}\n\n"
-                f"⚔️ *Nivel de Combate:* {player.combat_stats['level']}\n"
-                f"🌺 *Coral de Fuego:* {player.combat_stats['fire_coral']}\n"
-                f"💫 *EXP:* {player.combat_stats['exp']}\n\n"
-                f"🎯 *Batallas Hoy:* {player.combat_stats['battles_today']}/20\n"
-            )
+        player = await load_player(user_id)
+        
+        if not player:
+            message = ERROR_MESSAGES["no_game"]
+            if update.callback_query:
+                await update.callback_query.message.reply_text(message)
+            else:
+                await update.message.reply_text(message)
+            return
+
+        proyectado = economy.project(player)
+        stats_text = (
+            "📊 *Estadísticas Detalladas:*\n\n"
+            f"🐾 *Nivel de Mascota:* {player.mascota['nivel']}\n"
+            f"💰 *Oro Total:* {proyectado['oro']}\n"
+            f"⚡ *Producción/min:* {player.mascota['oro_hora']}\n\n"
+            f"⚔️ *Nivel de Combate:* {player.combat_stats['level']}\n"
+            f"🌺 *Coral de Fuego:* {player.combat_stats['fire_coral']}\n"
+            f"💫 *EXP:* {player.combat_stats['exp']}\n\n"
+            f"🎯 *Batallas Hoy:* {player.combat_stats['battles_today']}/20\n"
+        )
 
-            # Add premium info if any premium feature is active
-            if any(player.premium_features.values()):
-                stats_text += "\n👑 *Premium Features Activas:*\n"
-                if player.premium_features.get('premium_status'):
-                    stats_text += "• Status Premium\n"
-                if player.premium_features.get('auto_collector'):
-                    stats_text += "• Auto-Recolector\n"
-                if player.premium_features.get('daily_bonus'):
-                    stats_text += "• Bonus Diario\n"
-                if player.premium_features.get('lucky_tickets', 0) > 0:
-                    stats_text += f"• 🎫 Lucky Tickets: {player.premium_features['lucky_tickets']}\n"
+        # Add premium info if any premium feature is active
+        if any(player.premium_features.values()):
+            stats_text += "\n👑 *Premium Features Activas:*\n"
+            if player.premium_features.get('premium_status'):
+                stats_text += "• Status Premium\n"
+            if player.premium_features.get('auto_collector'):
+                stats_text += "• Auto-Recolector\n"
+            if player.premium_features.get('daily_bonus'):
+                stats_text += "• Bonus Diario\n"
+            if player.premium_features.get('lucky_tickets', 0) > 0:
+                stats_text += f"• 🎫 Lucky Tickets: {player.premium_features['lucky_tickets']}\n"
 
-            reply_markup = generar_botones(player.__dict__)
+        reply_markup = generar_botones(player)
 
-            if update.callback_query:
-                await update.callback_query.message.reply_text(
-                    stats_text,
-                    parse_mode='Markdown',
-                    reply_markup=reply_markup
-                )
-            else:
-                await update.message.reply_text(
-                    stats_text,
-                    parse_mode='Markdown',
-                    reply_markup=reply_markup
-                )
-                
-        finally:
-            session.close()
+        if update.callback_query:
+            await update.callback_query.message.reply_text(
+                stats_text,
+                parse_mode='Markdown',
+                reply_markup=reply_markup
+            )
+        else:
+            await update.message.reply_text(
+                stats_text,
+                parse_mode='Markdown',
+                reply_markup=reply_markup
+            )
             
     except Exception as e:
         logger.error(f"Error in stats command: {e}")
         if update.callback_query:
             await update.callback_query.message.reply_text(ERROR_MESSAGES["generic_error"])
         else:
-            await update.message.reply_text(ERROR_MESSAGES["generic_error"])
\ No newline at end of file
+            await update.message.reply_text(ERROR_MESSAGES["generic_error"])
+
+
+# Callback routes for button(); built once at import
+callback_router = (
+    CallbackRouter()
+    .exact("start", start)
+    .exact("recolectar", recolectar)
+    .exact("alimentar", alimentar)
+    .exact("estado", estado)
+    .exact("tienda", tienda)
+    .exact("combate", quick_combat)
+    .exact("auto_combate", auto_combat)
+    .exact("miniboss", miniboss_handler)
+    .exact("siguiente_miniboss", siguiente_miniboss)
+    .exact("retirarse_miniboss", retirarse_miniboss)
+    .exact("daily_reward", claim_daily_reward)
+    .exact("portal", portal_menu)
+    .exact("portal_spin_1", spin_portal)
+    .exact("portal_spin_10", spin_portal)
+    .exact("portal_instant", toggle_portal_instant)
+    .exact("ads_menu", ads_menu)
+    .exact("watch_ad", process_ad_watch)
+    .exact("premium_shop", premium_shop)
+    .exact("comprar_fragmentos", comprar_fragmentos)
+    .prefix("comprar_", comprar, str)
+    .prefix("get_premium_", get_premium_item, str)
+    .prefix("retry_miniboss_", retry_miniboss_battle)
+)
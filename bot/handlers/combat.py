@@ -1,12 +1,11 @@
 # handlers/combat.py
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes
 import random
 from datetime import datetime
 import logging
-from database.db.game_db import Session, Player
-from bot.utils.save_system import save_player
+from bot.utils.update_scope import load_player
 
 from bot.config.settings import (
     SUCCESS_MESSAGES, 
@@ -17,15 +16,17 @@ from bot.config.settings import (
     EXP_MULTIPLIER,
     GOLD_PER_LEVEL
 )
-from bot.utils.keyboard import generar_botones
+from bot.config.game_tables import game_tables
+from bot.utils.economy import economy
+from bot.utils.keyboard import generar_botones, cached_keyboard
 from bot.utils.save_system import save_game_data
 from bot.config.premium_settings import PREMIUM_FEATURES
 
-def calculate_rewards(enemy_level: int, is_premium: bool) -> dict:
+def calculate_rewards(enemy_level: int, is_premium: bool, rng=random) -> dict:
     """Calculate rewards for combat victory."""
     base_exp = int(10 * (EXP_MULTIPLIER ** enemy_level))
     base_gold_per_min = max(1, int(enemy_level * GOLD_PER_LEVEL))
-    coral_gain = random.randint(1, 3)
+    coral_gain = rng.randint(1, 3)
 
     # Premium users get 1.5x rewards
     if is_premium:
@@ -39,133 +40,158 @@ def calculate_rewards(enemy_level: int, is_premium: bool) -> dict:
         "coral": coral_gain
     }
 
-def exp_needed_for_level(level: int) -> int:
-    """Calculate experience needed for next level."""
-    return int(100 * (1.5 ** level))
+def level_combat_stats(stats: dict, level: int):
+    """Set the combat attributes of `level`."""
+    stats.update({
+        "hp": 100 + (level * 10),
+        "atk": 10 + (level * 2),
+        "mp": 50 + (level * 5),
+        "def_p": 5 + (level * 1.5),
+        "def_m": 5 + (level * 1.5),
+        "agi": 10 + (level * 1)
+    })
+
+def resolve_battles(stats: dict, is_premium: bool, count: int, rng=random) -> dict:
+    """
+    Fight `count` quick battles in a row, updating `stats` (EXP, level, coral,
+    battles_today) in place. Each battle uses the level and agility left by
+    the previous one, exactly like `count` separate quick combats.
+
+    Returns the aggregated result; `gold_per_min` is not applied here since
+    it belongs to the pet.
+    """
+    result = {
+        "battles": 0,
+        "victories": 0,
+        "exp": 0,
+        "gold_per_min": 0,
+        "coral": 0,
+        "start_level": stats["level"]
+    }
+    for _ in range(count):
+        # Generate enemy based on player level
+        enemy_level = max(0, stats["level"] - 1 + rng.randint(0, 2))
+
+        # Base 75% win rate + agility bonus
+        victory_chance = 0.75 + (stats["agi"] / 1000)
+        if rng.random() < victory_chance:
+            rewards = calculate_rewards(enemy_level, is_premium, rng)
+            result["victories"] += 1
+            result["exp"] += rewards["exp"]
+            result["gold_per_min"] += rewards["gold_per_min"]
+            result["coral"] += rewards["coral"]
+
+            stats["exp"] += rewards["exp"]
+            stats["fire_coral"] += rewards["coral"]
+            previous_level = stats["level"]
+            stats["level"], stats["exp"] = game_tables.level_up(stats["level"], stats["exp"])
+            if stats["level"] > previous_level:
+                level_combat_stats(stats, stats["level"])
+
+        stats["battles_today"] += 1
+        result["battles"] += 1
+    return result
+
+def auto_battle_seed(user_id: int, stats: dict) -> str:
+    """
+    Seed of an auto-battle: the same player, day and battle count always
+    fight the same battles, so a reported result can be replayed with
+    `resolve_battles(stats, is_premium, count, random.Random(seed))`.
+    """
+    return f"{user_id}:{stats['last_battle_date']}:{stats['battles_today']}"
+
+def battles_available(player) -> tuple:
+    """(battles left today, daily limit), resetting the count on a new day."""
+    stats = player.combat_stats
+    current_date = datetime.now().date()
+    if stats["last_battle_date"] != str(current_date):
+        stats["battles_today"] = 0
+        stats["last_battle_date"] = str(current_date)
+
+    # Premium users get 10 extra battles
+    max_battles = MAX_BATTLES_PER_DAY
+    if player.premium_features.get('premium_status', False):
+        max_battles += 10
+    return max(0, max_battles - stats["battles_today"]), max_battles
 
 async def quick_combat(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle quick combat encounters."""
     try:
         user_id = update.effective_user.id
         
-        # Create a new database session
-        session = Session()
+        # Retrieve player from database
+        player = await load_player(user_id)
         
-        try:
-            # Retrieve player from database
-            player = session.query(Player).filter(Player.id == user_id).first()
-            
-            if not player:
-                if update.callback_query:
-                    await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
-                else:
-                    await update.message.reply_text(ERROR_MESSAGES["no_game"])
-                return
-
-            stats = player.combat_stats
+        if not player:
+            if update.callback_query:
+                await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
+            else:
+                await update.message.reply_text(ERROR_MESSAGES["no_game"])
+            return
+
+        stats = player.combat_stats
+        
+        # Check pet level requirement
+        if player.mascota["nivel"] < PET_LEVEL_REQUIREMENT:
+            message = f"⚠️ Necesitas nivel {PET_LEVEL_REQUIREMENT} de mascota para acceder al Combate Rápido."
+            if update.callback_query:
+                await update.callback_query.message.reply_text(message, reply_markup=generar_botones())
+            else:
+                await update.message.reply_text(message, reply_markup=generar_botones())
+            return
         
-            # Check pet level requirement
-            if player.mascota["nivel"] < PET_LEVEL_REQUIREMENT:
-                message = f"⚠️ Necesitas nivel {PET_LEVEL_REQUIREMENT} de mascota para acceder al Combate Rápido."
-                if update.callback_query:
-                    await update.callback_query.message.reply_text(message, reply_markup=generar_botones())
-                else:
-                    await update.message.reply_text(message, reply_markup=generar_botones())
-                return
-            
-            # Reset battles count if it's a new day
-            current_date = datetime.now().date()
-            if stats["last_battle_date"] != str(current_date):
-                stats["battles_today"] = 0
-                stats["last_battle_date"] = str(current_date)
-
-            # Check max battles (considering premium status)
-            max_battles = MAX_BATTLES_PER_DAY
-            if player.premium_features.get('premium_status', False):
-                max_battles += 10  # Premium users get 10 extra battles
-
-            if stats["battles_today"] >= max_battles:
-                if update.callback_query:
-                    await update.callback_query.message.reply_text(
-                        f"⚠️ Ya has realizado todas tus batallas del día! ({max_battles})",
-                        reply_markup=generar_botones()
-                    )
-                else:
-                    await update.message.reply_text(
-                        f"⚠️ Ya has realizado todas tus batallas del día! ({max_battles})",
-                        reply_markup=generar_botones()
-                    )
-                return
-
-            # Generate enemy based on player level
-            player_level = stats["level"]
-            enemy_level = max(0, player_level - 1 + random.randint(0, 2))
-            
-            # Calculate battle result (base 75% win rate + agility bonus)
-            victory_chance = 0.75 + (stats["agi"] / 1000)  # Agility gives small bonus
-            victory = random.random() < victory_chance
-
-            if victory:
-                # Calculate rewards
-                is_premium = player.premium_features.get('premium_status', False)
-                rewards = calculate_rewards(enemy_level, is_premium)
-
-                # Update stats
-                stats["exp"] += rewards["exp"]
-                player.mascota["oro_hora"] += rewards["gold_per_min"]
-                stats["fire_coral"] += rewards["coral"]
-
-                # Level up check
-                while stats["exp"] >= exp_needed_for_level(stats["level"]):
-                    stats["exp"] -= exp_needed_for_level(stats["level"])
-                    stats["level"] += 1
-                    
-                    # Update combat stats on level up
-                    level = stats["level"]
-                    stats.update({
-                        "hp": 100 + (level * 10),
-                        "atk": 10 + (level * 2),
-                        "mp": 50 + (level * 5),
-                        "def_p": 5 + (level * 1.5),
-                        "def_m": 5 + (level * 1.5),
-                        "agi": 10 + (level * 1)
-                    })
-
-                message = (
-                    f"🗡 ¡Victoria!\n"
-                    f"💫 EXP ganada: {rewards['exp']}\n"
-                    f"💰 Oro por minuto +{rewards['gold_per_min']}\n"
-                    f"🌺 Coral de Fuego +{rewards['coral']}"
+        # Reset battles count if it's a new day and check the daily limit
+        battles_left, max_battles = battles_available(player)
+        if battles_left == 0:
+            if update.callback_query:
+                await update.callback_query.message.reply_text(
+                    f"⚠️ Ya has realizado todas tus batallas del día! ({max_battles})",
+                    reply_markup=generar_botones()
                 )
-
-                if stats["level"] > player_level:  # If leveled up
-                    message += f"\n\n🎉 ¡Subiste al nivel {stats['level']}!"
             else:
-                message = "❌ ¡Derrota! Mejor suerte la próxima vez."
+                await update.message.reply_text(
+                    f"⚠️ Ya has realizado todas tus batallas del día! ({max_battles})",
+                    reply_markup=generar_botones()
+                )
+            return
 
-            # Update battles count
-            stats["battles_today"] += 1
-            battles_left = max_battles - stats["battles_today"]
-            message += f"\n\n⚔️ Batallas restantes hoy: {battles_left}"
+        # Settle production before the reward raises the gold rate
+        economy.apply(player)
 
-            # Update player in the database
-            player.combat_stats = stats
-            session.commit()
+        is_premium = player.premium_features.get('premium_status', False)
+        result = resolve_battles(stats, is_premium, 1)
+        player.mascota["oro_hora"] += result["gold_per_min"]
 
-            # Create reply keyboard
-            keyboard = [
-                [InlineKeyboardButton("⚔️ Otro Combate", callback_data="combate")],
-                [InlineKeyboardButton("🏠 Volver", callback_data="start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+        if result["victories"]:
+            message = (
+                f"🗡 ¡Victoria!\n"
+                f"💫 EXP ganada: {result['exp']}\n"
+                f"💰 Oro por minuto +{result['gold_per_min']}\n"
+                f"🌺 Coral de Fuego +{result['coral']}"
+            )
 
-            if update.callback_query:
-                await update.callback_query.message.reply_text(message, reply_markup=reply_markup)
-            else:
-                await update.message.reply_text(message, reply_markup=reply_markup)
+            if stats["level"] > result["start_level"]:  # If leveled up
+                message += f"\n\n🎉 ¡Subiste al nivel {stats['level']}!"
+        else:
+            message = "❌ ¡Derrota! Mejor suerte la próxima vez."
+
+        battles_left -= 1
+        message += f"\n\n⚔️ Batallas restantes hoy: {battles_left}"
+
+        # Saved when the update scope ends
+        player.combat_stats = stats
 
-        finally:
-            session.close()
+        # Create reply keyboard
+        keyboard = [[("⚔️ Otro Combate", "combate")]]
+        if battles_left > 1:
+            keyboard.append([(f"🤖 Auto-batalla ({battles_left})", "auto_combate")])
+        keyboard.append([("🏠 Volver", "start")])
+        reply_markup = cached_keyboard(*keyboard)
+
+        if update.callback_query:
+            await update.callback_query.message.reply_text(message, reply_markup=reply_markup)
+        else:
+            await update.message.reply_text(message, reply_markup=reply_markup)
 
     except Exception as e:
         logger.error(f"Error in quick_combat function: {e}")
@@ -174,60 +200,112 @@ async def quick_combat(update: Update, context: ContextTypes.DEFAULT_TYPE):
         else:
             await update.message.reply_text(ERROR_MESSAGES["generic_error"], reply_markup=generar_botones())
 
+async def auto_combat(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Fight every remaining battle of the day at once and reply with one summary."""
+    try:
+        user_id = update.effective_user.id
+        player = await load_player(user_id)
+        if not player:
+            await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
+            return
+
+        if player.mascota["nivel"] < PET_LEVEL_REQUIREMENT:
+            await update.callback_query.message.reply_text(
+                f"⚠️ Necesitas nivel {PET_LEVEL_REQUIREMENT} de mascota para acceder al Combate Rápido.",
+                reply_markup=generar_botones()
+            )
+            return
+
+        stats = player.combat_stats
+        battles_left, max_battles = battles_available(player)
+        if battles_left == 0:
+            await update.callback_query.message.reply_text(
+                f"⚠️ Ya has realizado todas tus batallas del día! ({max_battles})",
+                reply_markup=generar_botones()
+            )
+            return
+
+        # Settle production before the rewards raise the gold rate
+        economy.apply(player)
+
+        is_premium = player.premium_features.get('premium_status', False)
+        seed = auto_battle_seed(user_id, stats)
+        logger.info(f"Auto-battle of {user_id}: {battles_left} battles, seed {seed!r}")
+        result = resolve_battles(stats, is_premium, battles_left, random.Random(seed))
+        player.mascota["oro_hora"] += result["gold_per_min"]
+
+        message = (
+            f"🤖 Auto-batalla completada\n\n"
+            f"⚔️ Batallas: {result['battles']}\n"
+            f"🗡 Victorias: {result['victories']}\n"
+            f"❌ Derrotas: {result['battles'] - result['victories']}\n\n"
+            f"💫 EXP ganada: {result['exp']}\n"
+            f"💰 Oro por minuto +{result['gold_per_min']}\n"
+            f"🌺 Coral de Fuego +{result['coral']}"
+        )
+        if stats["level"] > result["start_level"]:
+            message += f"\n\n🎉 ¡Subiste al nivel {stats['level']}!"
+        message += "\n\n⚔️ Batallas restantes hoy: 0"
+
+        # Saved when the update scope ends
+        player.combat_stats = stats
+
+        await update.callback_query.message.reply_text(
+            message,
+            reply_markup=cached_keyboard([("🏠 Volver", "start")])
+        )
+
+    except Exception as e:
+        logger.error(f"Error in auto_combat: {e}")
+        await update.callback_query.message.reply_text(ERROR_MESSAGES["generic_error"], reply_markup=generar_botones())
+
 async def view_combat_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """View detailed combat statistics."""
     try:
         user_id = update.effective_user.id
         
-        # Create a new database session
-        session = Session()
+        # Fetch player from the database
+        player = await load_player(user_id)
         
-        try:
-            # Fetch player from the database
-            player = session.query(Player).filter(Player.id == user_id).first()
-            
-            if not player:
-                if update.callback_query:
-                    await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
-                else:
-                    await update.message.reply_text(ERROR_MESSAGES["no_game"])
-                return
-
-            stats = player.combat_stats
-            
-            message = (
-                "⚔️ *Estadísticas de Combate*\n\n"
-                f"📊 Nivel: {stats['level']}\n"
-                f"❤️ HP: {stats['hp']}\n"
-                f"⚔️ ATK: {stats['atk']}\n"
-                f"🌟 MP: {stats['mp']}\n"
-                f"🛡️ DEF Física: {stats['def_p']}\n"
-                f"✨ DEF Mágica: {stats['def_m']}\n"
-                f"💨 Agilidad: {stats['agi']}\n"
-                f"💪 Aguante: {stats['sta']}\n"
-                f"🌺 Coral de Fuego: {stats['fire_coral']}\n\n"
-                f"📈 EXP: {stats['exp']}/{exp_needed_for_level(stats['level'])}\n"
-                f"⚔️ Batallas hoy: {stats['battles_today']}/{MAX_BATTLES_PER_DAY}"
-            )
-
-            keyboard = [[InlineKeyboardButton("🔙 Volver", callback_data="start")]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
+        if not player:
             if update.callback_query:
-                await update.callback_query.message.reply_text(
-                    message,
-                    parse_mode='Markdown',
-                    reply_markup=reply_markup
-                )
+                await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
             else:
-                await update.message.reply_text(
-                    message,
-                    parse_mode='Markdown',
-                    reply_markup=reply_markup
-                )
+                await update.message.reply_text(ERROR_MESSAGES["no_game"])
+            return
 
-        finally:
-            session.close()
+        stats = player.combat_stats
+        
+        message = (
+            "⚔️ *Estadísticas de Combate*\n\n"
+            f"📊 Nivel: {stats['level']}\n"
+            f"❤️ HP: {stats['hp']}\n"
+            f"⚔️ ATK: {stats['atk']}\n"
+            f"🌟 MP: {stats['mp']}\n"
+            f"🛡️ DEF Física: {stats['def_p']}\n"
+            f"✨ DEF Mágica: {stats['def_m']}\n"
+            f"💨 Agilidad: {stats['agi']}\n"
+            f"💪 Aguante: {stats['sta']}\n"
+            f"🌺 Coral de Fuego: {stats['fire_coral']}\n\n"
+            f"📈 EXP: {stats['exp']}/{game_tables.exp_needed(stats['level'])}\n"
+            f"⚔️ Batallas hoy: {stats['battles_today']}/{MAX_BATTLES_PER_DAY}"
+        )
+
+        keyboard = [[("🔙 Volver", "start")]]
+        reply_markup = cached_keyboard(*keyboard)
+
+        if update.callback_query:
+            await update.callback_query.message.reply_text(
+                message,
+                parse_mode='Markdown',
+                reply_markup=reply_markup
+            )
+        else:
+            await update.message.reply_text(
+                message,
+                parse_mode='Markdown',
+                reply_markup=reply_markup
+            )
 
     except Exception as e:
         logger.error(f"Error in view_combat_stats: {e}")
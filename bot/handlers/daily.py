@@ -1,5 +1,5 @@
 # handlers/daily.py
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes
 import time
 import random
@@ -11,14 +11,37 @@ from bot.config.settings import (
     DAILY_REWARDS,
     SUCCESS_MESSAGES,
     ERROR_MESSAGES,
+    STREAK_RESET_JOB,
     logger
 )
-from bot.utils.keyboard import generar_botones
+from bot.config.game_tables import game_tables
+from bot.utils.keyboard import generar_botones, cached_keyboard
+from bot.utils.economy import economy
 from bot.utils.save_system import save_game_data
-from bot.config.premium_settings import PREMIUM_FEATURES
 from database.db.game_db import Session
+from database.db.executor import run_db
+from bot.utils.update_scope import load_player, atomic
+from bot.utils.player_store import player_store
+from database.db.json_ops import json_set_key
 from database.models import Player
 
+def current_streak(daily_reward: dict, now: datetime = None) -> int:
+    """
+    Streak as seen at `now`, derived from the last claim.
+
+    The streak stays alive while the last claim was today or yesterday (CET);
+    otherwise it is broken and the next claim starts again at 1. Deriving it
+    on read replaces the periodic reset job.
+    """
+    if not daily_reward or not daily_reward.get('last_claim'):
+        return 0
+    cet = pytz.timezone('CET')
+    now = now or datetime.now(cet)
+    last_claim_date = datetime.fromtimestamp(daily_reward['last_claim'], cet).date()
+    if last_claim_date >= (now - timedelta(days=1)).date():
+        return daily_reward.get('streak', 1)
+    return 0
+
 def get_next_midnight_cet():
     cet = pytz.timezone('CET')
     now = datetime.now(cet)
@@ -27,144 +50,135 @@ def get_next_midnight_cet():
         midnight += timedelta(days=1)
     return midnight
 
+def _claim_daily(player, current_time: datetime):
+    """Claim step (re-run on write conflicts): the reward message, or None if already claimed today."""
+    # Initialize daily reward data if it doesn't exist
+    if not player.daily_reward:
+        player.daily_reward = {
+            'last_claim': 0,
+            'streak': 1,
+            'last_weekly_tickets': 0
+        }
+
+    if datetime.fromtimestamp(player.daily_reward['last_claim'], current_time.tzinfo).date() == current_time.date():
+        return None
+
+    # Settle offline production before the reward refills energy
+    economy.apply(player)
+
+    # Continue the streak if it is still alive, otherwise start over
+    player.daily_reward['streak'] = current_streak(player.daily_reward, current_time) + 1
+
+    # Determine reward type and multipliers
+    is_premium = player.premium_features.get('premium_status', False)
+    has_daily_bonus = player.premium_features.get('daily_bonus', False)
+    reward_type = "premium" if (is_premium or has_daily_bonus) else "basic"
+    rewards = DAILY_REWARDS[reward_type]
+
+    # Get appropriate streak bonuses
+    premium_streak = is_premium or has_daily_bonus
+    streak_bonuses = DAILY_REWARDS['premium_streak_bonuses'] if premium_streak else DAILY_REWARDS['streak_bonuses']
+
+    # Calculate streak multiplier
+    multiplier = game_tables.streak_multiplier(player.daily_reward['streak'], premium_streak)
+
+    # Calculate rewards
+    oro = int(random.randint(*rewards['oro']) * multiplier)
+    coral = int(random.randint(*rewards['coral']) * multiplier)
+    comida = int(random.randint(*rewards['comida']) * multiplier)
+    exp = int(random.randint(*rewards['exp']) * multiplier)
+    tickets = int(random.randint(*rewards['fragmento_del_destino']) * multiplier)
+
+    # Update player stats
+    player.mascota['oro'] += oro
+    player.combat_stats['fire_coral'] += coral
+    player.comida += comida
+    player.mascota['energia'] = rewards['energia']  # Full energy restore
+    player.combat_stats['exp'] += exp
+    player.fragmento_del_destino = player.fragmento_del_destino + tickets
+
+    # Check for weekly premium tickets
+    premium_ticket_message = ""
+    if has_daily_bonus:
+        last_weekly = player.daily_reward.get('last_weekly_tickets', 0)
+        if current_time.timestamp() - last_weekly >= DAILY_REWARDS['weekly_reset']:
+            player.premium_features['tickets'] += 3
+            player.daily_reward['last_weekly_tickets'] = current_time.timestamp()
+            premium_ticket_message = SUCCESS_MESSAGES["weekly_tickets"]
+
+    # Update last claim time
+    player.daily_reward['last_claim'] = current_time.timestamp()
+
+    # Prepare response message
+    message = SUCCESS_MESSAGES["daily_reward"].format(
+        oro, coral, comida, exp, tickets,
+        "1 día" if player.daily_reward['streak'] == 1 else f"{player.daily_reward['streak']} días"
+    )
+    if multiplier > 1:
+        message += "\n" + SUCCESS_MESSAGES["streak_bonus"].format(multiplier)
+    if is_premium or has_daily_bonus:
+        message += "\n" + SUCCESS_MESSAGES["daily_reward_premium"].format(
+            premium_ticket_message if premium_ticket_message else ""
+        )
+
+    # Add streak progress information
+    next_streak_bonus = game_tables.next_streak_bonus(player.daily_reward['streak'], premium_streak)
+    if next_streak_bonus:
+        days_remaining = next_streak_bonus - player.daily_reward['streak']
+        message += f"\n\n🔥 {days_remaining} días más para el siguiente bonus de racha (x{streak_bonuses[next_streak_bonus]})"
+
+    return message
+
 async def claim_daily_reward(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle daily reward claims."""
     try:
         user_id = update.effective_user.id
         
-        # Create a new database session
-        session = Session()
+        # Fetch player from the database
+        player = await load_player(user_id)
         
-        try:
-            # Fetch player from the database
-            player = session.query(Player).filter(Player.id == user_id).first()
-            
-            if not player:
-                if update.callback_query:
-                    await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
-                else:
-                    await update.message.reply_text(ERROR_MESSAGES["no_game"])
-                return
-
-            # Initialize daily reward data if it doesn't exist
-            if not player.daily_reward:
-                player.daily_reward = {
-                    'last_claim': 0,
-                    'streak': 1,
-                    'last_weekly_tickets': 0
-                }
-
-            # Get CET timezone and current time
-            cet = pytz.timezone('CET')
-            current_time = datetime.now(cet)
-            last_claim_dt = datetime.fromtimestamp(player.daily_reward['last_claim'], cet)
-
-            # Check if already claimed today
-            if last_claim_dt.date() == current_time.date():
-                next_reset = get_next_midnight_cet()
-                time_until_reset = next_reset - current_time
-                hours = int(time_until_reset.total_seconds() // 3600)
-                minutes = int((time_until_reset.total_seconds() % 3600) // 60)
-                
-                if update.callback_query:
-                    await update.callback_query.message.reply_text(
-                        ERROR_MESSAGES["daily_reward_wait"].format(hours, minutes)
-                    )
-                else:
-                    await update.message.reply_text(
-                        ERROR_MESSAGES["daily_reward_wait"].format(hours, minutes)
-                    )
-                return
-
-            # Check streak
-            yesterday = (current_time - timedelta(days=1)).date()
-            if last_claim_dt.date() != yesterday:
-                player.daily_reward['streak'] = 1
+        if not player:
+            if update.callback_query:
+                await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
             else:
-                player.daily_reward['streak'] += 1
-
-            # Determine reward type and multipliers
-            is_premium = player.premium_features.get('premium_status', False)
-            has_daily_bonus = player.premium_features.get('daily_bonus', False)
-            reward_type = "premium" if (is_premium or has_daily_bonus) else "basic"
-            rewards = DAILY_REWARDS[reward_type]
-
-            # Get appropriate streak bonuses
-            streak_bonuses = DAILY_REWARDS['premium_streak_bonuses'] if (is_premium or has_daily_bonus) else DAILY_REWARDS['streak_bonuses']
-
-            # Calculate streak multiplier
-            multiplier = 1.0
-            for days, bonus in sorted(streak_bonuses.items(), reverse=True):
-                if player.daily_reward['streak'] >= days:
-                    multiplier = bonus
-                    break
-
-            # Calculate rewards
-            oro = int(random.randint(*rewards['oro']) * multiplier)
-            coral = int(random.randint(*rewards['coral']) * multiplier)
-            comida = int(random.randint(*rewards['comida']) * multiplier)
-            exp = int(random.randint(*rewards['exp']) * multiplier)
-            tickets = int(random.randint(*rewards['fragmento_del_destino']) * multiplier)
-
-            # Update player stats
-            player.mascota['oro'] += oro
-            player.combat_stats['fire_coral'] += coral
-            player.comida += comida
-            player.mascota['energia'] = rewards['energia']  # Full energy restore
-            player.combat_stats['exp'] += exp
-            player.fragmento_del_destino = player.fragmento_del_destino + tickets
-
-            # Check for weekly premium tickets
-            premium_ticket_message = ""
-            if has_daily_bonus:
-                last_weekly = player.daily_reward.get('last_weekly_tickets', 0)
-                if current_time.timestamp() - last_weekly >= DAILY_REWARDS['weekly_reset']:
-                    player.premium_features['tickets'] += 3
-                    player.daily_reward['last_weekly_tickets'] = current_time.timestamp()
-                    premium_ticket_message = SUCCESS_MESSAGES["weekly_tickets"]
-
-            # Update last claim time
-            player.daily_reward['last_claim'] = current_time.timestamp()
-
-            # Save changes to the database
-            session.commit()
-
-            # Prepare response message
-            message = SUCCESS_MESSAGES["daily_reward"].format(
-                oro, coral, comida, exp, tickets,
-                "1 día" if player.daily_reward['streak'] == 1 else f"{player.daily_reward['streak']} días"
-            )
-            if multiplier > 1:
-                message += "\n" + SUCCESS_MESSAGES["streak_bonus"].format(multiplier)
-            if is_premium or has_daily_bonus:
-                message += "\n" + SUCCESS_MESSAGES["daily_reward_premium"].format(
-                    premium_ticket_message if premium_ticket_message else ""
-                )
+                await update.message.reply_text(ERROR_MESSAGES["no_game"])
+            return
 
-            # Add streak progress information
-            next_streak_bonus = None
-            for days in sorted(streak_bonuses.keys()):
-                if days > player.daily_reward['streak']:
-                    next_streak_bonus = days
-                    break
-            if next_streak_bonus:
-                days_remaining = next_streak_bonus - player.daily_reward['streak']
-                message += f"\n\n🔥 {days_remaining} días más para el siguiente bonus de racha (x{streak_bonuses[next_streak_bonus]})"
-
-            # Create keyboard with return button
-            keyboard = [
-                [InlineKeyboardButton("📊 Ver Estado", callback_data="estado")],
-                [InlineKeyboardButton("🏠 Volver al Menú", callback_data="start")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+        # Get CET timezone and current time
+        cet = pytz.timezone('CET')
+        current_time = datetime.now(cet)
 
+        # Claim and write at once (compare-and-swap, retried on conflicts)
+        player, message = await atomic(user_id, lambda fresh: _claim_daily(fresh, current_time))
+
+        # Check if already claimed today
+        if message is None:
+            next_reset = get_next_midnight_cet()
+            time_until_reset = next_reset - current_time
+            hours = int(time_until_reset.total_seconds() // 3600)
+            minutes = int((time_until_reset.total_seconds() % 3600) // 60)
+            
             if update.callback_query:
-                await update.callback_query.message.reply_text(message, reply_markup=reply_markup)
+                await update.callback_query.message.reply_text(
+                    ERROR_MESSAGES["daily_reward_wait"].format(hours, minutes)
+                )
             else:
-                await update.message.reply_text(message, reply_markup=reply_markup)
+                await update.message.reply_text(
+                    ERROR_MESSAGES["daily_reward_wait"].format(hours, minutes)
+                )
+            return
 
-        finally:
-            session.close()
+        # Create keyboard with return button
+        keyboard = [
+            [("📊 Ver Estado", "estado")],
+            [("🏠 Volver al Menú", "start")]
+        ]
+        reply_markup = cached_keyboard(*keyboard)
+
+        if update.callback_query:
+            await update.callback_query.message.reply_text(message, reply_markup=reply_markup)
+        else:
+            await update.message.reply_text(message, reply_markup=reply_markup)
 
     except Exception as e:
         logger.error(f"Error in daily_reward: {e}")
@@ -173,49 +187,69 @@ async def claim_daily_reward(update: Update, context: ContextTypes.DEFAULT_TYPE)
         else:
             await update.message.reply_text(ERROR_MESSAGES["daily_reward_error"])
 
+def reset_broken_streaks(session, now: datetime = None) -> int:
+    """
+    Persist broken streaks with a single set-based UPDATE.
+
+    Streaks are derived lazily by `current_streak`, so this is only needed
+    when the stored value must be accurate for analytics queries.
+    """
+    cet = pytz.timezone('CET')
+    now = now or datetime.now(cet)
+    start_of_yesterday = (now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    streak_reset = json_set_key(session.bind.dialect.name, Player.daily_reward, 'streak', '1')
+    if streak_reset is None:
+        logger.warning("Streak reset UPDATE not supported on this database")
+        return 0
+
+    # No version bump: the stored streak is only a cache of `current_streak`,
+    # so a cached copy writing its own value over it loses nothing
+    updated = session.query(Player).filter(
+        Player.daily_reward['last_claim'].as_float() < start_of_yesterday.timestamp(),
+        Player.daily_reward['streak'].as_integer() != 1
+    ).update({Player.daily_reward: streak_reset}, synchronize_session=False)
+    session.commit()
+    return updated
+
 async def check_daily_reset(context: ContextTypes.DEFAULT_TYPE):
-    """Background task to check and reset daily rewards."""
+    """Optional analytics job: store reset streaks for players who missed a day."""
     try:
-        cet = pytz.timezone('CET')
-        current_time = datetime.now(cet)
-        
         session = Session()
         try:
-            players = session.query(Player).all()
-            
-            for player in players:
-                if player.daily_reward:
-                    last_claim_dt = datetime.fromtimestamp(player.daily_reward['last_claim'], cet)
-                    yesterday = (current_time - timedelta(days=1)).date()
-                    
-                    if last_claim_dt.date() < yesterday:
-                        player.daily_reward['streak'] = 1
-            
-            session.commit()
+            updated = await run_db(reset_broken_streaks, session)
+            logger.info(f"Daily reset: {updated} broken streaks stored")
         finally:
             session.close()
     except Exception as e:
         logger.error(f"Error in daily reset check: {e}")
 
-async def check_weekly_tickets(context: ContextTypes.DEFAULT_TYPE):
-    """Check and distribute weekly tickets"""
-    current_time = datetime.now().timestamp()
-    
+def _premium_player_ids() -> list:
     session = Session()
     try:
-        players = session.query(Player).filter(Player.premium_features['premium_status'].astext == 'true').all()
-        
-        for player in players:
-            premium_features = player.premium_features
-            last_distribution = premium_features.get('last_ticket_distribution', 0)
-            if current_time - last_distribution >= PREMIUM_FEATURES['weekly_reset']:
-                await distribute_weekly_tickets(context, player.id)
-                premium_features['last_ticket_distribution'] = current_time
-        
-        session.commit()
+        return [row.id for row in session.query(Player.id).filter(Player.premium_features['premium_status'].as_boolean())]
     finally:
         session.close()
 
+async def check_weekly_tickets(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Check and distribute weekly tickets.
+
+    Players are changed through the player store and written by its next
+    flush, like any handler change, so the job never races cached copies.
+    """
+    current_time = datetime.now().timestamp()
+    try:
+        distributed = 0
+        for user_id in await run_db(_premium_player_ids):
+            player = await player_store.aget(user_id)
+            if player is not None and distribute_weekly_tickets(player, current_time):
+                player_store.mark_dirty(user_id)
+                distributed += 1
+        logger.info(f"Weekly tickets distributed to {distributed} players")
+    except Exception as e:
+        logger.error(f"Error in weekly tickets check: {e}")
+
 def setup_daily_handlers(application):
     """Set up daily reward related handlers and jobs."""
     cet = pytz.timezone('CET')
@@ -226,13 +260,14 @@ def setup_daily_handlers(application):
     if now > midnight:
         midnight += timedelta(days=1)
     
-    # Add job to check daily resets at midnight CET
-    application.job_queue.run_daily(
-        check_daily_reset,
-        time=midnight.time(),
-        days=(0, 1, 2, 3, 4, 5, 6),
-        timezone=cet
-    )
+    # Streaks are derived on claim; storing resets is only for analytics
+    if STREAK_RESET_JOB:
+        application.job_queue.run_daily(
+            check_daily_reset,
+            time=midnight.time(),
+            days=(0, 1, 2, 3, 4, 5, 6),
+            timezone=cet
+        )
     
     # Add job to check weekly tickets distribution
     application.job_queue.run_daily(
@@ -1,5 +1,5 @@
 # handlers/miniboss.py
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes
 import random
 import logging
@@ -9,34 +9,24 @@ from bot.config.settings import (
     ERROR_MESSAGES, 
     logger,
     COMBAT_LEVEL_REQUIREMENT,
-    MIN_MINIBOSS_GOLD,
-    calculate_miniboss_probabilities
+    MIN_MINIBOSS_GOLD
 )
-from bot.utils.keyboard import generar_botones
+from bot.config.game_tables import game_tables
+from bot.utils.keyboard import generar_botones, cached_keyboard
 from bot.utils.save_system import save_game_data
 from bot.config.premium_settings import PREMIUM_FEATURES
 from bot.handlers.ads import retry_combat_ad
-from database.db.game_db import get_player, save_player
+from bot.utils.update_scope import load_player
+from bot.utils.miniboss_runs import miniboss_runs
+from bot.handlers.combat import level_combat_stats
 from bot.utils.save_system import initialize_new_player
 
-# Store active miniboss battles
-miniboss_estado = {}
+MINIBOSS_NO_RUN = "❌ No tienes ningún combate de MiniBoss en curso."
 
 # MiniBoss attempts limits
 MAX_MINIBOSS_ATTEMPTS = 3  # Regular users
 MAX_PREMIUM_MINIBOSS_ATTEMPTS = 10  # Premium users
 
-def inicializar_miniboss(user_id):
-    """Initialize a new miniboss battle sequence."""
-    return {
-        "enemigo_actual": 1,
-        "recompensas": {
-            "oro": 0,
-            "coral": 0,
-            "exp": 0
-        }
-    }
-
 def check_miniboss_attempts(player) -> bool:
     """Check if player has attempts remaining."""
     # Initialize miniboss data if not exists
@@ -109,45 +99,38 @@ async def miniboss_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle miniboss battle initiation."""
     try:
         user_id = update.effective_user.id
-        session = Session()
-        try:
-            player = get_player(session, user_id)
-            if not player:
-                await update.effective_message.reply_text(ERROR_MESSAGES["no_game"])
-                return
-
-            # Check combat level requirement
-            if player.combat_stats["level"] < COMBAT_LEVEL_REQUIREMENT:
-                mensaje = f"⚠️ Necesitas nivel de combate {COMBAT_LEVEL_REQUIREMENT} para acceder al MiniBoss."
-                await update.effective_message.reply_text(mensaje, reply_markup=generar_botones(player))
-                return
-
-            # Check daily attempts
-            if not check_miniboss_attempts(player):
-                attempts_max = MAX_PREMIUM_MINIBOSS_ATTEMPTS if player.premium_features.get('premium_status', False) else MAX_MINIBOSS_ATTEMPTS
-                mensaje = f"⚠️ Has alcanzado el límite de {attempts_max} intentos diarios de MiniBoss."
-                await update.effective_message.reply_text(mensaje, reply_markup=generar_botones(player))
-                return
-
-            # Check if player has enough gold
-            if player.mascota["oro"] < MIN_MINIBOSS_GOLD:
-                mensaje = f"⚠️ Necesitas {MIN_MINIBOSS_GOLD} de oro para iniciar una batalla contra MiniBoss!"
-                await update.effective_message.reply_text(mensaje, reply_markup=generar_botones(player))
-                return
-
-            # Initialize miniboss battle and increment attempts
-            miniboss_estado = inicializar_miniboss(user_id)
-            player.mascota["oro"] -= MIN_MINIBOSS_GOLD  # Charge entry fee
-            player.miniboss_stats['attempts_today'] += 1
-            
-            # Update player in database
-            update_player(session, player)
-
-            # Start first battle
-            await procesar_combate_miniboss(update, context, player, miniboss_estado)
-
-        finally:
-            session.close()
+        player = await load_player(user_id)
+        if not player:
+            await update.effective_message.reply_text(ERROR_MESSAGES["no_game"])
+            return
+
+        # Check combat level requirement
+        if player.combat_stats["level"] < COMBAT_LEVEL_REQUIREMENT:
+            mensaje = f"⚠️ Necesitas nivel de combate {COMBAT_LEVEL_REQUIREMENT} para acceder al MiniBoss."
+            await update.effective_message.reply_text(mensaje, reply_markup=generar_botones(player))
+            return
+
+        # Check daily attempts
+        if not check_miniboss_attempts(player):
+            attempts_max = MAX_PREMIUM_MINIBOSS_ATTEMPTS if player.premium_features.get('premium_status', False) else MAX_MINIBOSS_ATTEMPTS
+            mensaje = f"⚠️ Has alcanzado el límite de {attempts_max} intentos diarios de MiniBoss."
+            await update.effective_message.reply_text(mensaje, reply_markup=generar_botones(player))
+            return
+
+        # Check if player has enough gold
+        if player.mascota["oro"] < MIN_MINIBOSS_GOLD:
+            mensaje = f"⚠️ Necesitas {MIN_MINIBOSS_GOLD} de oro para iniciar una batalla contra MiniBoss!"
+            await update.effective_message.reply_text(mensaje, reply_markup=generar_botones(player))
+            return
+
+        # Initialize miniboss battle and increment attempts
+        run = miniboss_runs.start(user_id)
+        miniboss_runs.save(player, run)
+        player.mascota["oro"] -= MIN_MINIBOSS_GOLD  # Charge entry fee
+        player.miniboss_stats['attempts_today'] += 1
+        
+        # Start first battle
+        await procesar_combate_miniboss(update, context)
 
     except Exception as e:
         logger.error(f"Error in miniboss_handler: {e}")
@@ -157,58 +140,52 @@ async def procesar_combate_miniboss(update: Update, context: ContextTypes.DEFAUL
     """Process each miniboss battle stage."""
     try:
         user_id = update.effective_user.id
-        session = Session()
-        try:
-            player = get_player(session, user_id)
-            if not player:
-                await update.effective_message.reply_text(ERROR_MESSAGES["no_game"])
-                return
-
-            estado_actual = player.miniboss_stats
-            enemigo_actual = estado_actual["enemigo_actual"]
-            
-            # Get victory probability based on combat level
-            combat_level = player.combat_stats["level"]
-            probabilities = calculate_miniboss_probabilities(combat_level)
-            victoria = random.random() < probabilities[enemigo_actual]
+        player = await load_player(user_id)
+        if not player:
+            await update.effective_message.reply_text(ERROR_MESSAGES["no_game"])
+            return
+
+        run = await miniboss_runs.aget(user_id)
+        if run is None:
+            await update.effective_message.reply_text(MINIBOSS_NO_RUN, reply_markup=generar_botones())
+            return
+        enemigo_actual = run.enemy
+        
+        # Get victory probability based on combat level
+        combat_level = player.combat_stats["level"]
+        probabilities = game_tables.miniboss_odds(combat_level)
+        victoria = random.random() < probabilities[enemigo_actual]
+        
+        if victoria:
+            # Calculate and add rewards
+            is_premium = player.premium_features.get('premium_status', False)
+            run.add_rewards(calcular_recompensas(enemigo_actual, is_premium))
+            miniboss_runs.touch(run)
+            miniboss_runs.save(player, run)
             
-            if victoria:
-                # Calculate and add rewards
-                is_premium = player.premium_features.get('premium_status', False)
-                recompensas = calcular_recompensas(enemigo_actual, is_premium)
-                estado_actual["recompensas"]["oro"] += recompensas["oro"]
-                estado_actual["recompensas"]["coral"] += recompensas["coral"]
-                estado_actual["recompensas"]["exp"] += recompensas["exp"]
-                
-                if enemigo_actual == 5:  # Victory against final boss
-                    await finalizar_miniboss(update, context, player, victoria=True)
-                else:
-                    # Show current rewards and options
-                    mensaje = (
-                        f"🗡 ¡Victoria contra el enemigo {enemigo_actual}!\n\n"
-                        f"Recompensas acumuladas:\n"
-                        f"💰 Oro: {estado_actual['recompensas']['oro']}\n"
-                        f"🌺 Coral de Fuego: {estado_actual['recompensas']['coral']}\n"
-                        f"💫 EXP: {estado_actual['recompensas']['exp']}\n\n"
-                        f"¿Qué deseas hacer?"
-                    )
-                    keyboard = [
-                        [InlineKeyboardButton("⚔️ Siguiente Combate", callback_data="siguiente_miniboss")],
-                        [InlineKeyboardButton("🏃 Retirarse (50% recompensas)", callback_data="retirarse_miniboss")]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    if update.callback_query:
-                        await update.callback_query.message.reply_text(mensaje, reply_markup=reply_markup)
-                    else:
-                        await update.message.reply_text(mensaje, reply_markup=reply_markup)
+            if enemigo_actual == 5:  # Victory against final boss
+                await finalizar_miniboss(update, context, player, victoria=True)
             else:
-                await finalizar_miniboss(update, context, player, victoria=False)
-
-            # Update player in database
-            update_player(session, player)
-
-        finally:
-            session.close()
+                # Show current rewards and options
+                mensaje = (
+                    f"🗡 ¡Victoria contra el enemigo {enemigo_actual}!\n\n"
+                    f"Recompensas acumuladas:\n"
+                    f"💰 Oro: {run.oro}\n"
+                    f"🌺 Coral de Fuego: {run.coral}\n"
+                    f"💫 EXP: {run.exp}\n\n"
+                    f"¿Qué deseas hacer?"
+                )
+                keyboard = [
+                    [("⚔️ Siguiente Combate", "siguiente_miniboss")],
+                    [("🏃 Retirarse (50% recompensas)", "retirarse_miniboss")]
+                ]
+                reply_markup = cached_keyboard(*keyboard)
+                if update.callback_query:
+                    await update.callback_query.message.reply_text(mensaje, reply_markup=reply_markup)
+                else:
+                    await update.message.reply_text(mensaje, reply_markup=reply_markup)
+        else:
+            await finalizar_miniboss(update, context, player, victoria=False)
 
     except Exception as e:
         logger.error(f"Error in procesar_combate_miniboss: {e}")
@@ -221,8 +198,11 @@ async def siguiente_miniboss(update: Update, context: ContextTypes.DEFAULT_TYPE)
     """Handle progression to next miniboss enemy."""
     try:
         user_id = update.effective_user.id
-        estado_actual = miniboss_estado[user_id]
-        estado_actual["enemigo_actual"] += 1
+        run = await miniboss_runs.aget(user_id)
+        if run is None:
+            await update.effective_message.reply_text(MINIBOSS_NO_RUN, reply_markup=generar_botones())
+            return
+        run.enemy += 1
         await procesar_combate_miniboss(update, context)
     except Exception as e:
         logger.error(f"Error in siguiente_miniboss: {e}")
@@ -235,11 +215,14 @@ async def retirarse_miniboss(update: Update, context: ContextTypes.DEFAULT_TYPE)
     """Handle early retreat from miniboss battle."""
     try:
         user_id = update.effective_user.id
-        estado_actual = miniboss_estado[user_id]
+        run = await miniboss_runs.aget(user_id)
+        if run is None:
+            await update.effective_message.reply_text(MINIBOSS_NO_RUN, reply_markup=generar_botones())
+            return
         # Apply 50% penalty to rewards
-        estado_actual["recompensas"]["oro"] = int(estado_actual["recompensas"]["oro"] * 0.5)
-        estado_actual["recompensas"]["coral"] = int(estado_actual["recompensas"]["coral"] * 0.5)
-        estado_actual["recompensas"]["exp"] = int(estado_actual["recompensas"]["exp"] * 0.5)
+        run.oro = int(run.oro * 0.5)
+        run.coral = int(run.coral * 0.5)
+        run.exp = int(run.exp * 0.5)
         await finalizar_miniboss(update, context, victoria=True, retirada=True)
     except Exception as e:
         logger.error(f"Error in retirarse_miniboss: {e}")
@@ -248,67 +231,60 @@ async def retirarse_miniboss(update: Update, context: ContextTypes.DEFAULT_TYPE)
         else:
             await update.message.reply_text(ERROR_MESSAGES["generic_error"])
 
-async def finalizar_miniboss(update: Update, context: ContextTypes.DEFAULT_TYPE, player, victoria: bool, retirada: bool = False):
+async def finalizar_miniboss(update: Update, context: ContextTypes.DEFAULT_TYPE, player=None, victoria: bool = False, retirada: bool = False):
     """Finalize miniboss battle sequence and award rewards."""
     try:
         user_id = update.effective_user.id
-        session = Session()
-        try:
-            player = get_player(session, user_id)
-            if not player:
-                await update.effective_message.reply_text(ERROR_MESSAGES["no_game"])
-                return
-
-            estado_actual = player.miniboss_stats
+        player = await load_player(user_id)
+        if not player:
+            await update.effective_message.reply_text(ERROR_MESSAGES["no_game"])
+            return
+
+        run = await miniboss_runs.aget(user_id)
+        if run is None:
+            await update.effective_message.reply_text(MINIBOSS_NO_RUN, reply_markup=generar_botones())
+            return
+        
+        if victoria:
+            # Apply rewards
+            stats = player.combat_stats
+            player.mascota["oro"] += run.oro
+            stats["fire_coral"] += run.coral
+            stats["exp"] += run.exp
             
-            if victoria:
-                # Apply rewards
-                player.gold += estado_actual["recompensas"]["oro"]
-                player.fire_coral += estado_actual["recompensas"]["coral"]
-                player.exp += estado_actual["recompensas"]["exp"]
-                
-                # Level up logic
-                while player.exp >= exp_needed_for_level(player.level):
-                    player.exp -= exp_needed_for_level(player.level)
-                    player.level += 1
-                    new_stats = initialize_combat_stats(player.level)
-                    player.update_combat_stats(new_stats)
-                
-                mensaje = (
-                    f"{'🏃 Te has retirado' if retirada else '🎉 ¡MiniBoss Completado!'}\n\n"
-                    f"Recompensas finales:\n"
-                    f"💰 Oro: {estado_actual['recompensas']['oro']}\n"
-                    f"🌺 Coral de Fuego: {estado_actual['recompensas']['coral']}\n"
-                    f"💫 EXP: {estado_actual['recompensas']['exp']}\n\n"
-                    f"⚔️ Intentos restantes hoy: {get_attempts_remaining(player)}"
-                )
-                keyboard = [[InlineKeyboardButton("🏠 Volver al Menú", callback_data="start")]]
-            else:
-                mensaje = f"❌ ¡Has sido derrotado! No recibes recompensas.\n\n⚔️ Intentos restantes hoy: {get_attempts_remaining(player)}"
-                # Store current battle state for retry
-                player.last_miniboss_state = {
-                    'enemy_level': estado_actual['enemigo_actual'],
-                    'accumulated_rewards': estado_actual['recompensas']
-                }
-                keyboard = [
-                    [InlineKeyboardButton("📺 Reintentar (Ver Anuncio)", callback_data=f"retry_miniboss_{estado_actual['enemigo_actual']}")],
-                    [InlineKeyboardButton("🏠 Volver al Menú", callback_data="start")]
-                ]
-
-            # Clean up miniboss state
-            player.miniboss_stats = {}
+            # Level up logic (any number of levels at once)
+            previous_level = stats["level"]
+            stats["level"], stats["exp"] = game_tables.level_up(stats["level"], stats["exp"])
+            if stats["level"] > previous_level:
+                level_combat_stats(stats, stats["level"])
             
-            # Update player in database
-            update_player(session, player)
-
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            if update.callback_query:
-                await update.callback_query.message.reply_text(mensaje, reply_markup=reply_markup)
-            else:
-                await update.message.reply_text(mensaje, reply_markup=reply_markup)
-                
-        finally:
-            session.close()
+            mensaje = (
+                f"{'🏃 Te has retirado' if retirada else '🎉 ¡MiniBoss Completado!'}\n\n"
+                f"Recompensas finales:\n"
+                f"💰 Oro: {run.oro}\n"
+                f"🌺 Coral de Fuego: {run.coral}\n"
+                f"💫 EXP: {run.exp}\n\n"
+                f"⚔️ Intentos restantes hoy: {get_attempts_remaining(player)}"
+            )
+            keyboard = [[("🏠 Volver al Menú", "start")]]
+
+            # Run is over
+            miniboss_runs.clear(player)
+        else:
+            mensaje = f"❌ ¡Has sido derrotado! No recibes recompensas.\n\n⚔️ Intentos restantes hoy: {get_attempts_remaining(player)}"
+            # The run stays (until its TTL) so it can be retried
+            miniboss_runs.touch(run)
+            miniboss_runs.save(player, run)
+            keyboard = [
+                [("📺 Reintentar (Ver Anuncio)", f"retry_miniboss_{run.enemy}")],
+                [("🏠 Volver al Menú", "start")]
+            ]
+
+        reply_markup = cached_keyboard(*keyboard)
+        if update.callback_query:
+            await update.callback_query.message.reply_text(mensaje, reply_markup=reply_markup)
+        else:
+            await update.message.reply_text(mensaje, reply_markup=reply_markup)
 
     except Exception as e:
         logger.error(f"Error in finalizar_miniboss: {e}")
@@ -317,60 +293,35 @@ async def finalizar_miniboss(update: Update, context: ContextTypes.DEFAULT_TYPE,
         else:
             await update.message.reply_text(ERROR_MESSAGES["generic_error"])
 
-from database.db.game_db import Session, get_player, save_player
 from bot.handlers.ads import retry_combat_ad
 
 async def retry_miniboss_battle(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle miniboss battle retry through ad watching."""
     try:
         user_id = update.effective_user.id
-        session = Session()
-        try:
-            player = get_player(session, user_id)
-            if not player or not player.miniboss_stats:
-                await update.callback_query.message.reply_text("❌ No hay combate para reintentar.")
-                return
-
-            # Show ad and verify completion
-            ad_success = await retry_combat_ad(update, context, "MiniBoss")
-            if not ad_success:
-                return
-
-            # Restore miniboss state
-            enemigo_actual = player.miniboss_stats.get('enemigo_actual')
-            recompensas = player.miniboss_stats.get('recompensas')
-            
-            if not enemigo_actual or not recompensas:
-                await update.callback_query.message.reply_text("❌ Error al recuperar el estado del combate.")
-                return
-
-            # Reset the miniboss battle state
-            player.miniboss_stats = {
-                "enemigo_actual": enemigo_actual,
-                "recompensas": recompensas
-            }
-
-            # Decrement the attempts count
-            if player.miniboss_stats['attempts_today'] > 0:
-                player.miniboss_stats['attempts_today'] -= 1
-
-            # Save the updated player state
-            save_player(session, player)
-
-            # Process the combat again
-            await procesar_combate_miniboss(update, context)
-
-        finally:
-            session.close()
+        player = await load_player(user_id)
+        run = await miniboss_runs.aget(user_id) if player else None
+        if run is None:
+            await update.callback_query.message.reply_text("❌ No hay combate para reintentar.")
+            return
+
+        # Show ad and verify completion
+        ad_success = await retry_combat_ad(update, context, "MiniBoss")
+        if not ad_success:
+            return
+
+        # The retry does not count as a new attempt
+        miniboss_runs.touch(run)
+        if player.miniboss_stats.get('attempts_today', 0) > 0:
+            player.miniboss_stats['attempts_today'] -= 1
+
+        # Process the combat again
+        await procesar_combate_miniboss(update, context)
 
     except Exception as e:
         logger.error(f"Error in retry_miniboss_battle: {e}")
         await update.callback_query.message.reply_text(ERROR_MESSAGES["generic_error"])
 
-def exp_needed_for_level(level: int) -> int:
-    """Calculate experience needed for next level."""
-    return int(100 * (1.5 ** level))
-
 def initialize_combat_stats(level: int) -> dict:
     """Initialize combat stats for a given level."""
     return {
@@ -1,17 +1,104 @@
 from bot.config.premium_settings import PREMIUM_FEATURES
-from telegram.ext import ContextTypes
 import time
+import logging
+from typing import Optional
+from database.db.json_ops import json_set_key
+from database.models.player_model import Player
+from bot.utils.player_store import player_store
 
-async def distribute_weekly_tickets(context: ContextTypes.DEFAULT_TYPE):
-    """Distribute weekly tickets to premium users"""
-    current_time = time.time()
-    for user_id, player in context.bot_data.get('players', {}).items():
-        premium_features = player.get('premium_features', {})
-        if premium_features.get('premium_status', False):
-            # Reset and add new tickets
-            premium_features['tickets'] = PREMIUM_FEATURES['weekly_tickets']
-            premium_features['last_ticket_distribution'] = current_time
-            
-            # Debug: Mostrar el número de tickets asignados
-            print(f"User {user_id} ahora tiene {premium_features['tickets']} tickets.")
+logger = logging.getLogger(__name__)
+
+# premium_features flag -> (JSON expiry key, indexed Player column)
+PREMIUM_EXPIRY_FIELDS = {
+    'premium_status': ('premium_status_expires', 'premium_expires_at'),
+    'auto_collector': ('auto_collector_expires', 'auto_collector_expires_at'),
+}
+
+def grant_premium_feature(player, feature: str, expires_at: float):
+    """Activate a timed premium feature, keeping the indexed expiry column in sync."""
+    expires_key, column_name = PREMIUM_EXPIRY_FIELDS[feature]
+    player.premium_features[feature] = True
+    player.premium_features[expires_key] = expires_at
+    setattr(player, column_name, expires_at)
+
+def expire_premium_features(session, now: Optional[float] = None) -> dict:
+    """
+    Turn off every premium feature whose expiry has passed.
+
+    Expired rows are found through the indexed expiry columns and flipped
+    with one set-based UPDATE per feature, so the cost depends on the
+    number of expirations, not on the number of players. The UPDATE bumps
+    the row version like any other write. Players cached in the
+    PlayerStore are left alone: their ids are returned per feature for
+    `expire_cached_features`, which must run on the event loop.
+    """
+    now = time.time() if now is None else now
+    dialect_name = session.bind.dialect.name
+    cached_ids = {}
+
+    for feature, (expires_key, column_name) in PREMIUM_EXPIRY_FIELDS.items():
+        column = getattr(Player, column_name)
+        expired_ids = [row.id for row in session.query(Player.id).filter(column <= now)]
+        cached_ids[feature] = [user_id for user_id in expired_ids if user_id in player_store]
+        uncached = [user_id for user_id in expired_ids if user_id not in player_store]
+        if not uncached:
+            continue
+
+        # Re-check the expiry in case the row was renewed since it was selected
+        expired = session.query(Player).filter(Player.id.in_(uncached), column <= now)
+        flag_off = json_set_key(dialect_name, Player.premium_features, feature, 'false')
+        if flag_off is not None:
+            count = expired.update(
+                {Player.premium_features: flag_off, column: None, Player.version: Player.version + 1},
+                synchronize_session=False
+            )
+        else:
+            count = 0
+            for player in expired:
+                player.premium_features = dict(player.premium_features, **{feature: False})
+                setattr(player, column_name, None)
+                count += 1
+        session.commit()
+        if count:
+            logger.info(f"Premium feature {feature} expired for {count} players")
+
+    return cached_ids
+
+def expire_cached_features(cached_ids: dict, now: Optional[float] = None) -> int:
+    """
+    Turn off the expired features of players held by the PlayerStore.
+
+    Runs on the event loop, where handlers change those players. The
+    in-memory expiry wins over the database one, so a renewal that is not
+    flushed yet is kept. Returns the number of features turned off.
+    """
+    now = time.time() if now is None else now
+    count = 0
+    for feature, user_ids in cached_ids.items():
+        column_name = PREMIUM_EXPIRY_FIELDS[feature][1]
+        for user_id in user_ids:
+            cached = player_store.peek(user_id)
+            if cached is None:
+                # Evicted after a flush; the next run finds it in the database
+                continue
+            expires_at = getattr(cached, column_name)
+            if expires_at is None or expires_at > now:
+                continue
+            cached.premium_features[feature] = False
+            setattr(cached, column_name, None)
+            player_store.mark_dirty(user_id)
+            count += 1
+    if count:
+        logger.info(f"Premium features expired for {count} cached players")
+    return count
+
+def distribute_weekly_tickets(player, now: float) -> bool:
+    """Give a premium player their weekly tickets if a week has passed since the last ones."""
+    premium_features = player.premium_features
+    if now - premium_features.get('last_ticket_distribution', 0) < PREMIUM_FEATURES['weekly_reset']:
+        return False
+    # Reset and add new tickets
+    premium_features['tickets'] = PREMIUM_FEATURES['weekly_lucky_tickets']
+    premium_features['last_ticket_distribution'] = now
+    return True
 
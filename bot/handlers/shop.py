@@ -2,20 +2,23 @@
 
 # Standard library imports
 import logging
+import time
+from functools import lru_cache
 
 # Third-party imports
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes
-from sqlalchemy.orm import Session
 
 # Local imports
-from database.db.game_db import Session, get_player, save_player, get_all_players
+from database.db.game_db import get_all_players
 from bot.config.settings import SUCCESS_MESSAGES, ERROR_MESSAGES, logger
-from bot.config.shop_items import SHOP_ITEMS, PREMIUM_SHOP_ITEMS, ShopManager
+from bot.config.shop_items import SHOP_ITEMS, SHOP_ITEMS_BY_NAME, PREMIUM_SHOP_ITEMS, ShopManager
 from bot.config.premium_settings import PREMIUM_FEATURES
 from bot.config.ton_config import TON_CONFIG
-from bot.utils.keyboard import generar_botones
-from bot.utils.save_system import update_player
+from bot.utils.keyboard import generar_botones, cached_keyboard
+from bot.utils.economy import economy
+from bot.utils.update_scope import load_player, atomic
+from bot.handlers.premium import grant_premium_feature, PREMIUM_EXPIRY_FIELDS
 
 #---------------------------------------------------------------
 # Temporarily comment out TON SDK imports
@@ -34,96 +37,94 @@ async def process_premium_purchase(update, context):
     return True  # Simulates successful purchase
 #---------------------------------------------------------------
 
+# Distinct inventory-level combinations whose shop view is kept
+SHOP_VIEW_CACHE_SIZE = 1024
+
+def _shop_levels(inventario: dict) -> tuple:
+    """Inventory-level signature of the shop view, in SHOP_ITEMS order."""
+    return tuple(inventario.get(item['nombre'], 0) for item in SHOP_ITEMS)
+
+@lru_cache(maxsize=SHOP_VIEW_CACHE_SIZE)
+def _shop_view(levels: tuple):
+    """Item descriptions and buttons of the shop for one inventory-level signature."""
+    if not SHOP_ITEMS:
+        logger.error("SHOP_ITEMS is empty.")
+        return (
+            "Artículos disponibles:\n\n❌ No hay artículos disponibles en la tienda.\n",
+            cached_keyboard([("🏠 Volver al Menú", "start")])
+        )
+
+    items_message = "Artículos disponibles:\n\n"
+    item_buttons = []
+    for base_item, owned in zip(SHOP_ITEMS, levels):
+        current_level = owned + 1
+        item = ShopManager.calculate_item_stats(base_item, current_level)
+
+        # Description and production rate
+        items_message += (
+            f"{base_item['emoji']} {base_item['nombre']}\n"
+            f"📝 {base_item['descripcion']}\n"
+            f"🪙 Producción: {item['oro_hora']} oro/hora\n\n"
+        )
+
+        # Button text with only name, level and price, in its own row
+        item_text = (
+            f"{base_item['emoji']} {base_item['nombre']}\u2800\u2800\n"
+            f"Nivel {current_level}\u2800\u2800\n"
+            f"💰 Precio: {item['costo']} oro\u2800\u2800"
+        )
+        item_buttons.append([(item_text, f"comprar_{base_item['nombre']}")])
+
+    # Add navigation button at the bottom
+    item_buttons.append([("🏠 Volver al Menú", "start")])
+    return items_message, cached_keyboard(*item_buttons)
+
 async def tienda(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle shop interface with full-width button layout."""
     try:
         user_id = update.effective_user.id
-        session = Session()
-        try:
-            player = get_player(session, user_id)
-            if not player:
-                if update.callback_query:
-                    await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
-                else:
-                    await update.message.reply_text(ERROR_MESSAGES["no_game"])
-                return
-
-            if not player.mascota or 'oro' not in player.mascota:
-                logger.error(f"Invalid or missing player data for user_id: {user_id}")
-                if update.callback_query:
-                    await update.callback_query.message.reply_text(ERROR_MESSAGES["generic_error"])
-                else:
-                    await update.message.reply_text(ERROR_MESSAGES["generic_error"])
-                return
-
-            # Header message with complete item descriptions and production rates
-            header_message = (
-                f"🏪 Bienvenido a la Tienda\n"
-                f"💰 Tu oro: {player.mascota['oro']}\n\n"
-                "Artículos disponibles:\n\n"
-            )
-
-            # Add descriptions and production rates to header message
-            for base_item in SHOP_ITEMS:
-                current_level = player.inventario.get(base_item['nombre'], 0) + 1
-                item = ShopManager.calculate_item_stats(base_item, current_level)
-                header_message += (
-                    f"{base_item['emoji']} {base_item['nombre']}\n"
-                    f"📝 {base_item['descripcion']}\n"
-                    f"🪙 Producción: {item['oro_hora']} oro/hora\n\n"
-                )
-
-            if not SHOP_ITEMS:
-                logger.error("SHOP_ITEMS is empty.")
-                header_message += "❌ No hay artículos disponibles en la tienda.\n"
-                reply_markup = InlineKeyboardMarkup([[InlineKeyboardButton("🏠 Volver al Menú", callback_data="start")]])
+        player = await load_player(user_id)
+        if not player:
+            if update.callback_query:
+                await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
             else:
-                item_buttons = []
-                for base_item in SHOP_ITEMS:
-                    current_level = player.inventario.get(base_item['nombre'], 0) + 1
-                    item = ShopManager.calculate_item_stats(base_item, current_level)
-                    
-                    # Create button text with only name, level and price
-                    can_afford = player.mascota['oro'] >= item['costo']
-                    item_text = (
-                        f"{base_item['emoji']} {base_item['nombre']}\u2800\u2800\n"
-                        f"Nivel {current_level}\u2800\u2800\n"
-                        f"💰 Precio: {item['costo']} oro\u2800\u2800"
-                    )
-                    
-                    # Create button with comprar callback
-                    button = InlineKeyboardButton(
-                        text=item_text,
-                        callback_data=f"comprar_{base_item['nombre']}"
-                    )
-                    
-                    # Add button in its own row
-                    item_buttons.append([button])
-
-                # Add navigation button at the bottom
-                item_buttons.append([InlineKeyboardButton("🏠 Volver al Menú", callback_data="start")])
-                reply_markup = InlineKeyboardMarkup(item_buttons)
+                await update.message.reply_text(ERROR_MESSAGES["no_game"])
+            return
 
+        if not player.mascota or 'oro' not in player.mascota:
+            logger.error(f"Invalid or missing player data for user_id: {user_id}")
             if update.callback_query:
-                try:
-                    await update.callback_query.message.edit_text(
-                        text=header_message,
-                        reply_markup=reply_markup
-                    )
-                except Exception as edit_error:
-                    logger.warning(f"Could not edit shop message, sending new one: {edit_error}")
-                    await update.callback_query.message.reply_text(
-                        text=header_message,
-                        reply_markup=reply_markup
-                    )
+                await update.callback_query.message.reply_text(ERROR_MESSAGES["generic_error"])
             else:
-                await update.message.reply_text(
+                await update.message.reply_text(ERROR_MESSAGES["generic_error"])
+            return
+
+        # Item list and buttons only change with the inventory levels
+        oro_actual = economy.project(player)['oro']
+        items_message, reply_markup = _shop_view(_shop_levels(player.inventario))
+        header_message = (
+            f"🏪 Bienvenido a la Tienda\n"
+            f"💰 Tu oro: {oro_actual}\n\n"
+            + items_message
+        )
+
+        if update.callback_query:
+            try:
+                await update.callback_query.message.edit_text(
                     text=header_message,
                     reply_markup=reply_markup
                 )
-
-        finally:
-            session.close()
+            except Exception as edit_error:
+                logger.warning(f"Could not edit shop message, sending new one: {edit_error}")
+                await update.callback_query.message.reply_text(
+                    text=header_message,
+                    reply_markup=reply_markup
+                )
+        else:
+            await update.message.reply_text(
+                text=header_message,
+                reply_markup=reply_markup
+            )
 
     except Exception as e:
         logger.error(f"Error in tienda: {e}")
@@ -135,96 +136,97 @@ async def tienda(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except Exception as reply_error:
             logger.error(f"Failed to send error message: {reply_error}")
 
+def _buy_item(player, base_item: dict):
+    """Purchase step (re-run on write conflicts): (level, stats, bought)."""
+    # Settle production at the old rate before buying changes it
+    economy.apply(player)
+    current_level = player.inventario.get(base_item['nombre'], 0) + 1
+    item = ShopManager.calculate_item_stats(base_item, current_level)
+    if player.mascota['oro'] < item['costo']:
+        return current_level, item, False
+
+    player.mascota['oro'] -= item['costo']
+    player.inventario[base_item['nombre']] = current_level
+    player.mascota['oro_hora'] += item['oro_hora']
+    return current_level, item, True
+
 async def comprar(update: Update, context: ContextTypes.DEFAULT_TYPE, item_name: str):
     """Handle item purchases."""
     try:
         user_id = update.effective_user.id
-        session = Session()
-        try:
-            player = get_player(session, user_id)
-            if not player:
-                if update.callback_query:
-                    await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
-                else:
-                    await update.message.reply_text(ERROR_MESSAGES["no_game"])
-                return
-
-            mascota = player.mascota
-            
-            # Get base item and calculate current level stats
-            base_item = next((item for item in SHOP_ITEMS if item['nombre'] == item_name), None)
-            if not base_item:
-                if update.callback_query:
-                    await update.callback_query.message.edit_text(
-                        "❌ Artículo no encontrado.",
-                        reply_markup=generar_botones()
-                    )
-                else:
-                    await update.message.reply_text(
-                        "❌ Artículo no encontrado.",
-                        reply_markup=generar_botones()
-                    )
-                return
-
-            current_level = player.inventario.get(item_name, 0) + 1
-            item = ShopManager.calculate_item_stats(base_item, current_level)
-
-            # Check if player has enough gold
-            if mascota['oro'] >= item['costo']:
-                # Process purchase
-                mascota['oro'] -= item['costo']
-                player.inventario[item_name] = current_level
-                mascota['oro_hora'] += item['oro_hora']
-
-                # Save game data
-                save_player(player)
-
-                # Calculate next level stats for display
-                next_level = ShopManager.calculate_item_stats(base_item, current_level + 1)
-
-                # Prepare success message
-                mensaje = (
-                    f"✅ ¡Compra exitosa!\n\n"
-                    f"{item['emoji']} {item_name} nivel {current_level}\n"
-                    f"💰 Oro restante: {mascota['oro']}\n"
-                    f"⚡ Producción añadida: +{item['oro_hora']}/min\n"
-                    f"📈 Producción total: {mascota['oro_hora']}/min\n\n"
-                    f"Siguiente nivel costará: {next_level['costo']} oro\n"
-                    f"Y producirá: +{next_level['oro_hora']}/min"
-                )
+        player = await load_player(user_id)
+        if not player:
+            if update.callback_query:
+                await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
+            else:
+                await update.message.reply_text(ERROR_MESSAGES["no_game"])
+            return
 
-                # Create keyboard for next actions
-                keyboard = [
-                    [InlineKeyboardButton("🏪 Seguir Comprando", callback_data="tienda")],
-                    [InlineKeyboardButton("📊 Ver Estado", callback_data="estado")],
-                    [InlineKeyboardButton("🏠 Volver al Menú", callback_data="start")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-
-                if update.callback_query:
-                    await update.callback_query.message.edit_text(mensaje, reply_markup=reply_markup)
-                else:
-                    await update.message.reply_text(mensaje, reply_markup=reply_markup)
+        # Get base item and calculate current level stats
+        base_item = SHOP_ITEMS_BY_NAME.get(item_name)
+        if not base_item:
+            if update.callback_query:
+                await update.callback_query.message.edit_text(
+                    "❌ Artículo no encontrado.",
+                    reply_markup=generar_botones()
+                )
             else:
-                # Not enough gold
-                falta_oro = item['costo'] - mascota['oro']
-                mensaje = (
-                    f"❌ No tienes suficiente oro.\n"
-                    f"Necesitas: {item['costo']} oro\n"
-                    f"Tienes: {mascota['oro']} oro\n"
-                    f"Te faltan: {falta_oro} oro"
+                await update.message.reply_text(
+                    "❌ Artículo no encontrado.",
+                    reply_markup=generar_botones()
                 )
-                
-                keyboard = [[InlineKeyboardButton("🔙 Volver a la Tienda", callback_data="tienda")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                if update.callback_query:
-                    await update.callback_query.message.edit_text(mensaje, reply_markup=reply_markup)
-                else:
-                    await update.message.reply_text(mensaje, reply_markup=reply_markup)
-
-        finally:
-            session.close()
+            return
+
+        # Buy and write at once (compare-and-swap, retried on conflicts)
+        player, (current_level, item, bought) = await atomic(
+            user_id, lambda fresh: _buy_item(fresh, base_item)
+        )
+        mascota = player.mascota
+
+        if bought:
+            # Calculate next level stats for display
+            next_level = ShopManager.calculate_item_stats(base_item, current_level + 1)
+
+            # Prepare success message
+            mensaje = (
+                f"✅ ¡Compra exitosa!\n\n"
+                f"{item['emoji']} {item_name} nivel {current_level}\n"
+                f"💰 Oro restante: {mascota['oro']}\n"
+                f"⚡ Producción añadida: +{item['oro_hora']}/min\n"
+                f"📈 Producción total: {mascota['oro_hora']}/min\n\n"
+                f"Siguiente nivel costará: {next_level['costo']} oro\n"
+                f"Y producirá: +{next_level['oro_hora']}/min"
+            )
+
+            # Create keyboard for next actions
+            keyboard = [
+                [("🏪 Seguir Comprando", "tienda")],
+                [("📊 Ver Estado", "estado")],
+                [("🏠 Volver al Menú", "start")]
+            ]
+            reply_markup = cached_keyboard(*keyboard)
+
+            if update.callback_query:
+                await update.callback_query.message.edit_text(mensaje, reply_markup=reply_markup)
+            else:
+                await update.message.reply_text(mensaje, reply_markup=reply_markup)
+        else:
+            # Not enough gold
+            falta_oro = item['costo'] - mascota['oro']
+            mensaje = (
+                f"❌ No tienes suficiente oro.\n"
+                f"Necesitas: {item['costo']} oro\n"
+                f"Tienes: {mascota['oro']} oro\n"
+                f"Te faltan: {falta_oro} oro"
+            )
+            
+            keyboard = [[("🔙 Volver a la Tienda", "tienda")]]
+            reply_markup = cached_keyboard(*keyboard)
+            
+            if update.callback_query:
+                await update.callback_query.message.edit_text(mensaje, reply_markup=reply_markup)
+            else:
+                await update.message.reply_text(mensaje, reply_markup=reply_markup)
 
     except Exception as e:
         logger.error(f"Error in comprar: {e}")
@@ -243,13 +245,14 @@ async def comprar_fragmentos(update: Update, context: ContextTypes.DEFAULT_TYPE)
     """Permite comprar fragmentos de destino con oro"""
     user_id = update.effective_user.id
     
-    session = Session()
     try:
-        player = get_player(session, user_id)
+        player = await load_player(user_id)
         if not player:
             await update.callback_query.message.reply_text("❌ No se encontró tu perfil de jugador.")
             return
 
+        economy.apply(player)
+
         # Determinar cuántos fragmentos de destino puede comprar el jugador
         fragmentos_precio = 5  # Ejemplo: 5 oro por 1 fragmento de destino
         cantidad = 1  # En este caso compran 1 fragmento por transacción
@@ -262,76 +265,63 @@ async def comprar_fragmentos(update: Update, context: ContextTypes.DEFAULT_TYPE)
         player.mascota['oro'] -= fragmentos_precio
         player.fragmento_del_destino += cantidad  # Aumentar los fragmentos disponibles
 
-        # Guardar los datos
-        session.commit()
-
         # Mensaje de confirmación
         await update.callback_query.message.reply_text(f"✅ Has comprado {cantidad} Fragmento de Destino.")
 
     except Exception as e:
         logger.error(f"Error in comprar_fragmentos: {e}")
         await update.callback_query.message.reply_text(ERROR_MESSAGES["generic_error"])
-    finally:
-        session.close()
 
 async def premium_shop(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Display the premium shop menu with TON prices."""
     try:
         user_id = update.effective_user.id
         
-        session = Session()
-        try:
-            player = get_player(session, user_id)
-            
-            if not player:
-                await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
-                return
+        player = await load_player(user_id)
+        
+        if not player:
+            await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
+            return
 
-            header_message = (
-                "🌟 Tienda Premium 🌟\n\n"
-                "Aquí puedes comprar artículos y mejoras especiales con TON.\n"
-                "1 TON = 1,000,000,000 nanoTON\n\n"
+        header_message = (
+            "🌟 Tienda Premium 🌟\n\n"
+            "Aquí puedes comprar artículos y mejoras especiales con TON.\n"
+            "1 TON = 1,000,000,000 nanoTON\n\n"
+        )
+
+        keyboard = []
+        for item_name, item_data in PREMIUM_SHOP_ITEMS.items():
+            # Mostrar el nombre y la descripción en formato Fragmentos del Destino
+            item_display_name = item_data["name"]
+            item_description = item_data["description"]
+            item_price = item_data["price"]
+            
+            # Añadir al mensaje de la tienda
+            header_message += (
+                f"{item_display_name}\n"
+                f"{item_description}\n"
+                f"💰 Precio: {item_price} TON\n\n"
             )
 
-            keyboard = []
-            for item_name, item_data in PREMIUM_SHOP_ITEMS.items():
-                # Mostrar el nombre y la descripción en formato Fragmentos del Destino
-                item_display_name = item_data["name"]
-                item_description = item_data["description"]
-                item_price = item_data["price"]
-                
-                # Añadir al mensaje de la tienda
-                header_message += (
-                    f"{item_display_name}\n"
-                    f"{item_description}\n"
-                    f"💰 Precio: {item_price} TON\n\n"
-                )
-
-                # Crear botón para comprar
-                button = InlineKeyboardButton(
-                    f"Comprar {item_display_name} ({item_price} TON)",
-                    callback_data=f"buy_premium_{item_name}"
-                )
-                keyboard.append([button])
-
-            keyboard.append([InlineKeyboardButton("🏪 Tienda Normal", callback_data="tienda")])
-            keyboard.append([InlineKeyboardButton("🏠 Volver al Menú", callback_data="start")])
+            # Crear botón para comprar
+            button = (f"Comprar {item_display_name} ({item_price} TON)", f"buy_premium_{item_name}")
+            keyboard.append([button])
 
-            reply_markup = InlineKeyboardMarkup(keyboard)
+        keyboard.append([("🏪 Tienda Normal", "tienda")])
+        keyboard.append([("🏠 Volver al Menú", "start")])
 
-            if update.callback_query:
-                await update.callback_query.message.edit_text(
-                    text=header_message,
-                    reply_markup=reply_markup
-                )
-            else:
-                await update.message.reply_text(
-                    text=header_message,
-                    reply_markup=reply_markup
-                )
+        reply_markup = cached_keyboard(*keyboard)
 
-        finally:
-            session.close()
+        if update.callback_query:
+            await update.callback_query.message.edit_text(
+                text=header_message,
+                reply_markup=reply_markup
+            )
+        else:
+            await update.message.reply_text(
+                text=header_message,
+                reply_markup=reply_markup
+            )
 
     except Exception as e:
         logger.error(f"Error in premium_shop: {e}")
@@ -344,43 +334,39 @@ async def buy_premium_item(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = query.from_user.id
         item_name = query.data.split('_')[2]
 
-        session = Session()
-        try:
-            player = get_player(session, user_id)
-            if not player:
-                await query.message.reply_text(ERROR_MESSAGES["no_game"])
-                return
+        player = await load_player(user_id)
+        if not player:
+            await query.message.reply_text(ERROR_MESSAGES["no_game"])
+            return
 
-            item = PREMIUM_SHOP_ITEMS.get(item_name)
-            if not item:
-                await query.message.reply_text("Item not found in premium shop.")
-                return
+        item = PREMIUM_SHOP_ITEMS.get(item_name)
+        if not item:
+            await query.message.reply_text("Item not found in premium shop.")
+            return
 
-            # Generate a unique payment address for this transaction
+        # Generate a unique payment address for this transaction
 #------------------------------------------------------------------------------------------------
-            #payment_address = await ton_utils.generate_payment_address(user_id, item_name)
+        #payment_address = await ton_utils.generate_payment_address(user_id, item_name)
 #------------------------------------------------------------------------------------------------
-            # Create a payment link
-            #payment_amount = item['price'] * 1_000_000_000  # Convert TON to nanoTON
-            #payment_link = f"ton://transfer/{payment_address}?amount={payment_amount}"
+        # Create a payment link
+        #payment_amount = item['price'] * 1_000_000_000  # Convert TON to nanoTON
+        #payment_link = f"ton://transfer/{payment_address}?amount={payment_amount}"
 #------------------------------------------------------------------------------------------------
-            # Send payment instructions to the user
-            #payment_message = (
-            #    f"Para comprar {item['emoji']} {item_name}, por favor sigue estos pasos:\n\n"
-            #    f"1. Haz clic en este enlace para abrir tu billetera TON: {payment_link}\n"
-            #    f"2. Confirma el pago de {item['price']} TON\n"
-            #    "3. Una vez realizado el pago, haz clic en 'Verificar Pago'\n\n"
-            #    "El artículo se añadirá a tu cuenta una vez que se confirme el pago."
-            #)
-
-            verify_button = InlineKeyboardButton("Verificar Pago", callback_data=f"verify_payment_{item_name}")
-            cancel_button = InlineKeyboardButton("Cancelar", callback_data="premium_shop")
-            reply_markup = InlineKeyboardMarkup([[verify_button], [cancel_button]])
-
-            #await query.message.reply_text(payment_message, reply_markup=reply_markup)
+        # Send payment instructions to the user
+        #payment_message = (
+        #    f"Para comprar {item['emoji']} {item_name}, por favor sigue estos pasos:\n\n"
+        #    f"1. Haz clic en este enlace para abrir tu billetera TON: {payment_link}\n"
+        #    f"2. Confirma el pago de {item['price']} TON\n"
+        #    "3. Una vez realizado el pago, haz clic en 'Verificar Pago'\n\n"
+        #    "El artículo se añadirá a tu cuenta una vez que se confirme el pago."
+        #)
+
+        verify_button = ("Verificar Pago", f"verify_payment_{item_name}")
+        cancel_button = ("Cancelar", "premium_shop")
+        reply_markup = cached_keyboard([verify_button], [cancel_button])
+
+        #await query.message.reply_text(payment_message, reply_markup=reply_markup)
 #------------------------------------------------------------------------------------------------
-        finally:
-            session.close()
     except Exception as e:
         logger.error(f"Error in buy_premium_item: {e}")
         await query.message.reply_text(ERROR_MESSAGES["generic_error"])
@@ -389,88 +375,77 @@ async def premium_shop(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Display the premium shop menu with free items for testing."""
     try:
         user_id = update.effective_user.id
-        session = Session()
-        try:
-            player = get_player(session, user_id)
-            if not player:
-                await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
-                return
-
-            header_message = (
-                "🌟 Tienda Premium (Modo de Prueba) 🌟\n\n"
-                "Aquí puedes obtener artículos y mejoras especiales de forma gratuita para probar.\n\n"
-            )
+        player = await load_player(user_id)
+        if not player:
+            await update.callback_query.message.reply_text(ERROR_MESSAGES["no_game"])
+            return
 
-            keyboard = []
-            for item_name, item_data in PREMIUM_SHOP_ITEMS.items():
-                emoji = item_data.get('emoji', '🎁')
-                display_name = item_data.get('display_name', item_name)
-                button = InlineKeyboardButton(
-                    f"Obtener {emoji} {display_name}",
-                    callback_data=f"get_premium_{item_name}"
-                )
-                keyboard.append([button])
+        header_message = (
+            "🌟 Tienda Premium (Modo de Prueba) 🌟\n\n"
+            "Aquí puedes obtener artículos y mejoras especiales de forma gratuita para probar.\n\n"
+        )
 
-            keyboard.append([InlineKeyboardButton("🏪 Tienda Normal", callback_data="tienda")])
-            keyboard.append([InlineKeyboardButton("🏠 Volver al Menú", callback_data="start")])
+        keyboard = []
+        for item_name, item_data in PREMIUM_SHOP_ITEMS.items():
+            emoji = item_data.get('emoji', '🎁')
+            display_name = item_data.get('display_name', item_name)
+            button = (f"Obtener {emoji} {display_name}", f"get_premium_{item_name}")
+            keyboard.append([button])
 
-            reply_markup = InlineKeyboardMarkup(keyboard)
+        keyboard.append([("🏪 Tienda Normal", "tienda")])
+        keyboard.append([("🏠 Volver al Menú", "start")])
 
-            if update.callback_query:
-                await update.callback_query.message.edit_text(
-                    text=header_message,
-                    reply_markup=reply_markup
-                )
-            else:
-                await update.message.reply_text(
-                    text=header_message,
-                    reply_markup=reply_markup
-                )
+        reply_markup = cached_keyboard(*keyboard)
 
-        finally:
-            session.close()
+        if update.callback_query:
+            await update.callback_query.message.edit_text(
+                text=header_message,
+                reply_markup=reply_markup
+            )
+        else:
+            await update.message.reply_text(
+                text=header_message,
+                reply_markup=reply_markup
+            )
 
     except Exception as e:
         logger.error(f"Error in premium_shop: {e}")
         await update.callback_query.message.reply_text(ERROR_MESSAGES["generic_error"])
 
-async def get_premium_item(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def get_premium_item(update: Update, context: ContextTypes.DEFAULT_TYPE, item_name: str = None):
     try:
         query = update.callback_query
         user_id = query.from_user.id
-        item_name = query.data.split('_')[2]
+        # Item names contain underscores (premium_status, tickets_5)
+        item_name = item_name or query.data[len('get_premium_'):]
 
-        session = Session()
-        try:
-            player = get_player(session, user_id)
-            if not player:
-                await query.message.reply_text(ERROR_MESSAGES["no_game"])
-                return
-
-            item = PREMIUM_SHOP_ITEMS.get(item_name)
-            if not item:
-                await query.message.reply_text("Item no encontrado en la tienda premium.")
-                return
-
-            # Procesar compra de tickets (Fragmentos del Destino)
-            if "tickets" in item_name:
-                amount = item.get("amount", 0)
-                player.premium_features['tickets'] = player.premium_features.get('tickets', 0) + amount
-                update_player(session, player)
-
-                await query.message.reply_text(
-                    f"✅ Has comprado {amount} {item['name']} con éxito."
-                )
+        player = await load_player(user_id)
+        if not player:
+            await query.message.reply_text(ERROR_MESSAGES["no_game"])
+            return
+
+        item = PREMIUM_SHOP_ITEMS.get(item_name)
+        if not item:
+            await query.message.reply_text("Item no encontrado en la tienda premium.")
+            return
+
+        # Procesar compra de tickets (Fragmentos del Destino)
+        if "tickets" in item_name:
+            amount = item.get("amount", 0)
+            player.premium_features['tickets'] = player.premium_features.get('tickets', 0) + amount
+
+            await query.message.reply_text(
+                f"✅ Has comprado {amount} {item['name']} con éxito."
+            )
+        else:
+            # Otros ítems, como suscripciones premium
+            if item_name in PREMIUM_EXPIRY_FIELDS:
+                grant_premium_feature(player, item_name, time.time() + item["duration"])
             else:
-                # Otros ítems, como suscripciones premium
                 player.premium_features[item_name] = True
-                update_player(session, player)
-                await query.message.reply_text(
-                    f"✅ Has obtenido {item['name']} con éxito."
-                )
-
-        finally:
-            session.close()
+            await query.message.reply_text(
+                f"✅ Has obtenido {item['name']} con éxito."
+            )
 
     except Exception as e:
         logger.error(f"Error in get_premium_item: {e}")
@@ -1,6 +1,7 @@
 # utils/__init__.py
 from .keyboard import (
     generar_botones,
+    cached_keyboard,
     create_shop_keyboard,
     create_premium_shop_keyboard,
     create_miniboss_keyboard,
@@ -10,6 +11,11 @@ from .keyboard import (
     create_menu_keyboard
 )
 from .save_system import save_game_data, load_game_data, backup_data, get_save_info
+from .player_store import PlayerStore, player_store
+from .economy import EconomyEngine, economy
+from .media_cache import MediaCache, media_cache
+from .portal_engine import PortalEngine, portal_engine
+from .miniboss_runs import MiniBossRunStore, miniboss_runs
 
 # Comment out TON SDK related imports
 # from .ton_utils import (
@@ -22,6 +28,7 @@ from .save_system import save_game_data, load_game_data, backup_data, get_save_i
 __all__ = [
     # Keyboard functions
     'generar_botones',
+    'cached_keyboard',
     'create_shop_keyboard',
     'create_premium_shop_keyboard', 
     'create_miniboss_keyboard',
@@ -34,7 +41,27 @@ __all__ = [
     'save_game_data',
     'load_game_data',
     'backup_data',
-    'get_save_info'
+    'get_save_info',
+
+    # Player store
+    'PlayerStore',
+    'player_store',
+
+    # Economy
+    'EconomyEngine',
+    'economy',
+
+    # Media cache
+    'MediaCache',
+    'media_cache',
+
+    # Portal
+    'PortalEngine',
+    'portal_engine',
+
+    # MiniBoss runs
+    'MiniBossRunStore',
+    'miniboss_runs'
 
     # Comment out TON functions
     # 'initialize_ton_client',
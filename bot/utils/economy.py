@@ -0,0 +1,167 @@
+# utils/economy.py
+
+import math
+import time
+from typing import Optional
+
+from bot.config.settings import (
+    HUNGER_LOSS_RATE,
+    ENERGY_GAIN_RATE,
+    MAX_ENERGY,
+    PREMIUM_GOLD_MULTIPLIER,
+    AUTO_COLLECTOR_INTERVAL
+)
+
+# Production, hunger and energy advance once per whole minute
+ECONOMY_TICK = 60
+
+
+def _ticks_between(start: float, end: float, interval: float) -> int:
+    """Number of `interval` boundaries crossed in (start, end]."""
+    if end <= start:
+        return 0
+    return int(math.floor(end / interval) - math.floor(start / interval))
+
+
+def _active_until(active: bool, expires_at: Optional[float]) -> float:
+    """End of a timed feature; 0 if inactive, infinite if it has no expiry."""
+    if not active:
+        return 0.0
+    return float(expires_at) if expires_at else math.inf
+
+
+class EconomyEngine:
+    """
+    Closed-form idle economy.
+
+    A player's economy is stored as a checkpoint (`mascota`, `comida` and
+    `ultima_actualizacion`). `project` returns the exact state at any later
+    timestamp in O(1) without touching the player, and `apply` writes it
+    back and moves the checkpoint forward.
+
+    Ticks are counted on absolute minute/hour boundaries, so projecting
+    once over a long gap gives the same result as many short updates (up to
+    gold being rounded down to whole coins at each checkpoint), and the
+    fraction of a minute left over is never lost. Premium and
+    auto-collector expiry are honoured inside the interval.
+    """
+
+    def __init__(
+        self,
+        hunger_loss_rate: float = HUNGER_LOSS_RATE,
+        energy_gain_rate: float = ENERGY_GAIN_RATE,
+        max_energy: int = MAX_ENERGY,
+        premium_multiplier: float = PREMIUM_GOLD_MULTIPLIER,
+        collector_interval: float = AUTO_COLLECTOR_INTERVAL
+    ):
+        self.hunger_loss_rate = hunger_loss_rate
+        self.energy_gain_rate = energy_gain_rate
+        self.max_energy = max_energy
+        self.premium_multiplier = premium_multiplier
+        self.collector_interval = collector_interval
+
+    def project_values(
+        self,
+        oro: float,
+        hambre: float,
+        energia: float,
+        comida: int,
+        oro_hora: float,
+        since: float,
+        now: float,
+        premium_until: float = 0.0,
+        collector_until: float = 0.0
+    ) -> dict:
+        """Project raw checkpoint values from `since` to `now`."""
+        minutes = _ticks_between(since, now, ECONOMY_TICK)
+        if minutes <= 0:
+            return {"oro": oro, "hambre": hambre, "energia": energia, "comida": comida}
+
+        premium_minutes = _ticks_between(since, min(now, premium_until), ECONOMY_TICK)
+        gold_minutes = minutes + (self.premium_multiplier - 1) * premium_minutes
+        oro = oro + int(oro_hora * gold_minutes)
+
+        hambre = max(0, hambre - int(minutes * self.hunger_loss_rate))
+        energia, collected = self._energy_and_collection(
+            energia, since, now, min(now, collector_until)
+        )
+        return {
+            "oro": oro,
+            "hambre": hambre,
+            "energia": energia,
+            "comida": comida + collected
+        }
+
+    def _energy_and_collection(self, energia: float, since: float, now: float, collector_end: float):
+        """
+        Energy at `now` and food gathered by the auto-collector.
+
+        Energy regenerates every minute up to the cap and each collector tick
+        (on the hour) spends 1 energy for 1 food. Between ticks energy follows
+        x -> min(cap, x + gain * minutes_per_tick) - 1, which is linear until it
+        reaches cap - 1 and then stays there, so the result is closed form.
+        """
+        gain = self.energy_gain_rate
+        cap = self.max_energy
+        ticks = _ticks_between(since, collector_end, self.collector_interval)
+        if ticks <= 0:
+            minutes = _ticks_between(since, now, ECONOMY_TICK)
+            return min(cap, energia + int(minutes * gain)), 0
+
+        if gain <= 0:
+            collected = max(0, min(int(energia), ticks))
+            return energia - collected, collected
+
+        first_tick = (math.floor(since / self.collector_interval) + 1) * self.collector_interval
+        last_tick = first_tick + (ticks - 1) * self.collector_interval
+
+        # Energy right after the first tick, then after the last one
+        energia = min(cap, energia + int(_ticks_between(since, first_tick, ECONOMY_TICK) * gain)) - 1
+        step = int(_ticks_between(first_tick, first_tick + self.collector_interval, ECONOMY_TICK) * gain) - 1
+        energia = max(energia, min(cap - 1, energia + (ticks - 1) * step))
+
+        minutes_after = _ticks_between(last_tick, now, ECONOMY_TICK)
+        return min(cap, energia + int(minutes_after * gain)), ticks
+
+    def project(self, player, now: Optional[float] = None) -> dict:
+        """Economy state of `player` at `now` (default: current time). Read-only."""
+        now = time.time() if now is None else now
+        mascota = player.mascota or {}
+        premium = player.premium_features or {}
+        since = player.ultima_actualizacion or now
+        return self.project_values(
+            oro=mascota.get("oro", 0),
+            hambre=mascota.get("hambre", 0),
+            energia=mascota.get("energia", 0),
+            comida=player.comida or 0,
+            oro_hora=mascota.get("oro_hora", 0),
+            since=since,
+            now=now,
+            premium_until=_active_until(
+                premium.get("premium_status", False),
+                player.premium_expires_at or premium.get("premium_status_expires")
+            ),
+            collector_until=_active_until(
+                premium.get("auto_collector", False),
+                player.auto_collector_expires_at or premium.get("auto_collector_expires")
+            )
+        )
+
+    def apply(self, player, now: Optional[float] = None) -> bool:
+        """Write the projected state into `player`. Returns False if already up to date."""
+        now = time.time() if now is None else now
+        since = player.ultima_actualizacion or now
+        if now <= since:
+            return False
+
+        state = self.project(player, now)
+        # Typed columns behind player.mascota (see HOT_FIELDS)
+        player.oro = state["oro"]
+        player.hambre = state["hambre"]
+        player.energia = state["energia"]
+        player.comida = state["comida"]
+        player.ultima_actualizacion = now
+        return True
+
+
+economy = EconomyEngine()
@@ -0,0 +1,164 @@
+# utils/economy_batch.py
+
+import time
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select, func
+
+from database.db.game_db import Session
+from database.models.player_model import Player
+from bot.utils.economy import EconomyEngine, economy, ECONOMY_TICK
+
+# Checkpoint fields read column-wise from the players table
+ECONOMY_INPUT_DTYPE = np.dtype([
+    ('id', np.int64),
+    ('oro', np.float64),
+    ('hambre', np.float64),
+    ('energia', np.float64),
+    ('comida', np.float64),
+    ('oro_hora', np.float64),
+    ('since', np.float64),
+    ('premium_until', np.float64),
+    ('collector_until', np.float64)
+])
+
+ECONOMY_OUTPUT_DTYPE = np.dtype([
+    ('id', np.int64),
+    ('oro', np.float64),
+    ('hambre', np.float64),
+    ('energia', np.float64),
+    ('comida', np.float64)
+])
+
+ECONOMY_LOAD_CHUNK = 50000
+
+
+def _economy_columns():
+    """Per-player checkpoint values extracted in SQL, in ECONOMY_INPUT_DTYPE order."""
+    premium = Player.premium_features
+    return [
+        Player.id,
+        Player.oro,
+        Player.hambre,
+        Player.energia,
+        Player.comida,
+        Player.oro_hora,
+        Player.ultima_actualizacion,
+        premium['premium_status'].as_boolean(),
+        func.coalesce(Player.premium_expires_at, premium['premium_status_expires'].as_float()),
+        premium['auto_collector'].as_boolean(),
+        func.coalesce(Player.auto_collector_expires_at, premium['auto_collector_expires'].as_float())
+    ]
+
+
+def _active_until(active: np.ndarray, expires_at: np.ndarray) -> np.ndarray:
+    """Vectorized `economy._active_until`."""
+    active = np.nan_to_num(active) != 0
+    return np.where(active, np.where(np.nan_to_num(expires_at) > 0, expires_at, np.inf), 0.0)
+
+
+def load_economy_arrays(session=None, chunk_size: int = ECONOMY_LOAD_CHUNK) -> np.ndarray:
+    """Read every player's economy checkpoint into a structured array."""
+    own_session = session is None
+    session = session or Session()
+    try:
+        result = (
+            session.connection()
+            .execution_options(stream_results=True)
+            .execute(select(*_economy_columns()))
+        )
+        chunks = []
+        for partition in result.partitions(chunk_size):
+            raw = np.array(partition, dtype=np.float64).reshape(-1, 11)
+            chunk = np.empty(len(raw), dtype=ECONOMY_INPUT_DTYPE)
+            chunk['id'] = raw[:, 0]
+            for column, name in enumerate(('oro', 'hambre', 'energia', 'comida', 'oro_hora', 'since'), start=1):
+                chunk[name] = np.nan_to_num(raw[:, column])
+            chunk['premium_until'] = _active_until(raw[:, 7], raw[:, 8])
+            chunk['collector_until'] = _active_until(raw[:, 9], raw[:, 10])
+            chunks.append(chunk)
+        if not chunks:
+            return np.empty(0, dtype=ECONOMY_INPUT_DTYPE)
+        return np.concatenate(chunks)
+    finally:
+        if own_session:
+            session.close()
+
+
+def _ticks_between(start: np.ndarray, end: np.ndarray, interval: float) -> np.ndarray:
+    """Vectorized `economy._ticks_between`."""
+    with np.errstate(invalid='ignore'):
+        ticks = np.floor(end / interval) - np.floor(start / interval)
+    return np.where(end > start, ticks, 0.0)
+
+
+def project_batch(
+    players: np.ndarray,
+    now: Optional[float] = None,
+    engine: EconomyEngine = economy
+) -> np.ndarray:
+    """
+    Project every checkpoint in `players` to `now`.
+
+    Mirrors `EconomyEngine.project_values` rule for rule, so results match
+    the per-player path exactly.
+    """
+    now = time.time() if now is None else now
+    since = players['since'].copy()
+    # Players without a checkpoint are treated as up to date
+    since[since <= 0] = now
+
+    minutes = _ticks_between(since, np.full_like(since, now), ECONOMY_TICK)
+
+    premium_end = np.minimum(now, players['premium_until'])
+    premium_minutes = _ticks_between(since, premium_end, ECONOMY_TICK)
+    gold_minutes = minutes + (engine.premium_multiplier - 1) * premium_minutes
+    oro = players['oro'] + np.trunc(players['oro_hora'] * gold_minutes)
+
+    hambre = np.maximum(0, players['hambre'] - np.trunc(minutes * engine.hunger_loss_rate))
+
+    energia, collected = _energy_and_collection(players['energia'], since, now, players['collector_until'], engine)
+
+    out = np.empty(len(players), dtype=ECONOMY_OUTPUT_DTYPE)
+    out['id'] = players['id']
+    out['oro'] = oro
+    out['hambre'] = hambre
+    out['energia'] = energia
+    out['comida'] = players['comida'] + collected
+    return out
+
+
+def _energy_and_collection(energia, since, now, collector_until, engine: EconomyEngine):
+    """Vectorized `EconomyEngine._energy_and_collection`."""
+    gain = engine.energy_gain_rate
+    cap = engine.max_energy
+    interval = engine.collector_interval
+
+    collector_end = np.minimum(now, collector_until)
+    ticks = _ticks_between(since, collector_end, interval)
+    has_ticks = ticks > 0
+
+    # No collection: plain capped regeneration
+    minutes = _ticks_between(since, np.full_like(since, now), ECONOMY_TICK)
+    regen_only = np.minimum(cap, energia + np.trunc(minutes * gain))
+
+    if gain <= 0:
+        collected = np.where(has_ticks, np.maximum(0, np.minimum(np.trunc(energia), ticks)), 0)
+        return np.where(has_ticks, energia - collected, regen_only), collected
+
+    first_tick = (np.floor(since / interval) + 1) * interval
+    last_tick = first_tick + np.maximum(ticks - 1, 0) * interval
+    step = np.trunc(_ticks_between(first_tick, first_tick + interval, ECONOMY_TICK) * gain) - 1
+
+    after_first = np.minimum(cap, energia + np.trunc(_ticks_between(since, first_tick, ECONOMY_TICK) * gain)) - 1
+    after_last = np.maximum(after_first, np.minimum(cap - 1, after_first + np.maximum(ticks - 1, 0) * step))
+    minutes_after = _ticks_between(last_tick, np.full_like(last_tick, now), ECONOMY_TICK)
+    with_collector = np.minimum(cap, after_last + np.trunc(minutes_after * gain))
+
+    return np.where(has_ticks, with_collector, regen_only), np.where(has_ticks, ticks, 0)
+
+
+def project_all_players(session=None, now: Optional[float] = None) -> np.ndarray:
+    """Projected gold, hunger, energy and food for every player."""
+    return project_batch(load_economy_arrays(session), now)
@@ -1,40 +1,68 @@
 # utils/keyboard.py
 
+from functools import lru_cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from typing import List, Optional, Dict
+from typing import List, Dict, Sequence, Tuple
 
-def generar_botones(player: Optional[dict] = None) -> InlineKeyboardMarkup:
-    """Generate main game menu buttons."""
+# Distinct keyboard layouts kept in memory
+KEYBOARD_CACHE_SIZE = 512
+
+# A button as (text, callback_data)
+ButtonSpec = Tuple[str, str]
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _build_markup(rows: Tuple[Tuple[ButtonSpec, ...], ...]) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(text, callback_data=data) for text, data in row]
+        for row in rows
+    ])
+
+def cached_keyboard(*rows: Sequence[ButtonSpec]) -> InlineKeyboardMarkup:
+    """
+    Markup for rows of (text, callback_data) buttons, built once per layout.
+
+    Markups are immutable in python-telegram-bot, so the same object can be
+    sent in any number of replies.
+    """
+    return _build_markup(tuple(tuple(row) for row in rows))
+
+def generar_botones(player=None) -> InlineKeyboardMarkup:
+    """Generate main game menu buttons (player: a Player or its dict form)."""
+    # The prestige button is the only part that depends on the player
+    mascota = (player['mascota'] if isinstance(player, dict) else player.mascota) if player else {}
+    show_prestige = mascota.get('nivel', 0) >= 100
+    return _main_menu(show_prestige)
+
+@lru_cache(maxsize=2)
+def _main_menu(show_prestige: bool) -> InlineKeyboardMarkup:
     botones = []
     
     # Basic buttons always present
-    botones.append([InlineKeyboardButton("🎮 Iniciar Juego 🎮", callback_data="start")])
-    botones.append([InlineKeyboardButton("🎁 Recompensa Diaria 🎁", callback_data="daily_reward")])
-    botones.append([InlineKeyboardButton("🌾 Recolectar Comida 🌾", callback_data="recolectar")])
-    botones.append([InlineKeyboardButton("🍖 Alimentar Mascota 🍖", callback_data="alimentar")])
-    botones.append([InlineKeyboardButton("📊 Ver Estado 📊", callback_data="estado")])
-    botones.append([InlineKeyboardButton("🏪 Ir a la Tienda 🏪", callback_data="tienda")])
-    botones.append([InlineKeyboardButton("🎁 Bonus Gratis (Ads)", callback_data="ads_menu")])
+    botones.append([("🎮 Iniciar Juego 🎮", "start")])
+    botones.append([("🎁 Recompensa Diaria 🎁", "daily_reward")])
+    botones.append([("🌾 Recolectar Comida 🌾", "recolectar")])
+    botones.append([("🍖 Alimentar Mascota 🍖", "alimentar")])
+    botones.append([("📊 Ver Estado 📊", "estado")])
+    botones.append([("🏪 Ir a la Tienda 🏪", "tienda")])
+    botones.append([("🎁 Bonus Gratis (Ads)", "ads_menu")])
     
     # Combat buttons
-    botones.append([InlineKeyboardButton("⚔️ Combate Rápido ⚔️", callback_data="combate")])
-    botones.append([InlineKeyboardButton("🗺️ MiniBoss 🗺️", callback_data="miniboss")])
+    botones.append([("⚔️ Combate Rápido ⚔️", "combate")])
+    botones.append([("🗺️ MiniBoss 🗺️", "miniboss")])
     
     # Premium shop and Portal buttons
-    botones.append([InlineKeyboardButton("💎 Tienda Premium 💎", callback_data="premium_shop")])
-    botones.append([InlineKeyboardButton("🌊 Portal de las Mareas 🌊", callback_data="portal")])
+    botones.append([("💎 Tienda Premium 💎", "premium_shop")])
+    botones.append([("🌊 Portal de las Mareas 🌊", "portal")])
 
-    
-    # If player data is provided, add conditional buttons
-    if player:
-        # Add prestige button if max level
-        if player['mascota']['nivel'] >= 100:
-            botones.append([InlineKeyboardButton("✨ Realizar Prestige ✨", callback_data="do_prestige")])
+    # Add prestige button if max level
+    if show_prestige:
+        botones.append([("✨ Realizar Prestige ✨", "do_prestige")])
     
     # Special content buttons (always available)
-    botones.append([InlineKeyboardButton("📜 WaterQuest 📜", callback_data="waterquest_menu")])
+    botones.append([("📜 WaterQuest 📜", "waterquest_menu")])
 
-    return InlineKeyboardMarkup(botones)
+    return cached_keyboard(*botones)
 
 def create_shop_keyboard(items: List[dict], player_gold: int) -> InlineKeyboardMarkup:
     """Generate shop menu buttons."""
@@ -43,47 +71,41 @@ def create_shop_keyboard(items: List[dict], player_gold: int) -> InlineKeyboardM
     for item in items:
         if player_gold >= item['costo']:
             emoji = item['emoji']
-            keyboard.append([InlineKeyboardButton(
-                f"Comprar {emoji} {item['nombre']} ({item['costo']} oro)",
-                callback_data=f"comprar_{item['nombre']}"
-            )])
+            keyboard.append([(f"Comprar {emoji} {item['nombre']} ({item['costo']} oro)", f"comprar_{item['nombre']}")])
     
     # Add navigation buttons
     keyboard.append([
-        InlineKeyboardButton("💎 Tienda Premium", callback_data="premium_shop"),
-        InlineKeyboardButton("🏠 Volver", callback_data="start")
+        ("💎 Tienda Premium", "premium_shop"),
+        ("🏠 Volver", "start")
     ])
     
-    return InlineKeyboardMarkup(keyboard)
+    return cached_keyboard(*keyboard)
 
 def create_premium_shop_keyboard(items: dict) -> InlineKeyboardMarkup:
     """Generate premium shop menu buttons."""
     keyboard = []
     
     for item_id, item in items.items():
-        keyboard.append([InlineKeyboardButton(
-            f"Comprar {item['name']} ({item['price']} TON)",
-            callback_data=f"premium_buy_{item_id}"
-        )])
+        keyboard.append([(f"Comprar {item['name']} ({item['price']} TON)", f"premium_buy_{item_id}")])
     
     keyboard.append([
-        InlineKeyboardButton("🏪 Tienda Normal", callback_data="tienda"),
-        InlineKeyboardButton("🏠 Volver", callback_data="start")
+        ("🏪 Tienda Normal", "tienda"),
+        ("🏠 Volver", "start")
     ])
     
-    return InlineKeyboardMarkup(keyboard)
+    return cached_keyboard(*keyboard)
 
 def create_miniboss_keyboard(stage: int) -> InlineKeyboardMarkup:
     """Generate MiniBoss battle buttons."""
     keyboard = []
     
     if stage < 5:  # Not final boss
-        keyboard.append([InlineKeyboardButton("⚔️ Siguiente Combate", callback_data="siguiente_miniboss")])
-        keyboard.append([InlineKeyboardButton("🏃 Retirarse", callback_data="retirarse_miniboss")])
+        keyboard.append([("⚔️ Siguiente Combate", "siguiente_miniboss")])
+        keyboard.append([("🏃 Retirarse", "retirarse_miniboss")])
     else:
-        keyboard.append([InlineKeyboardButton("🏠 Volver al Menú", callback_data="start")])
+        keyboard.append([("🏠 Volver al Menú", "start")])
     
-    return InlineKeyboardMarkup(keyboard)
+    return cached_keyboard(*keyboard)
 
 def create_confirmation_keyboard(
     confirm_data: str,
@@ -93,34 +115,34 @@ def create_confirmation_keyboard(
 ) -> InlineKeyboardMarkup:
     """Generate confirmation buttons."""
     keyboard = [[
-        InlineKeyboardButton(confirm_text, callback_data=confirm_data),
-        InlineKeyboardButton(cancel_text, callback_data=cancel_data)
+        (confirm_text, confirm_data),
+        (cancel_text, cancel_data)
     ]]
-    return InlineKeyboardMarkup(keyboard)
+    return cached_keyboard(*keyboard)
 
 def create_combat_keyboard(battles_left: int) -> InlineKeyboardMarkup:
     """Generate combat result buttons."""
     keyboard = []
     
     if battles_left > 0:
-        keyboard.append([InlineKeyboardButton("⚔️ Otro Combate", callback_data="combate")])
+        keyboard.append([("⚔️ Otro Combate", "combate")])
     
-    keyboard.append([InlineKeyboardButton("🏠 Volver", callback_data="start")])
+    keyboard.append([("🏠 Volver", "start")])
     
-    return InlineKeyboardMarkup(keyboard)
+    return cached_keyboard(*keyboard)
 
 def create_portal_keyboard(tickets: int) -> InlineKeyboardMarkup:
     """Generate Portal of Tides buttons."""
     keyboard = []
     
     if tickets > 0:
-        keyboard.append([InlineKeyboardButton("🌊 Abrir Portal (1 Fragmento)", callback_data="portal_spin_1")])
+        keyboard.append([("🌊 Abrir Portal (1 Fragmento)", "portal_spin_1")])
         if tickets >= 10:
-            keyboard.append([InlineKeyboardButton("🌟 10 Aperturas (Raro+ garantizado)", callback_data="portal_spin_10")])
+            keyboard.append([("🌟 10 Aperturas (Raro+ garantizado)", "portal_spin_10")])
     
-    keyboard.append([InlineKeyboardButton("🏠 Volver", callback_data="start")])
+    keyboard.append([("🏠 Volver", "start")])
     
-    return InlineKeyboardMarkup(keyboard)
+    return cached_keyboard(*keyboard)
 
 def create_waterquest_menu_keyboard() -> InlineKeyboardMarkup:
     """Generate WaterQuest menu buttons."""
@@ -128,13 +150,13 @@ def create_waterquest_menu_keyboard() -> InlineKeyboardMarkup:
     
     # Available quests
     keyboard.append([
-        InlineKeyboardButton("📜 La Voz del Abismo", callback_data="start_voice_of_abyss")
+        ("📜 La Voz del Abismo", "start_voice_of_abyss")
     ])
     
     # Navigation
-    keyboard.append([InlineKeyboardButton("🏠 Volver al Menú", callback_data="start")])
+    keyboard.append([("🏠 Volver al Menú", "start")])
     
-    return InlineKeyboardMarkup(keyboard)
+    return cached_keyboard(*keyboard)
 
 def create_waterquest_dialogue_keyboard(responses: List[Dict]) -> InlineKeyboardMarkup:
     """Generate dialogue choice buttons for WaterQuest."""
@@ -142,32 +164,29 @@ def create_waterquest_dialogue_keyboard(responses: List[Dict]) -> InlineKeyboard
     
     for response in responses:
         keyboard.append([
-            InlineKeyboardButton(
-                response["text"],
-                callback_data=f"quest_choice_{response['id']}"
-            )
+            (response["text"], f"quest_choice_{response['id']}")
         ])
     
-    return InlineKeyboardMarkup(keyboard)
+    return cached_keyboard(*keyboard)
 
 def create_menu_keyboard(current_menu: str = "main") -> InlineKeyboardMarkup:
     """Generate navigation menu buttons."""
     menus = {
         "main": [
-            [InlineKeyboardButton("🎮 Jugar", callback_data="start")],
-            [InlineKeyboardButton("📊 Estadísticas", callback_data="stats")],
-            [InlineKeyboardButton("❓ Ayuda", callback_data="help")]
+            [("🎮 Jugar", "start")],
+            [("📊 Estadísticas", "stats")],
+            [("❓ Ayuda", "help")]
         ],
         "stats": [
-            [InlineKeyboardButton("👥 Mi Perfil", callback_data="profile")],
-            [InlineKeyboardButton("🏆 Ranking", callback_data="ranking")],
-            [InlineKeyboardButton("🔙 Volver", callback_data="main_menu")]
+            [("👥 Mi Perfil", "profile")],
+            [("🏆 Ranking", "ranking")],
+            [("🔙 Volver", "main_menu")]
         ],
         "help": [
-            [InlineKeyboardButton("📖 Guía", callback_data="guide")],
-            [InlineKeyboardButton("💬 Soporte", callback_data="support")],
-            [InlineKeyboardButton("🔙 Volver", callback_data="main_menu")]
+            [("📖 Guía", "guide")],
+            [("💬 Soporte", "support")],
+            [("🔙 Volver", "main_menu")]
         ]
     }
     
-    return InlineKeyboardMarkup(menus.get(current_menu, menus["main"]))
\ No newline at end of file
+    return cached_keyboard(*menus.get(current_menu, menus["main"]))
\ No newline at end of file
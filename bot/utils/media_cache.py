@@ -0,0 +1,119 @@
+# utils/media_cache.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from telegram import Message
+from telegram.error import BadRequest
+
+from bot.config.settings import IMAGE_PATHS, MEDIA_CACHE_FILE
+
+logger = logging.getLogger(__name__)
+
+
+def _token_key(token: str) -> str:
+    """Stable, non-reversible key for a bot token (the token itself is never stored)."""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+
+
+def _image_key(path: Path) -> str:
+    """Identify an image by path, size and mtime so replaced files are re-uploaded."""
+    stat = os.stat(path)
+    return f"{path.as_posix()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class MediaCache:
+    """
+    Remembers Telegram `file_id`s of uploaded images.
+
+    The first send of an image uploads the file and stores the returned
+    `file_id` (per bot token, since ids are only valid for the bot that
+    uploaded them). Later sends reuse the id; if Telegram rejects it the
+    image is uploaded again and the id replaced. The cache file is written
+    in a worker thread, never on the event loop.
+    """
+
+    def __init__(self, cache_file: str = MEDIA_CACHE_FILE, images: Dict[str, Path] = IMAGE_PATHS):
+        self.cache_file = cache_file
+        self.images = images
+        self._file_ids: Dict[str, Dict[str, str]] = self._load()
+        self._write_lock = threading.Lock()
+        self._saves = 0
+        self._saved = 0
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading media cache: {e}")
+            return {}
+
+    def _write(self, data: str, save: int):
+        with self._write_lock:
+            # A later save may have been written first
+            if save <= self._saved:
+                return
+            tmp_file = self.cache_file + '.tmp'
+            try:
+                os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+                with open(tmp_file, 'w') as f:
+                    f.write(data)
+                os.replace(tmp_file, self.cache_file)
+                self._saved = save
+            except OSError as e:
+                logger.error(f"Error saving media cache: {e}")
+
+    async def _persist(self):
+        self._saves += 1
+        await asyncio.to_thread(self._write, json.dumps(self._file_ids, indent=2), self._saves)
+
+    def _key(self, name: str) -> str:
+        # Stat on every lookup (cheap) so a file replaced while running is noticed
+        return _image_key(Path(self.images[name]))
+
+    def get(self, token: str, name: str) -> Optional[str]:
+        return self._file_ids.get(_token_key(token), {}).get(self._key(name))
+
+    async def set(self, token: str, name: str, file_id: str):
+        file_ids = self._file_ids.setdefault(_token_key(token), {})
+        key = self._key(name)
+        # Ids of earlier versions of the same file are never used again
+        path = key.rsplit(':', 2)[0]
+        for old_key in [old_key for old_key in file_ids if old_key.rsplit(':', 2)[0] == path]:
+            del file_ids[old_key]
+        file_ids[key] = file_id
+        await self._persist()
+
+    async def forget(self, token: str, name: str):
+        if self._file_ids.get(_token_key(token), {}).pop(self._key(name), None) is not None:
+            await self._persist()
+
+    async def reply_photo(self, message: Message, name: str, **kwargs) -> Message:
+        """`message.reply_photo` for IMAGE_PATHS[name], by file_id when one is cached."""
+        token = message.get_bot().token
+        file_id = self.get(token, name)
+        if file_id:
+            try:
+                return await message.reply_photo(photo=file_id, **kwargs)
+            except BadRequest as e:
+                logger.warning(f"Cached file_id for {name} rejected ({e}), uploading again")
+                await self.forget(token, name)
+
+        data = await asyncio.to_thread(Path(self.images[name]).read_bytes)
+        sent = await message.reply_photo(photo=data, **kwargs)
+        if sent.photo:
+            # The largest PhotoSize is the original upload
+            await self.set(token, name, sent.photo[-1].file_id)
+        return sent
+
+
+media_cache = MediaCache()
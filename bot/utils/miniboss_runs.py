@@ -0,0 +1,242 @@
+# utils/miniboss_runs.py
+
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import select
+
+from database.db.game_db import Session
+from database.db.executor import run_db
+from database.models.player_model import Player
+from bot.config.settings import (
+    MINIBOSS_RUN_TTL,
+    MINIBOSS_MAX_RUNS,
+    MINIBOSS_WHEEL_SLOT,
+    MINIBOSS_PERSIST_RUNS
+)
+from bot.utils.player_store import player_store
+
+logger = logging.getLogger(__name__)
+
+
+class MiniBossRun:
+    """One in-flight MiniBoss run: current enemy and accumulated rewards."""
+
+    __slots__ = ('user_id', 'enemy', 'oro', 'coral', 'exp', 'expires_at')
+
+    def __init__(self, user_id: int, enemy: int = 1, oro: int = 0, coral: int = 0, exp: int = 0, expires_at: float = 0.0):
+        self.user_id = user_id
+        self.enemy = enemy
+        self.oro = oro
+        self.coral = coral
+        self.exp = exp
+        self.expires_at = expires_at
+
+    def add_rewards(self, rewards: dict):
+        self.oro += rewards["oro"]
+        self.coral += rewards["coral"]
+        self.exp += rewards["exp"]
+
+    def to_dict(self) -> dict:
+        """Persisted form, in the shape of the old miniboss state."""
+        return {
+            "enemigo_actual": self.enemy,
+            "recompensas": {"oro": self.oro, "coral": self.coral, "exp": self.exp},
+            "expires_at": self.expires_at
+        }
+
+    @classmethod
+    def from_dict(cls, user_id: int, data: Optional[dict]) -> Optional['MiniBossRun']:
+        if not data or "enemigo_actual" not in data:
+            return None
+        recompensas = data.get("recompensas", {})
+        return cls(
+            user_id,
+            data["enemigo_actual"],
+            recompensas.get("oro", 0),
+            recompensas.get("coral", 0),
+            recompensas.get("exp", 0),
+            data.get("expires_at", 0.0)
+        )
+
+
+def _load_persisted_run(user_id: int) -> Optional[dict]:
+    """Read only the miniboss_stats column of one player."""
+    session = Session()
+    try:
+        stats = session.execute(select(Player.miniboss_stats).where(Player.id == user_id)).scalar()
+        return (stats or {}).get('run')
+    finally:
+        session.close()
+
+
+class MiniBossRunStore:
+    """
+    Bounded store of in-flight MiniBoss runs.
+
+    Runs expire MINIBOSS_RUN_TTL seconds after their last step. Expiry
+    uses a timer wheel of MINIBOSS_WHEEL_SLOT-second slots, so scheduling
+    and expiring a run are O(1) and a sweep only looks at the slots whose
+    time has come. At most `max_runs` runs are kept; beyond that the least
+    recently used one is dropped.
+
+    With persistence on, runs are also copied into
+    `player.miniboss_stats['run']` (saved with the player), and a run
+    missing from memory, e.g. after a restart, is read back from the
+    cached player or from that single column.
+    """
+
+    def __init__(
+        self,
+        ttl: float = MINIBOSS_RUN_TTL,
+        max_runs: int = MINIBOSS_MAX_RUNS,
+        slot_seconds: float = MINIBOSS_WHEEL_SLOT,
+        persist: bool = MINIBOSS_PERSIST_RUNS
+    ):
+        self.ttl = ttl
+        self.max_runs = max_runs
+        self.slot_seconds = slot_seconds
+        self.persist = persist
+        self._runs: "OrderedDict[int, MiniBossRun]" = OrderedDict()
+        # One slot more than the TTL spans, so a run never wraps onto a slot swept before it is due
+        self._wheel: List[Set[int]] = [set() for _ in range(int(ttl // slot_seconds) + 2)]
+        self._tick: Optional[int] = None
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._runs)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._runs
+
+    # Timer wheel
+    def _slot(self, expires_at: float) -> Set[int]:
+        return self._wheel[int(expires_at // self.slot_seconds) % len(self._wheel)]
+
+    def _schedule(self, run: MiniBossRun, expires_at: float):
+        if run.expires_at:
+            self._slot(run.expires_at).discard(run.user_id)
+        run.expires_at = expires_at
+        self._slot(expires_at).add(run.user_id)
+
+    def _remove(self, user_id: int) -> Optional[MiniBossRun]:
+        run = self._runs.pop(user_id, None)
+        if run is not None:
+            self._slot(run.expires_at).discard(user_id)
+        return run
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop every run whose TTL has passed; returns how many."""
+        now = time.time() if now is None else now
+        tick = int(now // self.slot_seconds)
+        if self._tick is None:
+            self._tick = tick
+        # The slot of the last sweep may still hold runs due later in that tick
+        ticks = range(self._tick, tick + 1) if tick - self._tick < len(self._wheel) else range(len(self._wheel))
+        removed = 0
+        for t in ticks:
+            slot = self._wheel[t % len(self._wheel)]
+            due = [user_id for user_id in slot if self._runs[user_id].expires_at <= now]
+            for user_id in due:
+                self._remove(user_id)
+            removed += len(due)
+        self._tick = tick
+        self.expired += removed
+        return removed
+
+    # Runs
+    def _insert(self, run: MiniBossRun, expires_at: float):
+        self._remove(run.user_id)
+        while len(self._runs) >= self.max_runs:
+            oldest, oldest_run = self._runs.popitem(last=False)
+            self._slot(oldest_run.expires_at).discard(oldest)
+            self.evicted += 1
+        self._runs[run.user_id] = run
+        self._schedule(run, expires_at)
+
+    def start(self, user_id: int, now: Optional[float] = None) -> MiniBossRun:
+        """Begin a new run at the first enemy, replacing any previous one."""
+        now = time.time() if now is None else now
+        self.expire(now)
+        run = MiniBossRun(user_id)
+        self._insert(run, now + self.ttl)
+        return run
+
+    def get(self, user_id: int, now: Optional[float] = None) -> Optional[MiniBossRun]:
+        """The user's run if it is in memory and alive."""
+        now = time.time() if now is None else now
+        self.expire(now)
+        run = self._runs.get(user_id)
+        if run is not None:
+            self._runs.move_to_end(user_id)
+        return run
+
+    async def aget(self, user_id: int, now: Optional[float] = None) -> Optional[MiniBossRun]:
+        """Like `get`, but falls back to the persisted copy of the run."""
+        now = time.time() if now is None else now
+        run = self.get(user_id, now)
+        if run is not None or not self.persist:
+            return run
+
+        player = player_store.peek(user_id)
+        if player is not None:
+            data = (player.miniboss_stats or {}).get('run')
+        else:
+            data = await run_db(_load_persisted_run, user_id)
+
+        run = MiniBossRun.from_dict(user_id, data)
+        if run is None or run.expires_at <= now:
+            return None
+        expires_at, run.expires_at = run.expires_at, 0.0
+        self._insert(run, expires_at)
+        return run
+
+    def touch(self, run: MiniBossRun, now: Optional[float] = None):
+        """Restart the TTL of `run` after a step."""
+        now = time.time() if now is None else now
+        if run.user_id in self._runs:
+            self._runs.move_to_end(run.user_id)
+            self._schedule(run, now + self.ttl)
+
+    def finish(self, user_id: int) -> Optional[MiniBossRun]:
+        return self._remove(user_id)
+
+    # Persistence
+    def save(self, player, run: MiniBossRun):
+        """Copy the run into the player (written with the next player flush)."""
+        if self.persist:
+            player.miniboss_stats['run'] = run.to_dict()
+
+    def clear(self, player):
+        self.finish(player.id)
+        if player.miniboss_stats:
+            player.miniboss_stats.pop('run', None)
+
+    # Metrics
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the store (containers plus run records)."""
+        size = sys.getsizeof(self._runs) + sys.getsizeof(self._wheel)
+        size += sum(sys.getsizeof(slot) for slot in self._wheel)
+        if self._runs:
+            # Records share one layout; sample one instead of walking all of them
+            sample = next(iter(self._runs.values()))
+            per_run = sys.getsizeof(sample) + sum(
+                sys.getsizeof(getattr(sample, field)) for field in MiniBossRun.__slots__
+            )
+            size += per_run * len(self._runs)
+        return size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "runs": len(self._runs),
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "bytes": self.memory_bytes()
+        }
+
+
+miniboss_runs = MiniBossRunStore()
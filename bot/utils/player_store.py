@@ -0,0 +1,475 @@
+# utils/player_store.py
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from database.db.game_db import Session
+from database.db.executor import run_db
+from database.models.player_model import Player
+from database.models.tracked_json import TrackedJSON, JSONPatch, plain, merge_paths
+from bot.config.settings import PLAYER_STORE_MAX_SIZE, PLAYER_STORE_FLUSH_BATCH, INCREMENTAL_SAVE
+from bot.utils.save_system import save_game_data, save_game_data_incremental
+
+logger = logging.getLogger(__name__)
+
+
+# Baseline of a JSON column: its TrackedJSON value records its own changes
+_TRACKED = object()
+
+
+def _baseline(row: dict) -> dict:
+    return {
+        name: _TRACKED if isinstance(value, (dict, list, JSONPatch)) else value
+        for name, value in row.items()
+    }
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _rebase_scalar(mine, persisted, theirs):
+    """Our change of one column replayed on the other writer's value: counters add up, the rest is ours."""
+    if mine == persisted:
+        return theirs
+    if _is_number(mine) and _is_number(persisted) and _is_number(theirs):
+        return theirs + (mine - persisted)
+    return mine
+
+
+class PlayerStore:
+    """
+    In-memory authoritative store for hot players.
+
+    Players are loaded from the database once and kept detached in an LRU
+    cache. Handlers mutate the cached object and call `mark_dirty`; dirty
+    players are written back in batches by `aflush` (periodic job) or
+    `flush` (shutdown). Only clean players that no update scope holds
+    (`pin`) are evicted, so no change is lost when the cache is full.
+    Players are only read and changed on the event loop; the database
+    thread pool gets plain copies to write.
+
+    Writes are compare-and-swap on `Player.version`. When another writer
+    (replica, bulk job) changed a player first, the row is reloaded and
+    the changes not yet written are replayed on top of it: changed
+    counters add their difference, other changed columns and JSON keys
+    keep our value, everything else takes theirs. The player stays dirty
+    and is written with the next flush. Handlers whose step must see the
+    latest row write through `update_scope.atomic` instead, which re-runs
+    the step.
+
+    The store remembers the scalars it last loaded or wrote for every
+    player, and JSON columns track their own mutations (TrackedJSON), so a
+    flush only sends what changed since: a collected batch of food touches
+    comida and energia, a purchase one key of inventario.
+    """
+
+    def __init__(self, max_size: int = PLAYER_STORE_MAX_SIZE, flush_batch: int = PLAYER_STORE_FLUSH_BATCH):
+        self.max_size = max_size
+        self.flush_batch = flush_batch
+        self._players: "OrderedDict[int, Player]" = OrderedDict()
+        self._dirty: set = set()
+        # Last scalars loaded or written per player, to diff against
+        self._persisted: Dict[int, dict] = {}
+        # Players held by open update scopes, with how many hold them
+        self._pins: Dict[int, int] = {}
+        self._lock = threading.RLock()
+        self.last_flush = {"rows": 0, "conflicts": 0, "elapsed": 0.0}
+        self.conflicts = 0
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._players
+
+    def get(self, user_id: int) -> Optional[Player]:
+        """Return the cached player, loading it from the database on a miss."""
+        with self._lock:
+            player = self._players.get(user_id)
+            if player is not None:
+                self._players.move_to_end(user_id)
+                return player
+
+        player = self._load(user_id)
+        if player is None:
+            return None
+
+        with self._lock:
+            # Another caller may have loaded the same player in the meantime
+            existing = self._players.get(user_id)
+            if existing is not None:
+                self._players.move_to_end(user_id)
+                return existing
+            self._players[user_id] = player
+            row = player.to_dict()
+            for value in row.values():
+                if isinstance(value, TrackedJSON):
+                    # Freshly loaded values count as unchanged
+                    value.take_changes()
+            self._persisted[user_id] = _baseline(row)
+            self._evict()
+        return player
+
+    async def aget(self, user_id: int) -> Optional[Player]:
+        """Async `get`: hits return immediately, misses load in the DB thread pool."""
+        with self._lock:
+            player = self._players.get(user_id)
+            if player is not None:
+                self._players.move_to_end(user_id)
+                return player
+        return await run_db(self.get, user_id)
+
+    def peek(self, user_id: int) -> Optional[Player]:
+        """Return the cached player without loading it or touching LRU order."""
+        with self._lock:
+            return self._players.get(user_id)
+
+    def add(self, player: Player):
+        """Insert a new player and schedule it for persistence."""
+        with self._lock:
+            self._players[player.id] = player
+            self._players.move_to_end(player.id)
+            self._dirty.add(player.id)
+            self._evict()
+
+    def mark_dirty(self, user_id: int):
+        """Flag a cached player as modified since the last flush."""
+        with self._lock:
+            if user_id in self._players:
+                self._dirty.add(user_id)
+
+    def pin(self, user_id: int):
+        """Keep a player cached while an update scope holds it, even if it is clean."""
+        with self._lock:
+            self._pins[user_id] = self._pins.get(user_id, 0) + 1
+
+    def unpin(self, user_id: int):
+        with self._lock:
+            count = self._pins.pop(user_id, 0) - 1
+            if count > 0:
+                self._pins[user_id] = count
+
+    def discard(self, user_id: int):
+        """Drop a player from the cache without persisting pending changes."""
+        with self._lock:
+            self._players.pop(user_id, None)
+            self._persisted.pop(user_id, None)
+            self._dirty.discard(user_id)
+
+    def dirty_count(self) -> int:
+        with self._lock:
+            return len(self._dirty)
+
+    def _snapshot(self, user_ids) -> Tuple[dict, dict]:
+        """
+        Rows to write for `user_ids`, each carrying the version it will have once written.
+
+        The players are no longer dirty afterwards; changes made after the
+        snapshot mark them dirty again. Returns (full, partial): players this store never loaded or wrote
+        get full rows, the others only the scalars that differ from the
+        last persisted row plus a JSONPatch per changed JSON column, or no
+        row at all if nothing changed.
+        """
+        with self._lock:
+            full, partial = {}, {}
+            for user_id in user_ids:
+                self._dirty.discard(user_id)
+                player = self._players.get(user_id)
+                if player is None:
+                    continue
+                row = player.to_dict()
+                persisted = self._persisted.get(user_id)
+                if persisted is None:
+                    for value in row.values():
+                        if isinstance(value, TrackedJSON):
+                            value.take_changes()
+                    row = {name: plain(value) for name, value in row.items()}
+                    target = full
+                else:
+                    changes = {}
+                    for name, value in row.items():
+                        if name in ('id', 'version'):
+                            continue
+                        if isinstance(value, TrackedJSON):
+                            patch = value.take_changes()
+                            if patch is not None:
+                                changes[name] = patch
+                        elif value != persisted.get(name):
+                            changes[name] = plain(value)
+                    if not changes:
+                        continue
+                    row = changes
+                    target = partial
+                row['version'] = (player.version or 0) + 1
+                target[user_id] = row
+            return full, partial
+
+    def _written(self, batch: dict, conflicts: list, fresh: Optional[dict]):
+        """
+        Adopt the new versions of written rows and handle the players that lost a race.
+
+        Those are rebased onto the row the other writer left (`fresh`, see
+        the class docstring), or dropped when `fresh` has no row for them so
+        the next `get` reloads them. `fresh` is None when it could not be
+        loaded; the players then stay dirty and retry with the next flush.
+        """
+        conflicted = set(conflicts)
+        with self._lock:
+            for user_id, row in batch.items():
+                player = self._players.get(user_id)
+                if player is None or user_id in conflicted:
+                    continue
+                if (player.version or 0) == row['version'] - 1:
+                    player.version = row['version']
+                self._persisted.setdefault(user_id, {}).update(_baseline(row))
+        if not conflicted:
+            return
+
+        self.conflicts += len(conflicted)
+        if fresh is None:
+            self._restore(conflicted)
+            return
+
+        with self._lock:
+            for user_id in conflicted:
+                player = self._players.get(user_id)
+                if player is None:
+                    continue
+                if user_id in fresh:
+                    self._rebase(user_id, player, batch[user_id], fresh[user_id])
+                else:
+                    del self._players[user_id]
+                    self._persisted.pop(user_id, None)
+                    self._dirty.discard(user_id)
+        rebased = sorted(set(fresh) & conflicted)
+        if rebased:
+            logger.warning(f"PlayerStore rebased {len(rebased)} players changed by another writer: {rebased[:20]}")
+        if len(rebased) < len(conflicted):
+            logger.warning(f"PlayerStore dropped {len(conflicted) - len(rebased)} players changed by another writer")
+
+    def _rebase(self, user_id: int, player: Player, sent: dict, fresh: dict):
+        """Replay the unwritten changes of a cached player on the row another writer left."""
+        persisted = self._persisted.get(user_id)
+        row = {}
+        clean = []
+        for name, value in player.to_dict().items():
+            if name in ('id', 'version'):
+                continue
+            theirs = fresh.get(name)
+            if isinstance(value, TrackedJSON):
+                patches = [sent.get(name), value.take_changes()]
+                if persisted is None or any(isinstance(patch, JSONPatch) and patch.ops is None for patch in patches):
+                    row[name] = plain(value)
+                else:
+                    paths = [path for patch in patches if isinstance(patch, JSONPatch) for path, _ in patch.ops]
+                    row[name] = merge_paths(theirs, value, paths) if paths else theirs
+                if row[name] == theirs:
+                    clean.append(name)
+            elif persisted is None:
+                # Never written by us: every column is ours
+                row[name] = value
+            else:
+                row[name] = _rebase_scalar(value, persisted.get(name), theirs)
+
+        player.apply_row(row)
+        player.version = fresh['version']
+        for name, value in player.to_dict().items():
+            if name in clean and isinstance(value, TrackedJSON):
+                # Same as the database already holds
+                value.take_changes()
+        self._persisted[user_id] = _baseline(fresh)
+        self._dirty.add(user_id)
+
+    def _restore(self, user_ids):
+        """Mark players dirty again after a snapshot or write that failed half-way."""
+        with self._lock:
+            for user_id in user_ids:
+                player = self._players.get(user_id)
+                if player is None:
+                    continue
+                self._dirty.add(user_id)
+                # Key-level changes may already be taken; write those columns whole
+                for value in player.to_dict().values():
+                    if isinstance(value, TrackedJSON):
+                        value.invalidate()
+
+    def _save(self, full: dict, partial: dict, rebase: bool = True) -> list:
+        """
+        Write a snapshot; runs in the database thread and touches no player.
+
+        Returns one result per written batch. With `rebase` it carries the
+        current rows of the players that lost a race (None if they could
+        not be loaded), otherwise no rows so those players are dropped.
+        """
+        results = []
+        for batch, is_partial in ((full, False), (partial, True)):
+            if not batch:
+                continue
+            if INCREMENTAL_SAVE:
+                result = save_game_data_incremental(batch, partial=is_partial)
+            else:
+                # The ORM bumps every version by one as well
+                saved = save_game_data(batch)
+                result = {"success": saved, "rows": len(batch) if saved else 0, "conflicts": []}
+            result = dict(result, batch=batch, fresh={})
+            if rebase and result["conflicts"]:
+                try:
+                    result["fresh"] = self._load_rows(result["conflicts"])
+                except Exception as e:
+                    # Keep our changes; the next flush conflicts again and retries
+                    logger.error(f"PlayerStore could not reload players changed by another writer: {e}")
+                    result["fresh"] = None
+            results.append(result)
+        return results
+
+    def _apply(self, results: list) -> dict:
+        """Apply the results of `_save` to the cached players; failed rows go back to dirty."""
+        outcome = {"success": True, "rows": 0, "conflicts": []}
+        for result in results:
+            batch = result["batch"]
+            outcome["rows"] += result["rows"]
+            outcome["conflicts"] += result["conflicts"]
+            # Chunks committed before a failure keep their write
+            written = result.get("written", list(batch) if result["success"] else [])
+            done = set(written) | set(result["conflicts"])
+            self._written({user_id: row for user_id, row in batch.items() if user_id in done}, result["conflicts"], result["fresh"])
+            failed = [row for user_id, row in batch.items() if user_id not in done]
+            if failed:
+                with self._lock:
+                    self._dirty.update(user_id for user_id in batch if user_id not in done)
+                    # The key-level changes were taken; write those columns whole next time
+                    for row in failed:
+                        for value in row.values():
+                            if isinstance(value, JSONPatch):
+                                value.root.invalidate()
+            if not result["success"]:
+                outcome["success"] = False
+        return outcome
+
+    def commit(self, user_id: int, rebase: bool = True) -> bool:
+        """
+        Write one cached player now (compare-and-swap).
+
+        Returns False if another writer changed the row first; the player
+        is then rebased onto that row (still dirty), or with rebase=False
+        dropped so the next `get` reloads it. On a database error the
+        player stays dirty for the next flush.
+
+        Runs everything in the calling thread, so it is only for code that
+        owns the players (shutdown, tools); handlers use `acommit`.
+        """
+        try:
+            full, partial = self._snapshot([user_id])
+            if not full and not partial:
+                return True
+            result = self._apply(self._save(full, partial, rebase))
+        except Exception:
+            self._restore([user_id])
+            raise
+        return not result["conflicts"]
+
+    async def acommit(self, user_id: int, rebase: bool = True) -> bool:
+        """`commit` from the event loop: the player is copied here, only the write runs in the DB thread pool."""
+        try:
+            full, partial = self._snapshot([user_id])
+            if not full and not partial:
+                return True
+            result = self._apply(await run_db(self._save, full, partial, rebase))
+        except Exception:
+            self._restore([user_id])
+            raise
+        return not result["conflicts"]
+
+    def flush(self) -> bool:
+        """
+        Persist every dirty player in batches. Returns False if any batch failed.
+
+        Like `commit` this runs in the calling thread; the save job uses `aflush`.
+        """
+        started = time.perf_counter()
+        results = []
+        for batch in self._pending_batches():
+            try:
+                full, partial = self._snapshot(batch)
+                results.append(self._apply(self._save(full, partial)))
+            except Exception as e:
+                logger.error(f"PlayerStore flush failed for {len(batch)} players: {e}")
+                self._restore(batch)
+                results.append(None)
+        return self._flushed(results, started)
+
+    async def aflush(self) -> bool:
+        """`flush` from the event loop: players are copied here, only the writes run in the DB thread pool."""
+        started = time.perf_counter()
+        results = []
+        for batch in self._pending_batches():
+            try:
+                full, partial = self._snapshot(batch)
+                results.append(self._apply(await run_db(self._save, full, partial)))
+            except Exception as e:
+                logger.error(f"PlayerStore flush failed for {len(batch)} players: {e}")
+                self._restore(batch)
+                results.append(None)
+        return self._flushed(results, started)
+
+    def _pending_batches(self) -> list:
+        with self._lock:
+            pending = list(self._dirty)
+        return [pending[start:start + self.flush_batch] for start in range(0, len(pending), self.flush_batch)]
+
+    def _flushed(self, results: list, started: float) -> bool:
+        """Evict what no longer fits and record the stats of a flush (None marks a failed batch)."""
+        with self._lock:
+            self._evict()
+        done = [result for result in results if result is not None]
+        self.last_flush = {
+            "rows": sum(result["rows"] for result in done),
+            "conflicts": sum(len(result["conflicts"]) for result in done),
+            "elapsed": time.perf_counter() - started
+        }
+        if results:
+            logger.info(f"PlayerStore flushed {self.last_flush['rows']} rows ({len(self._players)} cached)")
+        return len(done) == len(results) and all(result["success"] for result in done)
+
+    def _load_rows(self, user_ids) -> Dict[int, dict]:
+        """Current rows of `user_ids` as plain dicts (see Player.to_dict)."""
+        session = Session()
+        try:
+            return {
+                player.id: {name: plain(value) for name, value in player.to_dict().items()}
+                for player in session.query(Player).filter(Player.id.in_(list(user_ids)))
+            }
+        finally:
+            session.close()
+
+    def _load(self, user_id: int) -> Optional[Player]:
+        session = Session()
+        try:
+            player = session.query(Player).filter(Player.id == user_id).first()
+            if player is not None:
+                session.expunge(player)
+            return player
+        finally:
+            session.close()
+
+    def _evict(self):
+        """Evict least recently used clean players until the cache fits."""
+        overflow = len(self._players) - self.max_size
+        if overflow <= 0:
+            return
+        for user_id in list(self._players.keys()):
+            if overflow <= 0:
+                break
+            if user_id in self._dirty or user_id in self._pins:
+                # Dirty players stay until the next flush writes them, held ones until their scope ends
+                continue
+            del self._players[user_id]
+            self._persisted.pop(user_id, None)
+            overflow -= 1
+
+
+player_store = PlayerStore()
@@ -0,0 +1,170 @@
+# utils/portal_engine.py
+
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bot.config.portal_config import PORTAL_REWARDS, RARITY_CHANCES, RARITY_ORDER, PITY_SYSTEM
+
+PITY_COUNTERS = {
+    "legendary": "spins_since_legendary",
+    "epic": "spins_since_epic",
+    "rare": "spins_since_rare"
+}
+
+
+def new_portal_stats() -> dict:
+    return {
+        'total_spins': 0,
+        'spins_since_legendary': 0,
+        'spins_since_epic': 0,
+        'spins_since_rare': 0
+    }
+
+
+class AliasTable:
+    """
+    Walker/Vose alias table: O(1) weighted sampling after an O(n) build.
+
+    Each slot holds an acceptance probability and an alias; a sample is one
+    uniform draw split into a slot index and a coin flip.
+    """
+
+    def __init__(self, items: Sequence, weights: Sequence[float]):
+        if not items or len(items) != len(weights):
+            raise ValueError("AliasTable needs one weight per item")
+        total = float(sum(weights))
+        if total <= 0 or any(w < 0 for w in weights):
+            raise ValueError("AliasTable weights must be non-negative with a positive sum")
+
+        n = len(items)
+        scaled = [w * n / total for w in weights]
+        self.items = tuple(items)
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Whatever is left is 1.0 up to rounding error
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self, rng) -> object:
+        u = rng.random() * len(self.items)
+        i = int(u)
+        return self.items[i if u - i < self.prob[i] else self.alias[i]]
+
+
+class SpinResult:
+    """Outcome of a batch of spins: every (rarity, reward) pair plus aggregated totals."""
+
+    def __init__(self):
+        self.rewards: List[Tuple[str, dict]] = []
+        self.rarities: Dict[str, int] = {rarity: 0 for rarity in RARITY_ORDER}
+        # Additive totals per reward type; gold_boost is a multiplier, premium_status the longest grant
+        self.totals: Dict[str, float] = {}
+
+    def add(self, rarity: str, reward: dict):
+        self.rewards.append((rarity, reward))
+        self.rarities[rarity] += 1
+        kind, value = reward["type"], reward["value"]
+        if kind == "gold_boost":
+            self.totals[kind] = self.totals.get(kind, 1.0) * (1 + value)
+        elif kind == "premium_status":
+            self.totals[kind] = max(self.totals.get(kind, 0), value)
+        else:
+            self.totals[kind] = self.totals.get(kind, 0) + value
+
+
+class PortalEngine:
+    """
+    Portal of Tides draws.
+
+    Alias tables for the rarity roll and for every reward pool are built
+    once, so a spin costs two uniform draws. Pity is checked before the
+    roll: the legendary guarantee always applies, the epic and rare ones
+    only on multi-spins. Pass a seeded `random.Random` as `rng` for
+    reproducible results.
+    """
+
+    def __init__(
+        self,
+        rarity_chances: Dict[str, float] = RARITY_CHANCES,
+        rewards: Dict[str, dict] = PORTAL_REWARDS,
+        pity: Dict[str, int] = PITY_SYSTEM,
+        rng: Optional[random.Random] = None
+    ):
+        self.rng = rng or random.Random()
+        self.pity = dict(pity)
+        self.rarity_table = AliasTable(list(rarity_chances), list(rarity_chances.values()))
+        self.reward_tables = {
+            rarity: AliasTable(pool["rewards"], [r["weight"] for r in pool["rewards"]])
+            for rarity, pool in rewards.items()
+        }
+
+    def spins_until(self, stats: dict, rarity: str) -> int:
+        """Spins left before the pity guarantee of `rarity` triggers."""
+        return self.pity[f"{rarity}_pity"] - stats.get(PITY_COUNTERS[rarity], 0)
+
+    def spin(self, stats: dict, n: int = 1, multi: Optional[bool] = None) -> SpinResult:
+        """
+        Resolve `n` spins against the pity counters in `stats` (updated in place).
+
+        `multi` enables the epic/rare guarantees; by default it is on for n > 1.
+        """
+        if multi is None:
+            multi = n > 1
+        for key, value in new_portal_stats().items():
+            stats.setdefault(key, value)
+
+        rng = self.rng
+        sample_rarity = self.rarity_table.sample
+        reward_tables = self.reward_tables
+        legendary_pity = self.pity['legendary_pity']
+        epic_pity = self.pity['epic_pity'] if multi else None
+        rare_pity = self.pity['rare_pity'] if multi else None
+
+        total = stats['total_spins']
+        since_legendary = stats['spins_since_legendary']
+        since_epic = stats['spins_since_epic']
+        since_rare = stats['spins_since_rare']
+
+        result = SpinResult()
+        for _ in range(n):
+            total += 1
+            since_legendary += 1
+            since_epic += 1
+            since_rare += 1
+
+            if since_legendary >= legendary_pity:
+                rarity = "legendary"
+            elif epic_pity is not None and since_epic >= epic_pity:
+                rarity = "epic"
+            elif rare_pity is not None and since_rare >= rare_pity:
+                rarity = "rare"
+            else:
+                rarity = sample_rarity(rng)
+
+            if rarity == "legendary":
+                since_legendary = since_epic = since_rare = 0
+            elif rarity == "epic":
+                since_epic = since_rare = 0
+            elif rarity == "rare":
+                since_rare = 0
+
+            result.add(rarity, reward_tables[rarity].sample(rng))
+
+        stats['total_spins'] = total
+        stats['spins_since_legendary'] = since_legendary
+        stats['spins_since_epic'] = since_epic
+        stats['spins_since_rare'] = since_rare
+        return result
+
+
+portal_engine = PortalEngine()
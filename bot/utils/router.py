@@ -0,0 +1,121 @@
+# utils/router.py
+
+import bisect
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (milliseconds) of the latency histogram buckets; the last one is open
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class Route:
+    """A callback_data route and its per-route metrics."""
+
+    def __init__(self, key: str, handler: Callable, prefix: bool = False, args: Sequence[Callable] = ()):
+        self.key = key
+        self.handler = handler
+        self.prefix = prefix
+        self.args = tuple(args)
+        self.hits = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def parse(self, suffix: str) -> Optional[tuple]:
+        """Convert the text after a prefix into typed handler arguments (None if invalid)."""
+        if not self.args:
+            return ()
+        parts = suffix.split('_', len(self.args) - 1)
+        if len(parts) != len(self.args) or not all(parts):
+            return None
+        try:
+            return tuple(convert(part) for convert, part in zip(self.args, parts))
+        except ValueError:
+            return None
+
+    def record(self, elapsed_ms: float, failed: bool):
+        self.hits += 1
+        self.errors += failed
+        self.total_ms += elapsed_ms
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def metrics(self) -> dict:
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "hits": self.hits,
+            "errors": self.errors,
+            "avg_ms": self.total_ms / self.hits if self.hits else 0.0,
+            "histogram": dict(zip(labels, self.histogram))
+        }
+
+
+class CallbackRouter:
+    """
+    Declarative callback_data dispatcher.
+
+    Exact routes live in a dict; prefix routes are grouped by prefix length
+    and matched longest first, so dispatch costs one dict lookup per
+    distinct prefix length. Exact routes always win over prefixes (e.g.
+    "comprar_fragmentos" over "comprar_"). Prefix routes can declare typed
+    arguments parsed from the rest of the callback_data, split on "_".
+    """
+
+    def __init__(self):
+        self._exact: Dict[str, Route] = {}
+        self._prefixes: Dict[str, Route] = {}
+        self._prefix_lengths: List[int] = []
+
+    def exact(self, data: str, handler: Callable) -> 'CallbackRouter':
+        self._add(self._exact, Route(data, handler))
+        return self
+
+    def prefix(self, prefix: str, handler: Callable, *args: Callable) -> 'CallbackRouter':
+        self._add(self._prefixes, Route(prefix, handler, prefix=True, args=args))
+        return self
+
+    def _add(self, table: Dict[str, Route], route: Route):
+        if route.key in table:
+            raise ValueError(f"Duplicate callback route: {route.key}")
+        table[route.key] = route
+        self._prefix_lengths = sorted({len(key) for key in self._prefixes}, reverse=True)
+
+    def resolve(self, data: str) -> Tuple[Optional[Route], tuple]:
+        """Find the route for `data` and its parsed arguments."""
+        route = self._exact.get(data)
+        if route is not None:
+            return route, ()
+        for length in self._prefix_lengths:
+            route = self._prefixes.get(data[:length])
+            if route is not None:
+                args = route.parse(data[length:])
+                if args is not None:
+                    return route, args
+        return None, ()
+
+    async def dispatch(self, update, context) -> bool:
+        """Run the handler for the update's callback_data. Returns False if nothing matched."""
+        data = update.callback_query.data or ""
+        route, args = self.resolve(data)
+        if route is None:
+            return False
+
+        started = time.perf_counter()
+        failed = True
+        try:
+            await route.handler(update, context, *args)
+            failed = False
+        finally:
+            route.record((time.perf_counter() - started) * 1000, failed)
+        return True
+
+    def metrics(self) -> Dict[str, dict]:
+        """Hit counts and latency histograms per route (prefix routes end in '*')."""
+        routes = list(self._exact.values()) + list(self._prefixes.values())
+        return {
+            (route.key + '*' if route.prefix else route.key): route.metrics()
+            for route in routes
+            if route.hits
+        }
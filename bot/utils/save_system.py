@@ -1,12 +1,29 @@
-from database.models.player_model import Player
+from database.models.player_model import Player, split_hot_fields
+from database.models.tracked_json import JSONPatch, DELETED
+from database.db.json_ops import json_patch_expression
 from database.db.game_db import Session, get_player, create_player, get_all_players
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
+from sqlalchemy import select, bindparam, JSON
+import glob
+import gzip
+import hashlib
 import json
 import os
+import struct
+import time
 import logging
+from typing import Optional
 
 from database import Session, get_player, create_player,  get_all_players
+from bot.config.settings import (
+    SAVE_CHUNK_SIZE,
+    BACKUP_DIR,
+    MAX_BACKUPS,
+    BACKUP_PAGE_SIZE,
+    BACKUP_FULL_EVERY,
+    RESTORE_CHUNK_SIZE
+)
 
 
 # Configure logger
@@ -28,12 +45,14 @@ def save_game_data(data: dict[int, dict]) -> bool:
         for user_id, player_data in data.items():
             player = session.query(Player).filter(Player.id == user_id).first()
             if player:
-                # Update existing player
-                for key, value in player_data.items():
-                    setattr(player, key, value)
+                # Update existing player (the ORM bumps the version itself; patches are written whole)
+                player.apply_row({
+                    key: value.value if isinstance(value, JSONPatch) else value
+                    for key, value in player_data.items() if key != 'version'
+                })
             else:
                 # Create new player
-                new_player = Player(**player_data)
+                new_player = Player.from_dict(player_data)
                 session.add(new_player)
         
         session.commit()
@@ -49,6 +68,215 @@ def save_game_data(data: dict[int, dict]) -> bool:
     finally:
         session.close()
 
+# SQLite caps the number of bound parameters per statement
+SQLITE_MAX_VARIABLES = 999
+
+def _upsert_statement(dialect_name: str, rows: list[dict], check_version: bool = False):
+    """
+    Build a multi-row INSERT ... ON CONFLICT (id) DO UPDATE for the players table.
+
+    With check_version each row carries the version it writes (read + 1)
+    and an existing row is only updated if it still has the version read.
+    """
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Bulk upsert not supported on {dialect_name}")
+
+    table = Player.__table__
+    stmt = insert(table).values(rows)
+    update_columns = {
+        name: stmt.excluded[name]
+        for name in rows[0]
+        if name != 'id'
+    }
+    if check_version:
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_=update_columns,
+            where=table.c.version == stmt.excluded.version - 1
+        )
+    return stmt.on_conflict_do_update(index_elements=[table.c.id], set_=update_columns)
+
+def upsert_players(
+    session,
+    rows: list[dict],
+    chunk_size: int = SAVE_CHUNK_SIZE,
+    conflicts: Optional[list] = None,
+    written_ids: Optional[list] = None
+) -> int:
+    """
+    Write player rows with one multi-row UPSERT per chunk, committing each chunk.
+
+    Every row is normalized to the columns of the first one so the VALUES
+    clause stays rectangular. Returns the number of rows written.
+
+    When a `conflicts` list is given the write is a compare-and-swap on
+    `version` (see _upsert_statement); ids of rows another writer changed
+    first are appended to it and not counted as written. Ids of rows
+    committed are appended to `written_ids` chunk by chunk, so they are
+    known even if a later chunk fails.
+    """
+    if not rows:
+        return 0
+
+    table_columns = Player.__table__.columns
+    columns = [name for name in rows[0] if name in table_columns]
+    dialect_name = session.bind.dialect.name
+    if dialect_name == 'sqlite':
+        chunk_size = max(1, min(chunk_size, SQLITE_MAX_VARIABLES // len(columns)))
+
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = [
+            {name: row.get(name) for name in columns}
+            for row in rows[start:start + chunk_size]
+        ]
+        if conflicts is None:
+            session.execute(_upsert_statement(dialect_name, chunk))
+            session.commit()
+            written += len(chunk)
+            if written_ids is not None:
+                written_ids.extend(row['id'] for row in chunk)
+            continue
+
+        # Rows skipped by the WHERE clause were changed by another writer
+        if dialect_name == 'postgresql':
+            stmt = _upsert_statement(dialect_name, chunk, True).returning(Player.__table__.c.id)
+            applied = {user_id for user_id, in session.execute(stmt)}
+        else:
+            # No RETURNING for SQLite here; one statement per row, read its rowcount
+            applied = {
+                row['id'] for row in chunk
+                if session.execute(_upsert_statement(dialect_name, [row], True)).rowcount
+            }
+        session.commit()
+        conflicts.extend(row['id'] for row in chunk if row['id'] not in applied)
+        if written_ids is not None:
+            written_ids.extend(row['id'] for row in chunk if row['id'] in applied)
+        written += len(applied)
+    return written
+
+def update_players(session, rows: list[dict], conflicts: list, written_ids: Optional[list] = None) -> int:
+    """
+    Write partial rows (changed columns only) of players already in the table.
+
+    Each row is a compare-and-swap UPDATE ... WHERE id AND version = read,
+    run as one executemany per shape of row. JSON columns may hold a
+    JSONPatch: on PostgreSQL only its changed keys are written (jsonb_set),
+    elsewhere the whole value. If the driver cannot report per-batch
+    rowcounts, or some row lost a race, the batch is rolled back and
+    replayed row by row to find out which ones. Ids of rows another writer
+    changed first are appended to `conflicts`, ids of committed rows to
+    `written_ids` (group by group). Returns the number of rows written.
+    """
+    table = Player.__table__
+    base = table.update().where(
+        table.c.id == bindparam('b_id'),
+        table.c.version == bindparam('b_version')
+    )
+    key_level = session.bind.dialect.name == 'postgresql'
+    sane_rowcount = session.bind.dialect.supports_sane_multi_rowcount
+
+    groups = {}
+    for row in rows:
+        params = {'b_id': row['id'], 'b_version': row['version'] - 1}
+        shape = []
+        for name, value in row.items():
+            if name == 'id':
+                continue
+            if isinstance(value, JSONPatch):
+                if key_level and value.ops is not None:
+                    shape.append((name, tuple('delete' if new is DELETED else 'set' for _, new in value.ops)))
+                    for i, (path, new) in enumerate(value.ops):
+                        params[f'{name}_path{i}'] = [str(key) for key in path]
+                        if new is not DELETED:
+                            params[f'{name}_value{i}'] = json.dumps(new)
+                    continue
+                value = value.value
+            shape.append((name, None))
+            params[name] = value
+        groups.setdefault(tuple(sorted(shape)), []).append((row['id'], params))
+
+    written = 0
+    for shape, group in groups.items():
+        patches = {
+            table.c[name]: json_patch_expression(table.c[name], name, kinds)
+            for name, kinds in shape
+            if kinds is not None
+        }
+        stmt = base.values(patches) if patches else base
+        params = [row_params for _, row_params in group]
+        if sane_rowcount or len(params) == 1:
+            if session.execute(stmt, params).rowcount == len(params):
+                session.commit()
+                written += len(params)
+                if written_ids is not None:
+                    written_ids.extend(user_id for user_id, _ in group)
+                continue
+            session.rollback()
+
+        applied = []
+        for user_id, row_params in group:
+            if session.execute(stmt, row_params).rowcount:
+                applied.append(user_id)
+            else:
+                conflicts.append(user_id)
+        session.commit()
+        written += len(applied)
+        if written_ids is not None:
+            written_ids.extend(applied)
+    return written
+
+def save_game_data_incremental(data: dict[int, dict], chunk_size: int = SAVE_CHUNK_SIZE, partial: bool = False) -> dict:
+    """
+    Save only the given (modified) players using bulk UPSERT.
+
+    Args:
+        data: Dictionary with the players modified since the last checkpoint, keyed by user_id
+        chunk_size: Rows per INSERT ... ON CONFLICT DO UPDATE statement
+        partial: Rows hold only the changed columns of players already in
+            the table; they are written with UPDATE (see update_players)
+
+    Returns:
+        dict: {"success": bool, "rows": rows written, "conflicts": ids not written
+        because another writer changed them first, "written": ids committed
+        (also when a later chunk failed), "elapsed": seconds}
+
+    Rows are compare-and-swap writes: each `version` must be the version
+    read plus one.
+    """
+    started = time.perf_counter()
+    rows = [dict(player_data, id=user_id) for user_id, player_data in data.items()]
+    conflicts = []
+    written_ids = []
+    success = True
+
+    session = Session()
+    try:
+        if partial:
+            update_players(session, rows, conflicts, written_ids)
+        else:
+            upsert_players(session, rows, chunk_size, conflicts, written_ids)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in incremental save: {e}")
+        session.rollback()
+        success = False
+    except Exception as e:
+        logger.error(f"Error in incremental save: {e}")
+        session.rollback()
+        success = False
+    finally:
+        session.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Incremental save wrote {len(written_ids)}/{len(rows)} rows in {elapsed:.3f}s")
+    if conflicts:
+        logger.warning(f"Incremental save skipped {len(conflicts)} players changed by another writer")
+    return {"success": success, "rows": len(written_ids), "conflicts": conflicts, "written": written_ids, "elapsed": elapsed}
+
 def load_game_data() -> dict[int, dict]:
     """
     Load game data from the database.
@@ -70,46 +298,333 @@ def load_game_data() -> dict[int, dict]:
         logger.error(f"Error loading game data: {e}")
         return {}
 
-def backup_data():
+BACKUP_PREFIX = 'game_data_backup_'
+BACKUP_SUFFIX = '.ndjson.gz'
+MANIFEST_SUFFIX = '.manifest.json'
+BACKUP_INDEX_FILE = 'backup_index.bin'
+BACKUP_STATE_FILE = 'backup_state.json'
+
+# Field names used by the JSON-file save format, mapped to Player columns
+LEGACY_FIELD_NAMES = {
+    'última_alimentación': 'ultima_alimentacion',
+    'última_actualización': 'ultima_actualizacion'
+}
+
+# One index record per player: id + 16-byte digest of its serialized row
+INDEX_RECORD = struct.Struct('<q16s')
+
+class _HashingWriter:
+    """File wrapper that hashes and counts every byte written through it."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.fileobj.write(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+def _stream_player_rows(session, page_size: int = BACKUP_PAGE_SIZE):
+    """Yield player rows as dicts, ordered by id, through a server-side cursor."""
+    table = Player.__table__
+    result = (
+        session.connection()
+        .execution_options(stream_results=True)
+        .execute(select(table).order_by(table.c.id))
+    )
+    for partition in result.partitions(page_size):
+        for row in partition:
+            yield dict(row._mapping)
+
+def _iter_index(index_file: str):
+    """Yield (id, digest) pairs from a backup index, in id order."""
+    if not os.path.exists(index_file):
+        return
+    with open(index_file, 'rb') as f:
+        while True:
+            block = f.read(INDEX_RECORD.size * 4096)
+            if not block:
+                break
+            yield from INDEX_RECORD.iter_unpack(block)
+
+def _manifest_path(backup_file: str) -> str:
+    return backup_file[:-len(BACKUP_SUFFIX)] + MANIFEST_SUFFIX
+
+def _read_manifest(backup_file: str) -> Optional[dict]:
+    manifest_file = _manifest_path(backup_file)
+    if not backup_file.endswith(BACKUP_SUFFIX) or not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file, 'r') as f:
+        return json.load(f)
+
+def _load_backup_state(backup_dir: str) -> dict:
+    state_file = os.path.join(backup_dir, BACKUP_STATE_FILE)
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, 'r') as f:
+        return json.load(f)
+
+def _iter_backup_records(backup_file: str):
+    """Yield player dicts from a backup, in either NDJSON+gzip or legacy JSON format."""
+    if backup_file.endswith('.gz'):
+        with gzip.open(backup_file, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(backup_file, 'r') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            # Oldest backups are keyed by user_id and use the accented field names
+            for user_id, player_data in data.items():
+                record = {LEGACY_FIELD_NAMES.get(key, key): value for key, value in player_data.items()}
+                record['id'] = int(user_id)
+                yield record
+        else:
+            yield from data
+
+def _prune_backups(backup_dir: str = BACKUP_DIR, keep: int = MAX_BACKUPS):
     """
-    Create a backup of all player data.
+    Delete the oldest backup chains beyond `keep`.
+
+    A chain is a full snapshot plus the deltas built on top of it; chains are
+    always removed whole so every remaining delta can still be restored.
     """
-    players = get_all_players()
-    backup_data = [player.to_dict() for player in players]
-    
-    backup_dir = 'backups'
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = os.path.join(backup_dir, f'game_data_backup_{timestamp}.json')
-    
-    with open(backup_file, 'w') as f:
-        json.dump(backup_data, f, indent=2)
-    
-    logger.info(f"Backup created: {backup_file}")
+    stems = {
+        os.path.basename(path).split('.', 1)[0]
+        for path in glob.glob(os.path.join(backup_dir, f'{BACKUP_PREFIX}*'))
+    }
+    chains = {}
+    for stem in stems:
+        chain = stem
+        manifest_file = os.path.join(backup_dir, stem + MANIFEST_SUFFIX)
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r') as f:
+                base = json.load(f).get('base')
+            if base:
+                chain = base.split('.', 1)[0]
+        chains.setdefault(chain, []).append(stem)
+
+    ordered = sorted(chains)
+    for chain in ordered[:-keep] if keep > 0 else ordered:
+        for stem in chains[chain]:
+            for path in glob.glob(os.path.join(backup_dir, f'{stem}.*')):
+                os.remove(path)
+                logger.info(f"Old backup removed: {path}")
+
+def backup_data(backup_dir: str = BACKUP_DIR, mode: str = 'auto'):
+    """
+    Create a streaming backup of player data.
+
+    Players are paged from the database in id order and written as
+    gzip-compressed newline-delimited JSON, so memory use does not depend on
+    the number of players.
+
+    In 'delta' mode only players whose row changed since the previous backup
+    are written (plus tombstones for deleted players). Changes are detected
+    by merging the row stream with the sorted digest index left by the
+    previous run. 'auto' writes a full snapshot every BACKUP_FULL_EVERY
+    deltas, or whenever there is no usable base snapshot.
+
+    A manifest with kind, chain, row counts and SHA-256 is written next to
+    the backup, and chains beyond MAX_BACKUPS are pruned.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+
+    index_file = os.path.join(backup_dir, BACKUP_INDEX_FILE)
+    state_file = os.path.join(backup_dir, BACKUP_STATE_FILE)
+    state = _load_backup_state(backup_dir)
+    base_available = (
+        state.get('base')
+        and os.path.exists(os.path.join(backup_dir, state['base']))
+        and os.path.exists(index_file)
+    )
+    if mode == 'auto':
+        mode = 'delta' if base_available and state.get('deltas_since_full', 0) < BACKUP_FULL_EVERY else 'full'
+    elif mode == 'delta' and not base_available:
+        logger.warning("No base snapshot available, creating a full backup instead")
+        mode = 'full'
+
+    # Microseconds keep back-to-back backups apart; an existing file is never replaced
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    backup_file = os.path.join(backup_dir, f'{BACKUP_PREFIX}{timestamp}{BACKUP_SUFFIX}')
+    if os.path.exists(backup_file):
+        logger.error(f"Backup already exists, not overwriting: {backup_file}")
+        return None
+    tmp_file = backup_file + '.tmp'
+    tmp_index = index_file + '.tmp'
+
+    rows = written = deleted = 0
+    session = Session()
+    try:
+        previous = _iter_index(index_file) if mode == 'delta' else iter(())
+        old_id, old_digest = next(previous, (None, None))
+
+        with open(tmp_file, 'wb') as raw, open(tmp_index, 'wb') as index_out:
+            writer = _HashingWriter(raw)
+            with gzip.GzipFile(fileobj=writer, mode='wb') as gz:
+                for record in _stream_player_rows(session):
+                    line = json.dumps(record, separators=(',', ':'), sort_keys=True, default=str).encode('utf-8')
+                    digest = hashlib.blake2b(line, digest_size=16).digest()
+                    index_out.write(INDEX_RECORD.pack(record['id'], digest))
+                    rows += 1
+
+                    # Players present in the old index but no longer in the table
+                    while old_id is not None and old_id < record['id']:
+                        gz.write(json.dumps({'id': old_id, '_deleted': True}).encode('utf-8') + b'\n')
+                        deleted += 1
+                        old_id, old_digest = next(previous, (None, None))
+
+                    unchanged = old_id == record['id'] and old_digest == digest
+                    if old_id == record['id']:
+                        old_id, old_digest = next(previous, (None, None))
+                    if unchanged:
+                        continue
+
+                    gz.write(line + b'\n')
+                    written += 1
+
+                while old_id is not None:
+                    gz.write(json.dumps({'id': old_id, '_deleted': True}).encode('utf-8') + b'\n')
+                    deleted += 1
+                    old_id, old_digest = next(previous, (None, None))
+
+        os.replace(tmp_file, backup_file)
+        os.replace(tmp_index, index_file)
+    except Exception as e:
+        logger.error(f"Error creating backup: {e}")
+        for path in (tmp_file, tmp_index):
+            if os.path.exists(path):
+                os.remove(path)
+        return None
+    finally:
+        session.close()
+
+    backup_name = os.path.basename(backup_file)
+    manifest = {
+        "file": backup_name,
+        "kind": mode,
+        "base": backup_name if mode == 'full' else state['base'],
+        "parent": None if mode == 'full' else state.get('last'),
+        "created_at": timestamp,
+        "players": rows,
+        "rows": written,
+        "deleted": deleted,
+        "bytes": writer.size,
+        "sha256": writer.sha256.hexdigest()
+    }
+    with open(_manifest_path(backup_file), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    state = {
+        "base": manifest["base"],
+        "last": backup_name,
+        "deltas_since_full": 0 if mode == 'full' else state.get('deltas_since_full', 0) + 1
+    }
+    with open(state_file, 'w') as f:
+        json.dump(state, f, indent=2)
+
+    _prune_backups(backup_dir)
+
+    logger.info(
+        f"Backup created: {backup_file} ({mode}, {written}/{rows} players written, "
+        f"{deleted} deleted, {writer.size} bytes)"
+    )
     return backup_file
 
-def restore_from_backup(backup_file):
+def verify_backup(backup_file: str) -> bool:
+    """Check a backup against the SHA-256 recorded in its manifest."""
+    manifest = _read_manifest(backup_file)
+    if manifest is None:
+        logger.warning(f"No manifest found for backup: {backup_file}")
+        return False
+
+    sha256 = hashlib.sha256()
+    with open(backup_file, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(block)
+    return sha256.hexdigest() == manifest["sha256"]
+
+def _validate_backup_record(record) -> Optional[str]:
+    """Return a description of what is wrong with a backup record, or None if it can be restored."""
+    if not isinstance(record, dict):
+        return "record is not an object"
+    if not isinstance(record.get('id'), int):
+        return "missing or invalid id"
+    if record.get('_deleted'):
+        return None
+
+    columns = Player.__table__.columns
+    unknown = [name for name in record if name not in columns]
+    if unknown:
+        return f"unknown columns: {', '.join(sorted(unknown))}"
+    if not record.get('nombre'):
+        return "missing nombre"
+    for column in columns:
+        value = record.get(column.name)
+        if value is not None and isinstance(column.type, JSON) and not isinstance(value, (dict, list)):
+            return f"column {column.name} is not a JSON object"
+    return None
+
+def restore_from_backup(backup_file, chunk_size: int = RESTORE_CHUNK_SIZE, dry_run: bool = False) -> dict:
     """
-    Restore game data from a backup file.
+    Restore game data from a single backup file.
+
+    The file is streamed and players are written in fixed-size chunks with
+    a bulk UPSERT (deletions with one DELETE per chunk), committing after
+    each chunk so no lock is held for the whole restore. With dry_run=True
+    every record is validated but nothing is written.
+
+    Delta backups only contain the players that changed; use
+    `restore_backup_chain` to rebuild the full state from a delta.
+
+    Returns:
+        dict: rows restored, deleted and invalid, elapsed seconds and rows/second
     """
-    with open(backup_file, 'r') as f:
-        backup_data = json.load(f)
-    
+    if backup_file.endswith(BACKUP_SUFFIX) and not verify_backup(backup_file):
+        raise ValueError(f"Backup checksum mismatch: {backup_file}")
+
+    started = time.perf_counter()
+    stats = {"rows": 0, "deleted": 0, "invalid": 0}
+    table = Player.__table__
+
+    def write_chunk(session, upserts, deletes):
+        if deletes:
+            session.execute(table.delete().where(table.c.id.in_(deletes)))
+            session.commit()
+        if upserts:
+            upsert_players(session, upserts, chunk_size)
+
     session = Session()
     try:
-        for player_data in backup_data:
-            player_id = player_data['id']
-            player = get_player(player_id)
-            if player:
-                for key, value in player_data.items():
-                    setattr(player, key, value)
+        upserts, deletes = [], []
+        for player_data in _iter_backup_records(backup_file):
+            error = _validate_backup_record(player_data)
+            if error:
+                stats["invalid"] += 1
+                logger.warning(f"Invalid backup record {player_data.get('id') if isinstance(player_data, dict) else None}: {error}")
+                continue
+
+            if player_data.get('_deleted'):
+                deletes.append(player_data['id'])
+                stats["deleted"] += 1
             else:
-                new_player = Player.from_dict(player_data)
-                session.add(new_player)
-        session.commit()
-        logger.info(f"Game data restored from backup: {backup_file}")
+                # Backups taken before the hot/cold column split keep hot keys in the JSON
+                upserts.append(split_hot_fields(player_data))
+                stats["rows"] += 1
+
+            if len(upserts) + len(deletes) >= chunk_size:
+                if not dry_run:
+                    write_chunk(session, upserts, deletes)
+                upserts, deletes = [], []
+
+        if not dry_run:
+            write_chunk(session, upserts, deletes)
     except Exception as e:
         session.rollback()
         logger.error(f"Error restoring from backup: {e}")
@@ -117,6 +632,47 @@ def restore_from_backup(backup_file):
     finally:
         session.close()
 
+    stats["elapsed"] = time.perf_counter() - started
+    stats["rows_per_second"] = (stats["rows"] + stats["deleted"]) / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+    logger.info(
+        f"{'Validated' if dry_run else 'Restored'} backup {backup_file}: "
+        f"{stats['rows']} players, {stats['deleted']} deleted, {stats['invalid']} invalid "
+        f"in {stats['elapsed']:.2f}s ({stats['rows_per_second']:.0f} rows/s)"
+    )
+    return stats
+
+def get_backup_chain(backup_file: str) -> list[str]:
+    """Return the files needed to rebuild `backup_file`: its base snapshot first, then each delta."""
+    backup_dir = os.path.dirname(backup_file)
+    chain = []
+    current = backup_file
+    while True:
+        if current in chain:
+            raise ValueError(f"Backup chain loops back to {current}")
+        manifest = _read_manifest(current)
+        chain.append(current)
+        if manifest is None or manifest.get('kind', 'full') == 'full':
+            break
+        if not manifest.get('parent'):
+            raise ValueError(f"Broken backup chain at {current}")
+        current = os.path.join(backup_dir, manifest['parent'])
+        if not os.path.exists(current):
+            raise FileNotFoundError(f"Missing backup in chain: {current}")
+    chain.reverse()
+    return chain
+
+def restore_backup_chain(backup_file: str, chunk_size: int = RESTORE_CHUNK_SIZE, dry_run: bool = False) -> dict:
+    """Rebuild the state at `backup_file` by replaying its base snapshot and every delta up to it."""
+    chain = get_backup_chain(backup_file)
+    totals = {"files": len(chain), "rows": 0, "deleted": 0, "invalid": 0, "elapsed": 0.0}
+    for path in chain:
+        stats = restore_from_backup(path, chunk_size=chunk_size, dry_run=dry_run)
+        for key in ("rows", "deleted", "invalid", "elapsed"):
+            totals[key] += stats[key]
+    totals["rows_per_second"] = (totals["rows"] + totals["deleted"]) / totals["elapsed"] if totals["elapsed"] > 0 else 0.0
+    logger.info(f"Backup chain restored ({len(chain)} files) up to: {backup_file}")
+    return totals
+
 def get_save_info():
     """
     Get information about the current save state.
@@ -0,0 +1,185 @@
+# utils/update_scope.py
+
+import contextvars
+import functools
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from database.models.player_model import Player
+from bot.utils.player_store import player_store
+from bot.config.settings import CAS_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+_current_scope: contextvars.ContextVar = contextvars.ContextVar('update_scope', default=None)
+
+
+def _snapshot(player: Player) -> str:
+    return json.dumps(player.to_dict(), sort_keys=True, default=str)
+
+
+class UpdateScope:
+    """
+    Unit of work for one incoming update.
+
+    Every handler called while the scope is active (including nested calls
+    such as spin_portal -> portal_menu) shares one Player object per user.
+    Players come from the player store, so a hot player costs no query at
+    all; at the end of the update changed players are marked dirty for the
+    next store flush. The store keeps them cached until the scope ends.
+    """
+
+    def __init__(self):
+        self._players: Dict[int, Optional[Player]] = {}
+        self._snapshots: Dict[int, str] = {}
+        self._pinned: set = set()
+
+    def _pin(self, user_id: int):
+        if user_id not in self._pinned:
+            player_store.pin(user_id)
+            self._pinned.add(user_id)
+
+    def release(self):
+        """Let the store evict the players of this scope again."""
+        for user_id in self._pinned:
+            player_store.unpin(user_id)
+        self._pinned.clear()
+
+    async def load_player(self, user_id: int) -> Optional[Player]:
+        if user_id not in self._players:
+            self._pin(user_id)
+            player = await player_store.aget(user_id)
+            self._players[user_id] = player
+            if player is not None:
+                self._snapshots[user_id] = _snapshot(player)
+        return self._players[user_id]
+
+    def add_player(self, player: Player):
+        """Register a newly created player (persisted by the next store flush)."""
+        self._pin(player.id)
+        player_store.add(player)
+        self._players[player.id] = player
+        self._snapshots[player.id] = _snapshot(player)
+
+    def forget(self, user_id: int):
+        """Drop a player from the scope so the next load fetches a fresh copy."""
+        self._players.pop(user_id, None)
+        self._snapshots.pop(user_id, None)
+
+    def checkpoint(self, user_id: int):
+        """Treat the current state of a player as already persisted."""
+        player = self._players.get(user_id)
+        if player is not None:
+            self._snapshots[user_id] = _snapshot(player)
+
+    def commit(self):
+        for user_id, player in self._players.items():
+            if player is not None and _snapshot(player) != self._snapshots.get(user_id):
+                player_store.mark_dirty(user_id)
+                self._snapshots[user_id] = _snapshot(player)
+
+
+def current_scope() -> Optional[UpdateScope]:
+    return _current_scope.get()
+
+
+@asynccontextmanager
+async def update_scope():
+    """Open a unit of work for the current update; nested uses join the outer one."""
+    scope = _current_scope.get()
+    if scope is not None:
+        yield scope
+        return
+
+    scope = UpdateScope()
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+        scope.commit()
+    finally:
+        _current_scope.reset(token)
+        scope.release()
+
+
+def scoped(handler):
+    """Wrap a handler so it runs inside its own update scope."""
+    @functools.wraps(handler)
+    async def wrapper(update, context, *args, **kwargs):
+        async with update_scope():
+            return await handler(update, context, *args, **kwargs)
+    return wrapper
+
+
+async def load_player(user_id: int) -> Optional[Player]:
+    """
+    Player for `user_id`, shared by every handler of the current update.
+
+    Outside a scope the player is taken from the store and marked dirty up
+    front, since there is no end of update to detect changes at.
+    """
+    scope = _current_scope.get()
+    if scope is not None:
+        return await scope.load_player(user_id)
+    player = await player_store.aget(user_id)
+    if player is not None:
+        player_store.mark_dirty(user_id)
+    return player
+
+
+def add_player(player: Player):
+    """Add a newly created player to the store (and the current scope)."""
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.add_player(player)
+    else:
+        player_store.add(player)
+
+
+class ConcurrentUpdateError(Exception):
+    """A player kept changing under `atomic` for every allowed retry."""
+
+
+async def atomic(user_id: int, step: Callable, retries: int = CAS_MAX_RETRIES) -> Tuple[Optional[Player], object]:
+    """
+    Run the game-logic `step(player)` and write the player at once.
+
+    The write is a compare-and-swap on the player's version. If another
+    writer changed the row first, the player is reloaded and `step` runs
+    again on the fresh copy, up to `retries` times. `step` must only
+    change the player and return a result (no messages or other side
+    effects), since it may run more than once. Changes made before the
+    step (write-behind progress) are written first, so a conflict only
+    throws away the step itself.
+
+    Returns (player, result), or (None, None) if the user has no game.
+    """
+    scope = _current_scope.get()
+    # Keep the player cached between the writes even outside a scope
+    player_store.pin(user_id)
+    try:
+        for attempt in range(retries + 1):
+            player = await load_player(user_id)
+            if player is None:
+                return None, None
+
+            # On a conflict here the pending changes are rebased onto the new row; write again
+            if not await player_store.acommit(user_id):
+                logger.info(f"Write conflict on player {user_id}, retrying ({attempt + 1}/{retries})")
+                continue
+
+            before = _snapshot(player)
+            result = step(player)
+            if _snapshot(player) == before or await player_store.acommit(user_id, False):
+                if scope is not None:
+                    scope.checkpoint(user_id)
+                return player, result
+
+            logger.info(f"Write conflict on player {user_id}, retrying ({attempt + 1}/{retries})")
+            if scope is not None:
+                scope.forget(user_id)
+    finally:
+        player_store.unpin(user_id)
+
+    raise ConcurrentUpdateError(f"Player {user_id} changed concurrently {retries + 1} times")
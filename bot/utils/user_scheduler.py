@@ -0,0 +1,106 @@
+# utils/user_scheduler.py
+
+import asyncio
+import bisect
+import functools
+import logging
+import time
+from typing import Dict, List, Optional
+
+from bot.utils.router import LATENCY_BUCKETS_MS
+
+logger = logging.getLogger(__name__)
+
+
+class _UserLock:
+    __slots__ = ('lock', 'refs')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.refs = 0
+
+
+class UserScheduler:
+    """
+    Per-user ordering on top of concurrent update processing.
+
+    The application runs updates of different users concurrently
+    (`concurrent_updates`); handlers wrapped with `serialized` take a lock
+    keyed by the update's user first, so one user's updates still run one
+    at a time in arrival order (asyncio locks wake waiters FIFO). Locks
+    exist only while someone holds or waits for them.
+    """
+
+    def __init__(self):
+        self._locks: Dict[int, _UserLock] = {}
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_in_flight = 0
+        self.processed = 0
+        self.total_wait_ms = 0.0
+        self.wait_histogram: List[int] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    @staticmethod
+    def _key(update) -> Optional[int]:
+        user = getattr(update, 'effective_user', None)
+        return user.id if user is not None else None
+
+    async def run(self, key: Optional[int], handler, *args, **kwargs):
+        """Run `handler(*args, **kwargs)` after every earlier update of `key`."""
+        if key is None:
+            return await handler(*args, **kwargs)
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _UserLock()
+        entry.refs += 1
+
+        queued = time.perf_counter()
+        self.waiting += 1
+        acquired = False
+        try:
+            async with entry.lock:
+                acquired = True
+                self.waiting -= 1
+                self._record_wait((time.perf_counter() - queued) * 1000)
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                try:
+                    return await handler(*args, **kwargs)
+                finally:
+                    self.in_flight -= 1
+                    self.processed += 1
+        finally:
+            if not acquired:
+                # Cancelled while waiting
+                self.waiting -= 1
+            entry.refs -= 1
+            if entry.refs == 0:
+                del self._locks[key]
+
+    def _record_wait(self, elapsed_ms: float):
+        self.total_wait_ms += elapsed_ms
+        self.wait_histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def serialized(self, handler):
+        """Wrap a PTB callback so updates of the same user run in order."""
+        @functools.wraps(handler)
+        async def wrapper(update, context, *args, **kwargs):
+            return await self.run(self._key(update), handler, update, context, *args, **kwargs)
+        return wrapper
+
+    def metrics(self) -> dict:
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        started = sum(self.wait_histogram)
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "processed": self.processed,
+            "users_queued": len(self._locks),
+            "avg_wait_ms": self.total_wait_ms / started if started else 0.0,
+            "wait_histogram": dict(zip(labels, self.wait_histogram))
+        }
+
+
+user_scheduler = UserScheduler()
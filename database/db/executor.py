@@ -0,0 +1,139 @@
+# db/executor.py
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from sqlalchemy import event
+
+from database.db.game_db import engine
+
+logger = logging.getLogger(__name__)
+
+# Used when the engine pool does not report its size (e.g. SQLite NullPool)
+DEFAULT_DB_WORKERS = 5
+
+
+def pool_capacity(db_engine=engine) -> int:
+    """Maximum number of connections the engine pool can hand out at once."""
+    pool = db_engine.pool
+    try:
+        return pool.size() + max(0, getattr(pool, '_max_overflow', 0))
+    except (AttributeError, TypeError):
+        # NullPool has no size(); SingletonThreadPool's size is an int
+        return DEFAULT_DB_WORKERS
+
+
+class DBExecutor:
+    """
+    Runs blocking SQLAlchemy work off the event loop.
+
+    The thread pool is sized to the engine's connection pool so threads
+    rarely queue on connection checkout; excess calls wait in the executor
+    queue instead. `metrics` reports both waits: the executor queue, and
+    connection checkout from the pool (timed around `pool.connect`, which
+    blocks while every connection is in use, e.g. held by sessions opened
+    outside the executor).
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, db_engine=engine):
+        self.engine = db_engine
+        self.max_workers = max_workers or pool_capacity(db_engine)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='db')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._checkouts = 0
+        self._checkout_total = 0.0
+        self._checkout_max = 0.0
+        self._connections_opened = 0
+        self._instrument_pool(db_engine.pool)
+
+    def _instrument_pool(self, pool):
+        """Time every connection checkout and count new DBAPI connections."""
+        connect = pool.connect
+
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                waited = time.perf_counter() - started
+                with self._lock:
+                    self._checkouts += 1
+                    self._checkout_total += waited
+                    self._checkout_max = max(self._checkout_max, waited)
+
+        # The engine looks pool.connect up on every checkout
+        pool.connect = timed_connect
+
+        @event.listens_for(pool, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                self._connections_opened += 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` in the DB thread pool and await its result."""
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+
+        def task():
+            started = time.perf_counter()
+            waited = started - submitted
+            with self._lock:
+                self._queued -= 1
+                self._in_flight += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._completed += 1
+                    self._run_total += time.perf_counter() - started
+
+        return await loop.run_in_executor(self._executor, task)
+
+    def metrics(self) -> dict:
+        """Snapshot of queue depth, in-flight calls, queue and checkout waits and run times (seconds)."""
+        with self._lock:
+            completed = self._completed
+            checkouts = self._checkouts
+            metrics = {
+                "workers": self.max_workers,
+                "queue_depth": self._queued,
+                "in_flight": self._in_flight,
+                "completed": completed,
+                "avg_queue_wait": self._wait_total / completed if completed else 0.0,
+                "max_queue_wait": self._wait_max,
+                "avg_run": self._run_total / completed if completed else 0.0,
+                "checkouts": checkouts,
+                "avg_checkout_wait": self._checkout_total / checkouts if checkouts else 0.0,
+                "max_checkout_wait": self._checkout_max,
+                "connections_opened": self._connections_opened
+            }
+        checkedout = getattr(self.engine.pool, 'checkedout', None)
+        if checkedout is not None:
+            metrics["pool_checked_out"] = checkedout()
+        return metrics
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+db_executor = DBExecutor()
+
+
+async def run_db(fn, *args, **kwargs):
+    """Shortcut for `db_executor.run`."""
+    return await db_executor.run(fn, *args, **kwargs)
@@ -1,6 +1,7 @@
 import os
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
+from database.models.player_model import Player
  
 # Database configuration for Railway PostgreSQL
 db_url = os.environ.get('DATABASE_URL')
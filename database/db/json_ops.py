@@ -0,0 +1,47 @@
+# db/json_ops.py
+
+from sqlalchemy import bindparam, cast, func, literal_column
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.types import JSON, Text
+
+
+def json_set_key(dialect_name: str, column, key: str, json_value: str):
+    """
+    SQL expression that sets `column[key]` to a JSON literal (e.g. 'false', '1').
+
+    Returns None on dialects without JSON functions, so callers can fall back
+    to loading and rewriting the rows in Python. `key` and `json_value` are
+    inlined into the SQL and must be trusted constants.
+    """
+    if dialect_name == 'postgresql':
+        return cast(
+            func.jsonb_set(
+                cast(column, JSONB),
+                literal_column("'{%s}'" % key),
+                literal_column("'%s'::jsonb" % json_value)
+            ),
+            JSON
+        )
+    if dialect_name == 'sqlite':
+        return func.json_set(column, f'$.{key}', func.json(json_value))
+    return None
+
+
+
+def json_patch_expression(column, name: str, kinds):
+    """
+    PostgreSQL expression applying key-level changes to a JSON column.
+
+    `kinds` lists each change as 'set' or 'delete'; change i binds its key
+    path as `{name}_path{i}` (list of keys) and, for 'set', its new value
+    as `{name}_value{i}` (JSON text). Statements only depend on `kinds`,
+    so rows with the same kinds of changes share one executemany.
+    """
+    expression = cast(column, JSONB)
+    for i, kind in enumerate(kinds):
+        path = bindparam(f'{name}_path{i}', type_=ARRAY(Text))
+        if kind == 'set':
+            expression = func.jsonb_set(expression, path, cast(bindparam(f'{name}_value{i}', type_=Text), JSONB))
+        else:
+            expression = expression.op('#-')(path)
+    return cast(expression, JSON)
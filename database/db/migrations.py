@@ -0,0 +1,149 @@
+# db/migrations.py
+
+import logging
+import time
+
+from sqlalchemy import inspect, text, select, bindparam, MetaData, Table, Column, String, Float
+
+from database.db.game_db import engine, Session
+from database.models.player_model import Player, HOT_FIELDS, HOT_COLUMNS, split_hot_fields
+
+logger = logging.getLogger(__name__)
+
+# Data migrations already applied, so each runs once
+applied_migrations = Table(
+    'data_migrations', MetaData(),
+    Column('name', String(100), primary_key=True),
+    Column('applied_at', Float, nullable=False)
+)
+
+
+def _backfill_premium_expiry(session):
+    """Copy expiry timestamps of active premium features into the indexed columns."""
+    players = session.query(Player).yield_per(1000)
+    for player in players:
+        features = player.premium_features or {}
+        if features.get('premium_status'):
+            player.premium_expires_at = features.get('premium_status_expires') or None
+        if features.get('auto_collector'):
+            player.auto_collector_expires_at = features.get('auto_collector_expires') or None
+    session.commit()
+
+
+def _split_hot_json(session, page_size: int = 1000):
+    """
+    Move the hot keys out of the JSON fields into their typed columns.
+
+    Columns whose key is not in the JSON keep their value, so running it
+    again (e.g. after a key is added to HOT_FIELDS) only moves what is left.
+    """
+    table = Player.__table__
+    names = list(HOT_FIELDS) + sorted(HOT_COLUMNS)
+    columns = [table.c[name] for name in names]
+    update = (
+        table.update()
+        .where(table.c.id == bindparam('b_id'))
+        .values({name: bindparam(f'b_{name}') for name in names})
+    )
+
+    last_id = None
+    moved = 0
+    while True:
+        query = select(table.c.id, *columns).order_by(table.c.id).limit(page_size)
+        if last_id is not None:
+            query = query.where(table.c.id > last_id)
+        rows = [dict(row._mapping) for row in session.execute(query)]
+        if not rows:
+            break
+        params = []
+        for row in rows:
+            split = split_hot_fields(dict(row))
+            params.append(dict({f'b_{name}': split.get(name) for name in names}, b_id=row['id']))
+        session.execute(update, params)
+        session.commit()
+        moved += len(rows)
+        last_id = rows[-1]['id']
+    logger.info(f"Moved hot JSON keys of {moved} players into typed columns")
+
+
+def _combat_level_in_json(session) -> bool:
+    """Rows split before combat_stats 'level' was a hot key still hold it in the JSON."""
+    table = Player.__table__
+    query = select(table.c.id).where(table.c.combat_stats['level'].as_integer().isnot(None)).limit(1)
+    return session.execute(query).first() is not None
+
+
+# Columns added after the players table was first created, with the
+# backfill to run once right after each one is added
+ADDED_COLUMNS = [
+    ('premium_expires_at', _backfill_premium_expiry),
+    ('auto_collector_expires_at', None),
+    ('version', None),
+    ('oro', _split_hot_json),
+    ('oro_hora', _split_hot_json),
+    ('energia', _split_hot_json),
+    ('hambre', _split_hot_json),
+    ('exp', _split_hot_json),
+    ('fire_coral', _split_hot_json),
+    ('battles_today', _split_hot_json),
+    ('tickets', _split_hot_json),
+    ('extra_data', None),
+]
+
+# Data fixes run once each, in order: (name, needed?, fix). `needed` lets
+# a database that never had the problem skip the fix and just record it.
+DATA_MIGRATIONS = [
+    ('combat_level_column', _combat_level_in_json, _split_hot_json),
+]
+
+
+def ensure_schema(db_engine=engine):
+    """Create the players table if needed, add any missing columns and indexes and run pending data migrations."""
+    table = Player.__table__
+    table.metadata.create_all(bind=db_engine, tables=[table])
+
+    inspector = inspect(db_engine)
+    existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+    existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+
+    backfills = []
+    with db_engine.begin() as conn:
+        for name, backfill in ADDED_COLUMNS:
+            if name in existing_columns:
+                continue
+            column = table.c[name]
+            column_type = column.type.compile(dialect=db_engine.dialect)
+            if column.server_default is not None:
+                # Existing rows get the default instead of NULL
+                column_type += f' NOT NULL DEFAULT {column.server_default.arg}'
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {name} {column_type}'))
+            logger.info(f"Added column {table.name}.{name}")
+            if backfill and backfill not in backfills:
+                backfills.append(backfill)
+
+    for index in table.indexes:
+        if index.name not in existing_indexes:
+            index.create(bind=db_engine)
+            logger.info(f"Created index {index.name}")
+
+    for backfill in backfills:
+        session = Session()
+        try:
+            backfill(session)
+        finally:
+            session.close()
+
+    applied_migrations.create(bind=db_engine, checkfirst=True)
+    session = Session()
+    try:
+        applied = set(session.execute(select(applied_migrations.c.name)).scalars())
+        for name, needed, fix in DATA_MIGRATIONS:
+            if name in applied:
+                continue
+            if needed(session):
+                fix(session)
+                logger.info(f"Applied data migration {name}")
+            session.execute(applied_migrations.insert().values(name=name, applied_at=time.time()))
+            session.commit()
+    finally:
+        session.close()
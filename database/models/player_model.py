@@ -1,9 +1,162 @@
-from sqlalchemy import Column, Integer, String, Float, JSON
+from collections.abc import MutableMapping
+from sqlalchemy import Column, Integer, BigInteger, String, Float, text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime
 
+from .tracked_json import tracked_json
+
 Base = declarative_base()
 
+# Frequently mutated scalars live in typed columns instead of the JSON
+# dicts handlers use; {json field: {key: column}}
+HOT_FIELDS = {
+    'mascota': {
+        'oro': 'oro',
+        'oro_hora': 'oro_hora',
+        'energia': 'energia',
+        'hambre': 'hambre'
+    },
+    'combat_stats': {
+        'level': 'nivel_combate',
+        'exp': 'exp',
+        'fire_coral': 'fire_coral',
+        'battles_today': 'battles_today'
+    },
+    'premium_features': {
+        'tickets': 'tickets'
+    }
+}
+
+HOT_COLUMNS = frozenset(column for keys in HOT_FIELDS.values() for column in keys.values())
+
+
+def _whole(value):
+    """Float columns hold integers too; give those back as ints."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class HotFieldsView(MutableMapping):
+    """
+    Dict view of one JSON field of a player with its hot keys in columns.
+
+    Hot keys read and write the typed column (a NULL column is a missing
+    key), every other key lives in the JSON dict. Handlers keep using
+    `player.mascota['oro']` and friends unchanged.
+    """
+
+    __slots__ = ('_player', '_storage', '_hot')
+
+    def __init__(self, player, field: str):
+        self._player = player
+        self._storage = '_' + field
+        self._hot = HOT_FIELDS[field]
+
+    @property
+    def cold(self) -> dict:
+        """The JSON part of the field."""
+        data = getattr(self._player, self._storage)
+        if data is None:
+            setattr(self._player, self._storage, {})
+            # Stored as a tracked copy
+            data = getattr(self._player, self._storage)
+        return data
+
+    def __getitem__(self, key):
+        column = self._hot.get(key)
+        if column is None:
+            return self.cold[key]
+        value = getattr(self._player, column)
+        if value is None:
+            raise KeyError(key)
+        return _whole(value)
+
+    def __setitem__(self, key, value):
+        column = self._hot.get(key)
+        if column is None:
+            self.cold[key] = value
+        else:
+            setattr(self._player, column, value)
+
+    def __delitem__(self, key):
+        column = self._hot.get(key)
+        if column is None:
+            del self.cold[key]
+        elif getattr(self._player, column) is None:
+            raise KeyError(key)
+        else:
+            setattr(self._player, column, None)
+
+    def __iter__(self):
+        for key, column in self._hot.items():
+            if getattr(self._player, column) is not None:
+                yield key
+        yield from list(self.cold)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def copy(self) -> dict:
+        return dict(self)
+
+    def replace(self, data):
+        """Assign the whole field: hot keys missing from `data` become NULL."""
+        data = dict(data) if data is not None else {}
+        for key, column in self._hot.items():
+            setattr(self._player, column, data.pop(key, None))
+        setattr(self._player, self._storage, data)
+
+
+def split_hot_fields(row: dict) -> dict:
+    """
+    Move hot keys out of the JSON dicts of a raw row into their columns.
+
+    For rows written before the split (old backups, pre-migration data):
+    a field holding any hot key is in the old format, and its JSON wins
+    even where the column already existed (nivel_combate was never
+    written). Hot keys it lacks keep the row's column, or NULL without
+    one, so every row of a batch has the same columns. Rows in the
+    current format are left as they are.
+    """
+    for field, keys in HOT_FIELDS.items():
+        data = row.get(field)
+        if not isinstance(data, dict):
+            continue
+        if not any(key in data for key in keys):
+            continue
+        data = dict(data)
+        for key, column in keys.items():
+            if key in data:
+                row[column] = data.pop(key)
+            else:
+                row.setdefault(column, None)
+        row[field] = data
+    return row
+
+
+def _hot_json(field: str):
+    """Instance access gives a HotFieldsView; class access the JSON column, for queries."""
+    storage = '_' + field
+
+    def fget(self):
+        return HotFieldsView(self, field)
+
+    def fset(self, value):
+        if isinstance(value, HotFieldsView) and value._player is self and value._storage == storage:
+            # `player.combat_stats = stats` after editing the view in place
+            return
+        HotFieldsView(self, field).replace(value)
+
+    def expr(cls):
+        return getattr(cls, storage)
+
+    return hybrid_property(fget, fset, expr=expr)
+
 class Player(Base):
     __tablename__ = 'players'
 
@@ -12,43 +165,64 @@ class Player(Base):
     nivel = Column(Integer, default=1)
     nivel_combate = Column(Integer, default=0)
     oro_por_minuto = Column(Integer, default=1)
-    inventario = Column(JSON, default={})
-    
-    mascota = Column(JSON, default={
-        "hambre": 100,
-        "energia": 100,
-        "nivel": 1,
-        "oro": 0,
-        "oro_hora": 1,
-    })
-    
+    inventario = Column(tracked_json(), default={})
+
+    # Cold part of each JSON field; the hot keys are the columns below
+    _mascota = Column('mascota', tracked_json(), default={"nivel": 1})
+    mascota = _hot_json('mascota')
+
     comida = Column(Integer, default=0)
     ultima_alimentacion = Column(Float, default=datetime.now().timestamp())
     ultima_actualizacion = Column(Float, default=datetime.now().timestamp())
 
-    combat_stats = Column(JSON, default={
-        "nivel": 0, 
-        "vida": 100, 
+    _combat_stats = Column('combat_stats', tracked_json(), default={
+        "vida": 100,
         "ataque": 10
     })
+    combat_stats = _hot_json('combat_stats')
 
-    daily_reward = Column(JSON, default={
+    daily_reward = Column(tracked_json(), default={
         "last_claim": 0,
         "streak": 1,
         "last_weekly_tickets": 0
     })
-    premium_features = Column(JSON, default={
+    _premium_features = Column('premium_features', tracked_json(), default={
         "premium_status": False,
-        "premium_status_expires": 0,
-        "tickets": 0,
+        "premium_status_expires": 0
     })
+    premium_features = _hot_json('premium_features')
     watershard = Column(Integer, default=0)
 
-    miniboss_stats = Column(JSON, default={
+    # Hot scalars of mascota / combat_stats / premium_features (see HOT_FIELDS).
+    # Gold can outgrow 64-bit integers at high pet levels, hence Float
+    oro = Column(Float, default=0)
+    oro_hora = Column(Float, default=1)
+    energia = Column(Integer, default=100)
+    hambre = Column(Integer, default=100)
+    exp = Column(BigInteger, nullable=True)
+    fire_coral = Column(BigInteger, nullable=True)
+    battles_today = Column(Integer, nullable=True)
+    tickets = Column(Integer, default=0)
+
+    # Indexed copies of premium_features expiry timestamps, so expirations
+    # can be found without scanning every player (NULL = not active)
+    premium_expires_at = Column(Float, index=True, nullable=True)
+    auto_collector_expires_at = Column(Float, index=True, nullable=True)
+
+    miniboss_stats = Column(tracked_json(), default={
         "attempts_today": 0,
         "last_attempt_date": None
     })
 
+    # Rarely changed per-player state (portal pity counters and settings)
+    extra_data = Column(tracked_json(), default={}, nullable=False, server_default=text("'{}'"))
+
+    # Row version for optimistic concurrency: every write must name the
+    # version it read and bumps it by one (compare-and-swap)
+    version = Column(Integer, nullable=False, default=0, server_default='0')
+
+    __mapper_args__ = {"version_id_col": version}
+
     def __repr__(self):
         return f'<Player {self.nombre}>'
 
@@ -67,7 +241,7 @@ class Player(Base):
             "última_alimentación": datetime.now().timestamp(),
             "última_actualización": datetime.now().timestamp(),
             "inventario": {},
-            "combat_stats": {"nivel": 0, "vida": 100, "ataque": 10},
+            "combat_stats": {"level": 0, "vida": 100, "ataque": 10},
             "daily_reward": {
                 "last_claim": 0,
                 "streak": 1,
@@ -103,11 +277,12 @@ class Player(Base):
             daily_reward=new_player_data['daily_reward'],
             premium_features=new_player_data['premium_features'],
             watershard=new_player_data['watershard'],
-            miniboss_stats=new_player_data['miniboss_stats']
+            miniboss_stats=new_player_data['miniboss_stats'],
+            extra_data={}
         )
 
     def to_dict(self):
-        """Convert player object to dictionary."""
+        """Convert player object to a row dictionary (column name -> value)."""
         return {
             'id': self.id,
             'nombre': self.nombre,
@@ -115,18 +290,37 @@ class Player(Base):
             'nivel_combate': self.nivel_combate,
             'oro_por_minuto': self.oro_por_minuto,
             'inventario': self.inventario,
-            'mascota': self.mascota,
+            'mascota': self._mascota,
             'comida': self.comida,
             'ultima_alimentacion': self.ultima_alimentacion,
             'ultima_actualizacion': self.ultima_actualizacion,
-            'combat_stats': self.combat_stats,
+            'combat_stats': self._combat_stats,
             'daily_reward': self.daily_reward,
-            'premium_features': self.premium_features,
+            'premium_features': self._premium_features,
             'watershard': self.watershard,
-            'miniboss_stats': self.miniboss_stats
+            'oro': self.oro,
+            'oro_hora': self.oro_hora,
+            'energia': self.energia,
+            'hambre': self.hambre,
+            'exp': self.exp,
+            'fire_coral': self.fire_coral,
+            'battles_today': self.battles_today,
+            'tickets': self.tickets,
+            'miniboss_stats': self.miniboss_stats,
+            'extra_data': self.extra_data,
+            'premium_expires_at': self.premium_expires_at,
+            'auto_collector_expires_at': self.auto_collector_expires_at,
+            'version': self.version
         }
 
+    def apply_row(self, row: dict):
+        """Set attributes from a row dictionary (see to_dict); JSON fields hold only their cold part."""
+        for key, value in row.items():
+            setattr(self, '_' + key if key in HOT_FIELDS else key, value)
+
     @classmethod
     def from_dict(cls, data):
-        """Create a player object from a dictionary."""
-        return cls(**data)
\ No newline at end of file
+        """Create a player object from a row dictionary (see to_dict)."""
+        player = cls()
+        player.apply_row(split_hot_fields(dict(data)))
+        return player
@@ -0,0 +1,299 @@
+# models/tracked_json.py
+
+from typing import List, Optional, Tuple
+
+from sqlalchemy.ext.mutable import Mutable
+from sqlalchemy.types import JSON
+
+
+class _Deleted:
+    def __repr__(self) -> str:
+        return 'DELETED'
+
+
+# Marks a deleted key in JSONPatch.ops
+DELETED = _Deleted()
+
+
+def _track(value, root, path: tuple, anchored: bool):
+    """Tracked copy of nested dicts/lists so their mutations reach `root`."""
+    if isinstance(value, dict):
+        return TrackedDict(value, root, path, anchored)
+    if isinstance(value, list):
+        return TrackedList(value, root, path)
+    return value
+
+
+def plain(value):
+    """Deep copy of a JSON value as plain dicts and lists."""
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    return value
+
+
+def _covering(paths) -> list:
+    """`paths` without those below another one, shortest first (a changed key covers everything below it)."""
+    paths = set(paths)
+    return [
+        path for path in sorted(paths, key=len)
+        if not any(path[:length] in paths for length in range(1, len(path)))
+    ]
+
+
+def _lookup(value, path: tuple):
+    """Value at `path` inside `value`, or DELETED if it is not there."""
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return DELETED
+        value = value[key]
+    return value
+
+
+def merge_paths(base: Optional[dict], source: dict, paths) -> dict:
+    """
+    Plain copy of `base` with the value at each of `paths` taken from `source`.
+
+    Keys `source` no longer has are deleted. Used to replay local changes
+    (their key paths) on top of a row another writer changed.
+    """
+    result = plain(base) if isinstance(base, dict) else {}
+    for path in _covering(paths):
+        if not path:
+            return plain(source)
+        new = _lookup(source, path)
+        node = result
+        for key in path[:-1]:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                if new is DELETED:
+                    break
+                child = node[key] = {}
+            node = child
+        else:
+            if new is DELETED:
+                node.pop(path[-1], None)
+            else:
+                node[path[-1]] = plain(new)
+    return result
+
+
+class TrackedDict(dict):
+    """
+    Dict inside a tracked JSON value; every mutation records its key path.
+
+    Assigned dicts and lists are stored as tracked copies, so keep using
+    the stored value (`d['a']`) rather than the object that was assigned.
+    Inside a list paths stop at the list (`anchored`): list items shift,
+    so any change there rewrites the whole list.
+    """
+
+    __slots__ = ('_root', '_path', '_anchored')
+
+    def __init__(self, data, root, path: tuple = (), anchored: bool = False):
+        self._root = root
+        self._path = path
+        self._anchored = anchored
+        dict.__init__(self, ((key, _track(value, root, self._key_path(key), anchored)) for key, value in data.items()))
+
+    def _key_path(self, key) -> tuple:
+        return self._path if self._anchored else self._path + (key,)
+
+    def _changed(self, key):
+        self._root._record(self._key_path(key))
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, _track(value, self._root, self._key_path(key), self._anchored))
+        self._changed(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed(key)
+
+    def pop(self, key, *default):
+        if key not in self:
+            return dict.pop(self, key, *default)
+        value = dict.pop(self, key)
+        self._changed(key)
+        return value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self._changed(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        keys = list(self)
+        dict.clear(self)
+        for key in keys:
+            self._changed(key)
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return plain(self)
+
+
+class TrackedList(list):
+    """List inside a tracked JSON value; any mutation records the list's path."""
+
+    __slots__ = ('_root', '_path')
+
+    def __init__(self, data, root, path: tuple):
+        self._root = root
+        self._path = path
+        list.__init__(self, (_track(value, root, path, True) for value in data))
+
+    def _wrap(self, value):
+        return _track(value, self._root, self._path, True)
+
+    def _changed(self):
+        self._root._record(self._path)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = [self._wrap(item) for item in value]
+        else:
+            value = self._wrap(value)
+        list.__setitem__(self, index, value)
+        self._changed()
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self._changed()
+
+    def append(self, value):
+        list.append(self, self._wrap(value))
+        self._changed()
+
+    def extend(self, values):
+        list.extend(self, [self._wrap(value) for value in values])
+        self._changed()
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def __imul__(self, count):
+        list.__imul__(self, count)
+        self._changed()
+        return self
+
+    def insert(self, index, value):
+        list.insert(self, index, self._wrap(value))
+        self._changed()
+
+    def pop(self, *args):
+        value = list.pop(self, *args)
+        self._changed()
+        return value
+
+    def remove(self, value):
+        list.remove(self, value)
+        self._changed()
+
+    def clear(self):
+        list.clear(self)
+        self._changed()
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        list.reverse(self)
+        self._changed()
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return plain(self)
+
+
+class JSONPatch:
+    """
+    Changes of one tracked JSON column since the last write.
+
+    `value` is the full new value (for full writes); `ops` the key-level
+    changes as (path, new value or DELETED), or None when the whole value
+    was replaced and must be written in full.
+    """
+
+    __slots__ = ('value', 'ops', 'root')
+
+    def __init__(self, value: dict, ops: Optional[List[Tuple[tuple, object]]], root: 'TrackedJSON'):
+        self.value = value
+        self.ops = ops
+        self.root = root
+
+    def __repr__(self) -> str:
+        return f"JSONPatch(ops={self.ops!r})"
+
+
+class TrackedJSON(Mutable, TrackedDict):
+    """
+    Mutation-tracked JSON object for a column (see `tracked_json`).
+
+    Nested changes flag the ORM attribute as modified and are collected
+    as key paths, so a write can update just those keys. A value assigned
+    to the attribute as a whole counts as replaced.
+    """
+
+    def __init__(self, data=None):
+        self._changes = set()
+        self._replaced = True
+        TrackedDict.__init__(self, data or {}, self)
+
+    @classmethod
+    def coerce(cls, key, value):
+        if value is None or isinstance(value, cls):
+            return value
+        if isinstance(value, dict):
+            return cls(value)
+        return Mutable.coerce(key, value)
+
+    def _record(self, path: tuple):
+        self._changes.add(path)
+        self.changed()
+
+    def invalidate(self):
+        """Forget the key-level changes and write the whole value next time."""
+        self._replaced = True
+
+    def take_changes(self) -> Optional[JSONPatch]:
+        """Changes since the last call as a JSONPatch (None if unchanged), and start over."""
+        changes, self._changes = self._changes, set()
+        replaced, self._replaced = self._replaced, False
+        if not changes and not replaced:
+            return None
+
+        value = plain(self)
+        if replaced or () in changes:
+            return JSONPatch(value, None, self)
+
+        ops = [(path, _lookup(value, path)) for path in _covering(changes)]
+        return JSONPatch(value, ops, self)
+
+    def __reduce__(self):
+        return (self.__class__, (plain(self),))
+
+
+def tracked_json():
+    """JSON column type whose values are TrackedJSON objects."""
+    return TrackedJSON.as_mutable(JSON)
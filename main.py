@@ -1,47 +1,32 @@
 # main.py
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application, 
     CommandHandler, 
     CallbackQueryHandler, 
-    ContextTypes,
-    CallbackContext
+    ContextTypes
 )
 
-from database import Session, get_all_players, get_player
-from sqlalchemy.orm import Session
-from database import SessionLocal, get_all_players, engine
-from bot.handlers.base import initialize_new_player
-from database.db.game_db import SessionLocal, get_all_players, get_player
-from database.models.player_model import Player
-from database.models.player_model import dict
-
-from bot.config.settings import SUCCESS_MESSAGES, ERROR_MESSAGES, logger
-
 import logging
-import asyncio
-from datetime import datetime
-from bot.handlers.base import initialize_combat_stats
-from bot.handlers.ads import register_handlers
-from bot.handlers.shop import premium_shop, get_premium_item, comprar_fragmentos
 
 from database.app import app
 
 # Import configurations and save system
 from bot.config.settings import (
     TOKEN, 
-    SUCCESS_MESSAGES, 
-    ERROR_MESSAGES, 
-    logger
-)
-from bot.config.premium_settings import PREMIUM_FEATURES
-from bot.utils.save_system import save_game_data, load_game_data, backup_data
-from bot.utils.keyboard import (
-    generar_botones,
-#    create_waterquest_menu_keyboard,
-#    create_waterquest_dialogue_keyboard
+    AUTO_SAVE_INTERVAL,
+    BACKUP_INTERVAL,
+    FEATURES,
+    STREAK_RESET_JOB,
+    UPDATE_CONCURRENCY
 )
+from bot.utils.save_system import backup_data
+from bot.utils.player_store import player_store
+from bot.utils.miniboss_runs import miniboss_runs
+from bot.utils.user_scheduler import user_scheduler
+from bot.utils.update_scope import scoped
+from database.db.executor import db_executor, run_db
+from database.db.migrations import ensure_schema
 
 
 #----------------------------------------------------------
@@ -59,200 +44,78 @@ TonClientError = TonClientException
 from bot.handlers import (
     start, button, error_handler,
     help_command, stats_command,
-    recolectar, alimentar, estado,
-    quick_combat, view_combat_stats,
-    miniboss_handler, siguiente_miniboss, retirarse_miniboss, 
-    claim_daily_reward, check_daily_reset, check_weekly_tickets,
-    tienda, comprar,
-    check_premium_expiry, 
-    portal_menu, spin_portal
+    check_daily_reset, check_weekly_tickets,
+    check_premium_expiry
 )
 
-from bot.handlers.miniboss import retry_miniboss_battle
-
-from bot.handlers.ads import (
-    ads_menu,
-    process_ad_watch,
-    retry_combat_ad
-)
-
-
+from bot.handlers.base import callback_router
 
 
-async def start(update: Update, context: CallbackContext):
-    """Initialize user data and start the game."""
-    try:
-        user_id = update.effective_user.id
-        
-        # Create a new database session
-        session: Session = SessionLocal()
-
-        try:
-            # Check if player exists in the database
-            player = session.query(Player).filter(Player.id == user_id).first()
-
-            if not player:
-                # Initialize new player
-                new_player_data = initialize_new_player()
-                player = Player(id=user_id, **new_player_data)
-                session.add(player)
-                session.commit()
-                
-                message = SUCCESS_MESSAGES["welcome"]
-            else:
-                message = "¡Ya tienes una mascota! Usa los botones para jugar."
-
-            # Generate buttons based on player data
-            reply_markup = generar_botones(player.__dict__)
-
-            if update.callback_query and update.callback_query.message:
-                await update.callback_query.message.reply_text(
-                    message,
-                    reply_markup=reply_markup
-                )
-            elif update.message:
-                await update.message.reply_text(
-                    message,
-                    reply_markup=reply_markup
-                )
 
-        finally:
-            session.close()
 
-    except Exception as e:
-        logger.error(f"Error in start command: {e}")
-        if update.callback_query and update.callback_query.message:
-            await update.callback_query.message.reply_text(ERROR_MESSAGES["generic_error"])
-        elif update.message:
-            await update.message.reply_text(ERROR_MESSAGES["generic_error"])
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-async def button(update: Update, context: CallbackContext):
-    """Handle button presses."""
+async def save_game_job(context: ContextTypes.DEFAULT_TYPE):
+    """Periodic save job: flush players modified since the last run."""
     try:
-        query = update.callback_query
-        try:
-            await query.answer()
-        except:
-            # If the callback_query expired, we continue without error
-            pass
-
-        # Get player data for menu generation
-        user_id = query.from_user.id
-        player = get_player(user_id)
-
-        if player is None:
-            logger.warning(f"Player data not found for user_id: {user_id}")
-            await query.message.reply_text(ERROR_MESSAGES["player_not_found"])
+        dirty = player_store.dirty_count()
+        if not dirty:
+            logger.info("No player data to save")
             return
 
-        # Route to appropriate handler based on callback_data
-        if query.data == "start":
-            await start(update, context)
-        elif query.data == "recolectar":
-            await recolectar(update, context)
-        elif query.data == "alimentar":
-            await alimentar(update, context)
-        elif query.data == "estado":
-            await estado(update, context)
-        elif query.data == "tienda":
-            await tienda(update, context)
-        elif query.data == "combate":
-            await quick_combat(update, context)
-        elif query.data == "miniboss":
-            await miniboss_handler(update, context)
-        elif query.data == "siguiente_miniboss":
-            await siguiente_miniboss(update, context)
-        elif query.data == "retirarse_miniboss":
-            await retirarse_miniboss(update, context)
-        elif query.data.startswith("retry_miniboss_"):
-            await retry_miniboss_battle(update, context)
-        elif query.data == "daily_reward":
-            await claim_daily_reward(update, context)
-        elif query.data.startswith("comprar_"):
-            item_name = query.data.split("_")[1]
-            await comprar(update, context, item_name)
-        elif query.data == "portal":
-            await portal_menu(update, context)
-        elif query.data.startswith("portal_spin_"):
-            await spin_portal(update, context)
-        elif query.data == "ads_menu":
-            await ads_menu(update, context)
-        elif query.data == "watch_ad":
-            await process_ad_watch(update, context)
-        elif query.data.startswith("retry_miniboss_"):
-            combat_type = query.data.split("_")[3]  # Extract the combat type
-            await retry_combat_ad(update, context, combat_type)
-        elif query.data == "premium_shop":
-            await premium_shop(update, context)
-        elif query.data == "comprar_fragmentos":
-            await comprar_fragmentos(update, context)
-        else:
-            logger.warning(f"Unhandled callback_data: {query.data}")
-            await query.message.reply_text(
-                ERROR_MESSAGES["generic_error"],
-                reply_markup=generar_botones(player.__dict__)
-            )
-    except Exception as e:
-        logger.error(f"Error in button handler: {e}")
-        if update.callback_query and update.callback_query.message:
-            await update.callback_query.message.reply_text(
-                ERROR_MESSAGES["generic_error"],
-                reply_markup=generar_botones(player.__dict__ if player else None)
+        save_result = await player_store.aflush()
+        stats = player_store.last_flush
+        if save_result:
+            logger.info(
+                f"Auto-save completed successfully: {stats['rows']} rows in {stats['elapsed']:.3f}s"
             )
-        elif update.message:
-            await update.message.reply_text(ERROR_MESSAGES["generic_error"])
-    finally:
-        # Ensure the database session is closed
-        if 'session' in locals():
-            session.close()
-
-
+        else:
+            logger.warning("Auto-save completed with warnings")
+        logger.info(f"DB executor metrics: {db_executor.metrics()}")
+        logger.info(f"Callback route metrics: {callback_router.metrics()}")
+        logger.info(f"MiniBoss runs: {miniboss_runs.stats()}")
+        logger.info(f"Update scheduler metrics: {user_scheduler.metrics()}")
 
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
-logger = logging.getLogger(__name__)
+    except Exception as e:
+        logger.error(f"Error in save game job: {e}")
 
-async def save_game_job(context: ContextTypes.DEFAULT_TYPE):
-    """Periodic save job."""
+async def backup_job(context: ContextTypes.DEFAULT_TYPE):
+    """Periodic backup job: delta backups with periodic full snapshots."""
     try:
-        session = SessionLocal()
-        players = get_all_players(session)
-        
-        if players:
-            player_data = {player.user_id: player.to_dict() for player in players}
-            save_result = save_game_data(player_data)
-            
-            if save_result:
-                logger.info("Auto-save completed successfully")
-            else:
-                logger.warning("Auto-save completed with warnings")
+        backup_file = await run_db(backup_data)
+        if backup_file:
+            logger.info(f"Backup job completed: {backup_file}")
         else:
-            logger.info("No player data to save")
-        
+            logger.warning("Backup job could not create a backup")
     except Exception as e:
-        logger.error(f"Error in save game job: {e}")
-    finally:
-        session.close()
+        logger.error(f"Error in backup job: {e}")
 
 def main():
     """Start the bot."""
     try:
-        # Create application
-        application = Application.builder().token(TOKEN).build()
+        # Bring the database schema up to date
+        ensure_schema()
+
+        # Create application; updates of different users run concurrently
+        application = (
+            Application.builder()
+            .token(TOKEN)
+            .concurrent_updates(UPDATE_CONCURRENCY)
+            .build()
+        )
 
-        # Add command handlers
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(CommandHandler("help", help_command))
-        application.add_handler(CommandHandler("stats", stats_command))
+        # Add command handlers (serialized per user)
+        application.add_handler(CommandHandler("start", user_scheduler.serialized(scoped(start))))
+        application.add_handler(CommandHandler("help", user_scheduler.serialized(help_command)))
+        application.add_handler(CommandHandler("stats", user_scheduler.serialized(scoped(stats_command))))
         
-        # Add callback query handler
-        application.add_handler(CallbackQueryHandler(button))
+        # Add callback query handler (routes are declared in bot/handlers/base.py)
+        application.add_handler(CallbackQueryHandler(user_scheduler.serialized(button)))
         
         # Add error handler
         application.add_error_handler(error_handler)
 
-        # Add premium items
-        application.add_handler(CallbackQueryHandler(get_premium_item, pattern=r'^get_premium_'))
-
         # Add WaterQuest handlers
         #application.add_handler(CallbackQueryHandler(show_waterquest_menu, pattern=r'^waterquest_menu$'))
         #application.add_handler(CallbackQueryHandler(start_voice_of_abyss_quest, pattern=r'^start_voice_of_abyss$'))
@@ -261,10 +124,18 @@ def main():
         # Add periodic jobs
         application.job_queue.run_repeating(
             save_game_job,
-            interval=300,  # Every 5 minutes
-            first=300
+            interval=AUTO_SAVE_INTERVAL,  # Every 5 minutes
+            first=AUTO_SAVE_INTERVAL
         )
 
+        # Add backup job
+        if FEATURES["backup_system"]:
+            application.job_queue.run_repeating(
+                backup_job,
+                interval=BACKUP_INTERVAL,  # Every hour
+                first=BACKUP_INTERVAL
+            )
+
         # Add weekly ticket check job
         application.job_queue.run_repeating(
             check_weekly_tickets,
@@ -279,12 +150,13 @@ def main():
             first=10
         )
 
-        # Add daily reset check
-        application.job_queue.run_repeating(
-            check_daily_reset,
-            interval=21600,  # Every 6 hours
-            first=10
-        )
+        # Streaks are derived on claim; the reset job only stores them for analytics
+        if STREAK_RESET_JOB:
+            application.job_queue.run_repeating(
+                check_daily_reset,
+                interval=21600,  # Every 6 hours
+                first=10
+            )
  
         # Start the bot
         print("Bot iniciado...")
@@ -305,27 +177,24 @@ if __name__ == '__main__':
     finally:
         if app:
             try:
-                session = SessionLocal()
-                players = get_all_players(session)
-                if players:
-                    player_data = {player.user_id: player.to_dict() for player in players}
-                    save_result = save_game_data(player_data)
+                if player_store.dirty_count():
+                    save_result = player_store.flush()
                     if save_result:
                         print("Datos guardados exitosamente.")
                     else:
                         print("Advertencia: Hubo un problema al guardar los datos.")
-                    
-                    backup_file = backup_data()
-                    if backup_file:
-                        print(f"Backup creado: {backup_file}")
-                    else:
-                        print("Advertencia: No se pudo crear el backup.")
                 else:
-                    print("No hay datos de jugadores para guardar.")
+                    print("No hay datos de jugadores pendientes de guardar.")
+
+                backup_file = backup_data()
+                if backup_file:
+                    print(f"Backup creado: {backup_file}")
+                else:
+                    print("Advertencia: No se pudo crear el backup.")
             except Exception as e:
                 print(f"Error al guardar los datos: {e}")
             finally:
-                session.close()
+                db_executor.shutdown()
                 print("¡Hasta luego!")
 
 
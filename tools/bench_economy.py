@@ -0,0 +1,100 @@
+# tools/bench_economy.py
+"""
+Benchmark the vectorized economy projection against the per-player engine.
+
+    DATABASE_URL=sqlite:// python -m tools.bench_economy --players 100000 1000000
+
+Synthetic players are generated in memory and the database is never
+queried, but importing bot.utils creates the engine, so DATABASE_URL
+must be set (any URL will do, e.g. an in-memory SQLite one). The
+per-player path is timed on at most --sample players and extrapolated,
+since building a million ORM-like objects mostly measures allocation.
+"""
+
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from bot.utils.economy import economy
+from bot.utils.economy_batch import ECONOMY_INPUT_DTYPE, project_batch
+
+
+def synthetic_players(count: int, now: float, seed: int = 42) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    players = np.empty(count, dtype=ECONOMY_INPUT_DTYPE)
+    players['id'] = np.arange(1, count + 1)
+    players['oro'] = rng.integers(0, 1_000_000, count)
+    players['hambre'] = rng.integers(0, 101, count)
+    players['energia'] = rng.integers(0, 101, count)
+    players['comida'] = rng.integers(0, 500, count)
+    players['oro_hora'] = rng.integers(1, 5000, count)
+    # Last seen anywhere in the past week
+    players['since'] = now - rng.uniform(0, 7 * 24 * 3600, count)
+    premium = rng.random(count) < 0.1
+    players['premium_until'] = np.where(premium, now + rng.uniform(-3 * 24 * 3600, 30 * 24 * 3600, count), 0.0)
+    collector = rng.random(count) < 0.05
+    players['collector_until'] = np.where(collector, now + rng.uniform(-3 * 24 * 3600, 7 * 24 * 3600, count), 0.0)
+    return players
+
+
+def as_player(row) -> SimpleNamespace:
+    """Shape one synthetic row like a Player for `economy.project`."""
+    premium_until = float(row['premium_until'])
+    collector_until = float(row['collector_until'])
+    return SimpleNamespace(
+        mascota={
+            'oro': float(row['oro']),
+            'hambre': float(row['hambre']),
+            'energia': float(row['energia']),
+            'oro_hora': float(row['oro_hora'])
+        },
+        comida=float(row['comida']),
+        ultima_actualizacion=float(row['since']),
+        premium_features={
+            'premium_status': premium_until > 0,
+            'auto_collector': collector_until > 0
+        },
+        premium_expires_at=premium_until or None,
+        auto_collector_expires_at=collector_until or None
+    )
+
+
+def run(count: int, sample: int):
+    now = time.time()
+    players = synthetic_players(count, now)
+
+    started = time.perf_counter()
+    projected = project_batch(players, now)
+    batch_elapsed = time.perf_counter() - started
+
+    sample_rows = players[:min(sample, count)]
+    objects = [as_player(row) for row in sample_rows]
+    started = time.perf_counter()
+    expected = [economy.project(player, now) for player in objects]
+    loop_elapsed = (time.perf_counter() - started) * count / len(objects)
+
+    mismatches = sum(
+        1 for row, state in zip(projected[:len(expected)], expected)
+        if any(row[key] != state[key] for key in ('oro', 'hambre', 'energia', 'comida'))
+    )
+
+    print(
+        f"{count:>9} players | batch {batch_elapsed:8.3f}s | "
+        f"per-player ~{loop_elapsed:8.3f}s | speedup x{loop_elapsed / batch_elapsed:6.1f} | "
+        f"mismatches {mismatches}/{len(expected)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--sample', type=int, default=100_000, help='players timed on the per-player path')
+    args = parser.parse_args()
+    for count in args.players:
+        run(count, args.sample)
+
+
+if __name__ == '__main__':
+    main()
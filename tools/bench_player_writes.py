@@ -0,0 +1,194 @@
+# tools/bench_player_writes.py
+"""
+Measure what one player write costs before and after the hot/cold column split.
+
+    python -m tools.bench_player_writes --players 20000 --rounds 3
+
+Before the split every flush rewrote the whole row, with gold, energy,
+EXP and the other hot scalars inside the mascota / combat_stats /
+premium_features JSON. Now the store sends only the columns that changed,
+and the hot scalars are typed columns; on PostgreSQL changed JSON columns
+are patched key by key (jsonb_set) instead of rewritten. For a few
+typical actions this prints the bind payload of the full row, of the
+changed columns and of the key-level patch (values serialized the way
+the driver sends them), and times full and partial writes against a
+throwaway SQLite database.
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models.player_model import Base, Player, HOT_FIELDS
+from database.models.tracked_json import TrackedJSON, DELETED
+from bot.utils.save_system import upsert_players, update_players
+
+
+def sample_player(user_id: int, rng: random.Random) -> Player:
+    """A mid-game player: a dozen shop items, an open MiniBoss run, portal stats."""
+    player = Player.create_new_player(f"player{user_id}")
+    player.id = user_id
+    player.version = 1
+    player.inventario = {f"Item {i}": rng.randint(1, 30) for i in range(12)}
+    player.mascota.update(oro=rng.randint(10_000, 5_000_000), oro_hora=rng.randint(50, 5000), nivel=rng.randint(5, 60))
+    player.combat_stats.update(
+        level=rng.randint(1, 40), exp=rng.randint(0, 5000), fire_coral=rng.randint(0, 900),
+        battles_today=rng.randint(0, 10), victories=rng.randint(0, 800), last_battle_date="2024-05-01"
+    )
+    player.daily_reward = {"last_claim": time.time() - 3600, "streak": rng.randint(1, 30), "last_weekly_tickets": 0}
+    player.premium_features.update(tickets=rng.randint(0, 40), auto_collector=False, auto_collector_expires=0, daily_bonus=False)
+    player.miniboss_stats = {
+        "attempts_today": 1, "last_attempt_date": "2024-05-01", "victories": 12,
+        "run": {"enemigo_actual": 2, "recompensas": {"oro": 500, "coral": 5, "exp": 40}, "expires_at": time.time() + 900}
+    }
+    player.extra_data = {"portal_stats": {"total_spins": 120, "spins_since_legendary": 33, "spins_since_epic": 4, "spins_since_rare": 1}}
+    return player
+
+
+# Typical actions, as the handlers perform them
+def recolectar(player):
+    player.comida += 10
+    player.mascota['energia'] -= 10
+
+def economy_tick(player):
+    player.mascota['oro'] += player.mascota['oro_hora'] * 5
+    player.mascota['hambre'] -= 1
+    player.ultima_actualizacion += 300
+
+def battle(player):
+    player.combat_stats['exp'] += 25
+    player.combat_stats['fire_coral'] += 3
+    player.combat_stats['battles_today'] += 1
+    player.mascota['oro'] += 120
+
+def buy_item(player):
+    player.mascota['oro'] -= 1000
+    player.inventario["Item 3"] += 1
+    player.mascota['oro_hora'] += 7
+
+ACTIONS = (("recolectar", recolectar), ("economy tick", economy_tick), ("battle", battle), ("buy item", buy_item))
+
+
+def legacy_row(row: dict) -> dict:
+    """A current row in the pre-split format: hot columns folded back into their JSON."""
+    row = copy.deepcopy(row)
+    for field, keys in HOT_FIELDS.items():
+        data = row[field] = dict(row[field] or {})
+        for key, column in keys.items():
+            value = row.pop(column)
+            if value is not None:
+                data[key] = value
+    return row
+
+
+def changed_columns(before: dict, after: dict) -> dict:
+    """The partial row the PlayerStore sends: changed columns plus the next version."""
+    row = {name: value for name, value in after.items() if name not in ('id', 'version') and value != before.get(name)}
+    row['version'] = (after['version'] or 0) + 1
+    return row
+
+
+def payload_bytes(row: dict) -> int:
+    return sum(len(json.dumps(value) if isinstance(value, (dict, list)) else str(value)) for value in row.values())
+
+
+def patch_bytes(player: Player, before: dict) -> int:
+    """Payload of the write on PostgreSQL: changed scalars plus jsonb_set paths and values."""
+    size = 0
+    for name, value in player.to_dict().items():
+        if isinstance(value, TrackedJSON):
+            patch = value.take_changes()
+            if patch is None:
+                continue
+            if patch.ops is None:
+                size += len(json.dumps(patch.value))
+                continue
+            for path, new in patch.ops:
+                size += len(json.dumps([str(key) for key in path]))
+                if new is not DELETED:
+                    size += len(json.dumps(new))
+        elif name != 'version' and value != before.get(name):
+            size += len(str(value))
+    return size + len(str((player.version or 0) + 1))
+
+
+def time_writes(rows_before, rows_after, rounds: int) -> tuple:
+    """Seconds per round for full legacy-style upserts and for partial updates."""
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        upsert_players(session, rows_before)
+        full_elapsed = partial_elapsed = 0.0
+        for _ in range(rounds):
+            full = [dict(legacy_row(after), version=after['version']) for after in rows_after]
+            started = time.perf_counter()
+            upsert_players(session, full)
+            full_elapsed += time.perf_counter() - started
+
+            # Reset so every partial write applies against the version it read
+            upsert_players(session, rows_before)
+            partial = [dict(changed_columns(before, after), id=after['id']) for before, after in zip(rows_before, rows_after)]
+            conflicts = []
+            started = time.perf_counter()
+            update_players(session, partial, conflicts)
+            partial_elapsed += time.perf_counter() - started
+            assert not conflicts, conflicts
+        return full_elapsed / rounds, partial_elapsed / rounds
+    finally:
+        session.close()
+        engine.dispose()
+        os.remove(path)
+
+
+def run(players: int, rounds: int, seed: int):
+    rng = random.Random(seed)
+    print(
+        f"{'action':<14} {'full row':>10} {'changed':>10} {'key-level':>10} {'saved':>7} | "
+        f"{'full upsert':>12} {'partial':>10}   ({players} players)"
+    )
+    for name, action in ACTIONS:
+        before_rows, after_rows = [], []
+        patched = 0
+        for user_id in range(1, players + 1):
+            player = sample_player(user_id, rng)
+            before = copy.deepcopy(player.to_dict())
+            for value in player.to_dict().values():
+                if isinstance(value, TrackedJSON):
+                    # As persisted: nothing pending
+                    value.take_changes()
+            action(player)
+            before_rows.append(before)
+            after_rows.append(copy.deepcopy(player.to_dict()))
+            patched += patch_bytes(player, before)
+
+        full = sum(payload_bytes(legacy_row(after)) for after in after_rows) / players
+        partial = sum(payload_bytes(changed_columns(b, a)) for b, a in zip(before_rows, after_rows)) / players
+        patched /= players
+        full_s, partial_s = time_writes(before_rows, after_rows, rounds)
+        print(
+            f"{name:<14} {full:9.0f}B {partial:9.0f}B {patched:9.0f}B {1 - patched / full:6.1%} | "
+            f"{full_s:11.3f}s {partial_s:9.3f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=20_000, help='players written per action')
+    parser.add_argument('--rounds', type=int, default=3, help='timed rounds per action')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    run(args.players, args.rounds, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+# tools/portal_odds.py
+"""
+Certify the Portal of Tides odds under the pity system.
+
+    python -m tools.portal_odds --spins 50000000 --output portal_odds.txt
+
+Two independent checks of RARITY_CHANCES + PITY_SYSTEM, for single spins
+(legendary pity only) and 10-spins (every pity active):
+
+  * exact: Markov chain over the pity counters, giving the long-run
+    rarity rates, the expected spins to a legendary and how often each
+    guarantee fires;
+  * monte carlo: many independent players simulated in lockstep with
+    NumPy, split into a fixed number of seeded jobs over a process pool.
+
+The report has no timestamps and the Monte Carlo seeds do not depend on
+the worker count, so it can be regenerated and diffed whenever the
+tables change. Only bot.config is imported, so no database or
+DATABASE_URL is needed.
+"""
+
+import argparse
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bot.config.portal_config import RARITY_CHANCES, RARITY_ORDER, PITY_SYSTEM
+
+LEGENDARY, EPIC, RARE, COMMON = range(4)
+
+MODES = (
+    ("single", False, "single spins (legendary pity only)"),
+    ("multi", True, "10-spins (legendary, epic and rare pity)")
+)
+
+
+def rarity_probabilities(chances=RARITY_CHANCES) -> np.ndarray:
+    """Advertised chances in RARITY_ORDER, normalized."""
+    probs = np.array([chances[rarity] for rarity in RARITY_ORDER], dtype=np.float64)
+    return probs / probs.sum()
+
+
+def pity_limits(pity=PITY_SYSTEM):
+    return pity['legendary_pity'], pity['epic_pity'], pity['rare_pity']
+
+
+# ---------------------------------------------------------------
+# Exact: Markov chain over (spins_since_legendary, _epic, _rare)
+
+def build_chain(probs: np.ndarray, pity, multi: bool):
+    """
+    Transition structure of the pity counters.
+
+    Returns (prob, next_state, forced): for every state and rarity the
+    probability of that outcome, the state it leads to and whether it was
+    a pity guarantee. Without multi the epic/rare counters never matter
+    and are not tracked.
+    """
+    L, E, R = pity
+    if not multi:
+        E = R = 1
+    cl, ce, cr = (a.ravel() for a in np.meshgrid(np.arange(L), np.arange(E), np.arange(R), indexing='ij'))
+    nl, ne, nr = cl + 1, ce + 1, cr + 1
+
+    forced_legendary = nl >= L
+    forced_epic = ~forced_legendary & multi & (ne >= E)
+    forced_rare = ~forced_legendary & ~forced_epic & multi & (nr >= R)
+    rolled = ~(forced_legendary | forced_epic | forced_rare)
+
+    prob = rolled[:, None] * probs[None, :]
+    prob[:, LEGENDARY] += forced_legendary
+    prob[:, EPIC] += forced_epic
+    prob[:, RARE] += forced_rare
+
+    forced = np.zeros_like(prob)
+    forced[:, LEGENDARY] = forced_legendary
+    forced[:, EPIC] = forced_epic
+    forced[:, RARE] = forced_rare
+
+    if not multi:
+        ne = nr = np.zeros_like(nl)
+
+    def index(l, e, r):
+        # Outcomes that cannot happen may point past the table; clip them
+        return (np.minimum(l, L - 1) * E + np.minimum(e, E - 1)) * R + np.minimum(r, R - 1)
+
+    zero = np.zeros_like(nl)
+    next_state = np.stack([
+        index(zero, zero, zero),
+        index(nl, zero, zero),
+        index(nl, ne, zero),
+        index(nl, ne, nr)
+    ], axis=1)
+    return prob, next_state, forced
+
+
+def _step(dist: np.ndarray, prob: np.ndarray, next_state: np.ndarray) -> np.ndarray:
+    flow = dist[:, None] * prob
+    return np.bincount(next_state.ravel(), weights=flow.ravel(), minlength=len(dist))
+
+
+def stationary(prob: np.ndarray, next_state: np.ndarray, tol: float = 1e-15, max_iter: int = 200000) -> np.ndarray:
+    """Stationary distribution by (lazy) power iteration, which converges even for periodic chains."""
+    dist = np.zeros(len(prob))
+    dist[0] = 1.0
+    for _ in range(max_iter):
+        new = 0.5 * dist + 0.5 * _step(dist, prob, next_state)
+        if np.abs(new - dist).sum() < tol:
+            return new
+        dist = new
+    raise RuntimeError("Stationary distribution did not converge")
+
+
+def spins_to_legendary(prob: np.ndarray, next_state: np.ndarray, forced: np.ndarray, limit: int):
+    """Expected spins from a fresh start to the first legendary, and P(it came from pity)."""
+    alive = np.zeros(len(prob))
+    alive[0] = 1.0
+    expected = 0.0
+    by_pity = 0.0
+    for _ in range(limit):
+        expected += alive.sum()
+        by_pity += (alive * forced[:, LEGENDARY]).sum()
+        no_legendary = prob.copy()
+        no_legendary[:, LEGENDARY] = 0.0
+        alive = _step(alive, no_legendary, next_state)
+    return expected, by_pity
+
+
+def exact_odds(multi: bool, probs: np.ndarray = None, pity=None) -> dict:
+    probs = rarity_probabilities() if probs is None else probs
+    pity = pity_limits() if pity is None else pity
+    prob, next_state, forced = build_chain(probs, pity, multi)
+    dist = stationary(prob, next_state)
+    expected, by_pity = spins_to_legendary(prob, next_state, forced, pity[0])
+    return {
+        "rates": dist @ prob,
+        "forced": dist @ forced,
+        "spins_to_legendary": expected,
+        "legendary_by_pity": by_pity
+    }
+
+
+# ---------------------------------------------------------------
+# Monte Carlo: independent players simulated in lockstep
+
+def simulate(seed, streams: int, steps: int, burn_in: int, multi: bool, probs, pity) -> dict:
+    """Run `streams` players for burn_in + steps spins; only the last `steps` are counted."""
+    rng = np.random.default_rng(seed)
+    L, E, R = pity
+    cumulative = np.cumsum(probs)
+    cumulative[-1] = 1.0
+
+    since_legendary = np.zeros(streams, dtype=np.int32)
+    since_epic = np.zeros(streams, dtype=np.int32)
+    since_rare = np.zeros(streams, dtype=np.int32)
+    gap = np.zeros(streams, dtype=np.int64)
+    # Every stream starts fresh, like just after a legendary, and pity caps each
+    # gap at L spins: the first `max_gaps` gaps of every stream are complete iid samples
+    max_gaps = (burn_in + steps) // L
+    gaps_seen = np.zeros(streams, dtype=np.int32)
+
+    counts = np.zeros(4, dtype=np.int64)
+    forced = np.zeros(4, dtype=np.int64)
+    gap_total = 0
+    gap_count = 0
+
+    for step in range(burn_in + steps):
+        since_legendary += 1
+        since_epic += 1
+        since_rare += 1
+        gap += 1
+
+        rarity = np.searchsorted(cumulative, rng.random(streams), side='right').astype(np.int8)
+        # Guarantees, lowest precedence first
+        pity_rare = (since_rare >= R) if multi else None
+        pity_epic = (since_epic >= E) if multi else None
+        pity_legendary = since_legendary >= L
+        if multi:
+            rarity[pity_rare] = RARE
+            rarity[pity_epic] = EPIC
+        rarity[pity_legendary] = LEGENDARY
+
+        legendary = rarity == LEGENDARY
+        if step >= burn_in:
+            counts += np.bincount(rarity, minlength=4)
+            forced[LEGENDARY] += pity_legendary.sum()
+            if multi:
+                forced[EPIC] += (pity_epic & ~pity_legendary).sum()
+                forced[RARE] += (pity_rare & ~pity_epic & ~pity_legendary).sum()
+
+        sampled = legendary & (gaps_seen < max_gaps)
+        gap_total += gap[sampled].sum()
+        gap_count += sampled.sum()
+        gaps_seen += legendary
+        gap[legendary] = 0
+        since_legendary[legendary] = 0
+        since_epic[rarity <= EPIC] = 0
+        since_rare[rarity <= RARE] = 0
+
+    return {"counts": counts, "forced": forced, "gap_total": int(gap_total), "gap_count": int(gap_count)}
+
+
+def monte_carlo(multi: bool, spins: int, seed: int, jobs: int, workers: int, steps: int, burn_in: int) -> dict:
+    probs = rarity_probabilities()
+    pity = pity_limits()
+    streams = max(1, math.ceil(spins / (jobs * steps)))
+    seeds = np.random.SeedSequence([seed, int(multi)]).spawn(jobs)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(
+            simulate,
+            seeds,
+            [streams] * jobs,
+            [steps] * jobs,
+            [burn_in] * jobs,
+            [multi] * jobs,
+            [probs] * jobs,
+            [pity] * jobs
+        ))
+
+    counts = sum(r["counts"] for r in results)
+    forced = sum(r["forced"] for r in results)
+    gap_total = sum(r["gap_total"] for r in results)
+    gap_count = sum(r["gap_count"] for r in results)
+    total = int(counts.sum())
+    return {
+        "spins": total,
+        "rates": counts / total,
+        "forced": forced / total,
+        "spins_to_legendary": gap_total / gap_count if gap_count else float('nan')
+    }
+
+
+# ---------------------------------------------------------------
+# Report
+
+def _table_lines(probs):
+    lines = ["Tables:"]
+    for rarity, p in zip(RARITY_ORDER, probs):
+        lines.append(f"  {rarity:<10} advertised {p:8.4%}")
+    L, E, R = pity_limits()
+    lines.append(f"  pity       legendary {L}, epic {E} (10-spins), rare {R} (10-spins)")
+    return lines
+
+
+def report(spins: int, seed: int, jobs: int, workers: int, steps: int, burn_in: int, run_monte_carlo: bool = True) -> str:
+    probs = rarity_probabilities()
+    lines = ["Portal of Tides odds report", ""] + _table_lines(probs)
+
+    for name, multi, title in MODES:
+        exact = exact_odds(multi)
+        lines += ["", f"[exact] {title}", f"  {'rarity':<10} {'advertised':>10} {'effective':>10} {'by pity':>10}"]
+        for i, rarity in enumerate(RARITY_ORDER):
+            lines.append(f"  {rarity:<10} {probs[i]:10.4%} {exact['rates'][i]:10.4%} {exact['forced'][i]:10.4%}")
+        lines.append(f"  expected spins to legendary: {exact['spins_to_legendary']:.4f}")
+        lines.append(f"  legendary reached by pity:   {exact['legendary_by_pity']:.4%}")
+
+        if not run_monte_carlo:
+            continue
+        simulated = monte_carlo(multi, spins, seed, jobs, workers, steps, burn_in)
+        n = simulated["spins"]
+        lines += ["", f"[monte carlo] {title}: {n} spins, seed {seed}, {jobs} jobs",
+                  f"  {'rarity':<10} {'exact':>10} {'simulated':>10} {'z':>7}"]
+        for i, rarity in enumerate(RARITY_ORDER):
+            p = exact['rates'][i]
+            # Spins are serially correlated under pity; z is only indicative
+            z = (simulated['rates'][i] - p) / math.sqrt(p * (1 - p) / n) if 0 < p < 1 else 0.0
+            lines.append(f"  {rarity:<10} {p:10.4%} {simulated['rates'][i]:10.4%} {z:7.2f}")
+        lines.append(f"  spins to legendary: exact {exact['spins_to_legendary']:.4f}, simulated {simulated['spins_to_legendary']:.4f}")
+
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spins', type=int, default=20_000_000, help='simulated spins per mode')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--jobs', type=int, default=32, help='seeded simulation jobs (fixed so reports are reproducible)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes running the jobs')
+    parser.add_argument('--steps', type=int, default=1000, help='counted spins per simulated player')
+    parser.add_argument('--burn-in', type=int, default=500, help='uncounted spins per simulated player')
+    parser.add_argument('--exact-only', action='store_true', help='skip the Monte Carlo part')
+    parser.add_argument('--output', help='write the report here instead of stdout')
+    args = parser.parse_args()
+
+    text = report(args.spins, args.seed, args.jobs, args.workers, args.steps, args.burn_in, not args.exact_only)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == '__main__':
+    main()